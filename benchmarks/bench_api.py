@@ -0,0 +1,94 @@
+"""
+Response-time benchmark of GET /api/urls/.
+
+Creates a throwaway test database, fills it with generated bookmarks for
+one user (plus another user's rows, see urlsaver.generator) and times the
+API: the first page, a deep page reached through the cursor, a filtered
+page and a sparse (?fields=) page. For comparison it also times serializing the whole
+collection at once, which is what the endpoint did before it was paginated.
+
+Usage:
+    python benchmarks/bench_api.py [--rows 100000] [--repeat 20] [--seed 1]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "urlmanager.settings")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from urlsaver.generator import generate_bookmarks  # noqa: E402
+from urlsaver.models import UrlEntry  # noqa: E402
+from urlsaver.serializers import URLSerializer  # noqa: E402
+
+def timed(label, func, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        size = func()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    print(f"{label:<32} median {statistics.median(samples):9.2f} ms  "
+          f"p95 {samples[min(len(samples) - 1, int(len(samples) * 0.95))]:9.2f} ms  {size / 1024:9.1f} KiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        user = User.objects.create_user("bench")
+        generate_bookmarks([User.objects.create_user("other")], args.rows // 10, seed=args.seed)
+        generate_bookmarks([user], args.rows, seed=args.seed)
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        client = APIClient()
+        client.force_authenticate(user)
+
+        def get(url, **params):
+            response = client.get(url, params)
+            assert response.status_code == 200, response.status_code
+            return response
+
+        def deep_cursor(pages=50):
+            data = get("/api/urls/").json()
+            for _ in range(pages):
+                data = client.get(data["next"]).json()
+            return data["next"]
+
+        cursor_url = deep_cursor()
+
+        print(f"{args.rows} rows for the user, {args.rows // 10} for another user, {args.repeat} runs each")
+        timed("first page", lambda: len(get("/api/urls/").content), args.repeat)
+        timed("page 51 (cursor)", lambda: len(get(cursor_url).content), args.repeat)
+        timed("category + tag filter", lambda: len(get("/api/urls/", category="website", tag="python").content),
+              args.repeat)
+        timed("sparse ?fields=id,url,name", lambda: len(get("/api/urls/", fields="id,url,name").content),
+              args.repeat)
+        timed("page_size=500", lambda: len(get("/api/urls/", page_size=500).content), args.repeat)
+        timed("unpaginated (old behaviour)", lambda: len(str(
+            URLSerializer(UrlEntry.objects.all().order_by("-id"), many=True).data
+        )), max(args.repeat // 10, 1))
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == "__main__":
+    main()
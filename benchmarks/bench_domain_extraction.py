@@ -0,0 +1,73 @@
+"""
+Benchmark of the domain extraction behind auto-naming (utils.auto_name_from_url).
+
+Names synthetic URLs spread over a few hundred hosts, like an import of a
+real bookmark file, with the memoized offline extractor and, for comparison,
+with the previous tldextract.extract() call per URL. The first call of each
+path is timed separately: that's where the old path loads (or downloads) the
+public suffix list.
+
+Usage:
+    python benchmarks/bench_domain_extraction.py [--urls 100000] [--hosts 300]
+
+The database is not involved.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tldextract  # noqa: E402
+
+from urlsaver.utils import auto_name_from_url, domain_of_host  # noqa: E402
+
+SUFFIXES = ["com", "org", "co.uk", "com.au", "io", "github.io", "org.in"]
+
+
+def synthetic_urls(count, hosts):
+    for i in range(count):
+        host = i % hosts
+        yield f"https://www{host % 3}.site{host}.{SUFFIXES[host % len(SUFFIXES)]}/articles/{i}?ref=feed"
+
+
+def legacy_auto_name(url):
+    """
+    auto_name_from_url() as it was: one tldextract.extract() per URL.
+    """
+    try:
+        return tldextract.extract(url).domain or url
+    except Exception:
+        return url
+
+
+def measure(label, name, args):
+    urls = list(synthetic_urls(args.urls, args.hosts))
+    started = time.perf_counter()
+    first = name(urls[0])
+    cold = time.perf_counter() - started
+
+    started = time.perf_counter()
+    names = [name(url) for url in urls]
+    elapsed = time.perf_counter() - started
+    print(f"{label:<9} first call {cold * 1000:9.2f} ms   {len(urls):>8} urls {elapsed:7.3f} s  "
+          f"({elapsed / len(urls) * 1e6:6.2f} us / url)")
+    return [first] + names
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--urls", type=int, default=100000)
+    parser.add_argument("--hosts", type=int, default=300)
+    args = parser.parse_args()
+
+    memoized = measure("memoized", auto_name_from_url, args)
+    legacy = measure("legacy", legacy_auto_name, args)
+    print(f"hostname cache: {domain_of_host.cache_info()}")
+    if memoized != legacy:
+        sys.exit("The two paths named some URLs differently.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Response size and server time of the index page against its index_data
+partial, which is what filtering, searching and paging fetch now instead of
+reloading the whole page.
+
+Creates a throwaway test database, fills it with generated bookmarks (see
+urlsaver.generator) and requests the first page, a deep cursor page, a
+filtered page and a search both ways. The time is measured around the test
+client call, i.e. the whole Django request: middleware, queries and template
+rendering, without the network.
+
+Usage:
+    python benchmarks/bench_index_partial.py [--rows 100000] [--repeat 20] [--per-page 25] [--seed 1]
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "urlmanager.settings")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+
+from bench_api import timed  # noqa: E402
+from urlsaver.generator import generate_bookmarks  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--per-page", type=int, default=25)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        user = User.objects.create_user("bench")
+        generate_bookmarks([user], args.rows, seed=args.seed)
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        client = Client()
+        client.force_login(user)
+
+        def get(url, params):
+            response = client.get(url, params)
+            assert response.status_code == 200, response.status_code
+            return len(response.content)
+
+        first = client.get("/index/", {"show_n_records": args.per_page}).context["page_obj"]
+        cases = [
+            ("first page", {}),
+            ("next page", {"cursor": first.next_cursor} if getattr(first, "is_keyset", False) else {"page": 2}),
+            ("category filter", {"category": "youtube"}),
+            ("search", {"search": "guide"}),
+        ]
+
+        print(f"{args.rows} rows, {args.per_page} per page, {args.repeat} runs each")
+        for label, params in cases:
+            params = {"show_n_records": args.per_page, **params}
+            timed(f"{label}: full page", lambda: get("/index/", params), args.repeat)
+            timed(f"{label}: index_data", lambda: get("/index_data/", params), args.repeat)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Benchmark of the PDF export engine.
+
+Renders synthetic URL rows with urlsaver.exports.write_pdf() and, for
+comparison, with the previous single-table layout, and prints the time and
+the peak Python memory (tracemalloc) per 10k rows.
+
+Usage:
+    python benchmarks/bench_pdf_export.py [--rows 10000] [--rows-per-table 25] [--skip-legacy]
+
+The database is not involved: rows are generated in memory, so the numbers
+only cover the layout and rendering done by reportlab.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reportlab.lib.pagesizes import A4  # noqa: E402
+from reportlab.lib.styles import getSampleStyleSheet  # noqa: E402
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table  # noqa: E402
+
+from urlsaver.exports import PDF_HEADER, pdf_styles, write_pdf  # noqa: E402
+
+CATEGORIES = ["website", "docs", "video", "article", "tool"]
+
+
+def synthetic_rows(count):
+    for i in range(count):
+        yield (
+            f"Bookmark {i}",
+            f"https://site{i % 997}.example.com/articles/{i}/some-longer-slug-for-wrapping",
+            CATEGORIES[i % len(CATEGORIES)],
+            f"sub{i % 13}",
+            "python, web, reading" if i % 3 else "",
+        )
+
+
+def legacy_write_pdf(rows, out):
+    """
+    The layout used before the chunked engine: one Table holding every row.
+    """
+    doc = SimpleDocTemplate(out, pagesize=A4)
+    styles = getSampleStyleSheet()
+    data = [PDF_HEADER]
+    for name, url, category, sub_category, tags in rows:
+        data.append([
+            Paragraph(name or "-", styles["Normal"]),
+            Paragraph(f'<a href="{url}">{url}</a>', styles["Normal"]),
+            Paragraph(category or "-", styles["Normal"]),
+            Paragraph(sub_category or "-", styles["Normal"]),
+            Paragraph(tags or "-", styles["Normal"]),
+        ])
+    table = Table(data, repeatRows=1)
+    table.setStyle(pdf_styles()[2])
+    doc.build([Paragraph("LinkBOX URL Export", styles["Heading1"]), Spacer(1, 12), table])
+
+
+def measure(label, render, rows):
+    # Timed and traced in separate runs: tracemalloc slows reportlab down
+    # several times over.
+    with tempfile.TemporaryFile() as out:
+        started = time.perf_counter()
+        render(synthetic_rows(rows), out)
+        elapsed = time.perf_counter() - started
+        size = out.tell()
+
+    with tempfile.TemporaryFile() as out:
+        tracemalloc.start()
+        render(synthetic_rows(rows), out)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    per_10k = 10000 / rows
+    print(f"{label:<10} {rows:>8} rows  {elapsed:8.2f} s  ({elapsed * per_10k:7.2f} s / 10k rows)  "
+          f"peak {peak / 2 ** 20:8.1f} MiB  ({peak * per_10k / 2 ** 20:7.1f} MiB / 10k rows)  "
+          f"{size / 2 ** 20:6.1f} MiB PDF")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--rows-per-table", type=int, default=25)
+    parser.add_argument("--skip-legacy", action="store_true", help="Only measure the chunked engine.")
+    args = parser.parse_args()
+
+    pdf_styles()  # built once per process, keep it out of the measurement
+    measure("chunked", lambda rows, out: write_pdf(
+        rows, out, "Benchmark", "LinkBOX URL Export", "benchmark", rows_per_table=args.rows_per_table,
+    ), args.rows)
+    if not args.skip_legacy:
+        measure("legacy", legacy_write_pdf, args.rows)
+
+
+if __name__ == "__main__":
+    main()
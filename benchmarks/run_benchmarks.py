@@ -0,0 +1,221 @@
+"""
+Benchmark suite of the main views, at several dataset sizes, with JSON
+results that can be compared between runs.
+
+For every size a throwaway test database is created and filled with
+urlsaver.generator (the `generate_bookmarks` command): --users users with
+SIZE bookmarks each. The first of them then requests, through the Django
+test client:
+
+    index (plain, search, tag filter, category filter), index_data,
+    trash_data, activity_data, visit_url, the CSV and PDF exports of the
+    whole collection, /api/urls/ (first page and a filtered page) and
+    import_csv (a fresh --import-rows row file each run). The import runs
+    last, as it grows the collection the other cases read.
+
+Every case runs --repeat times (heavy ones, the exports and the import,
+fewer) and reports the median, p95, min and max time in milliseconds, the
+response size and the number of SQL queries. Caches are cleared before
+every run, so the numbers are those of a cold request: no fragment, facet
+or ETag reuse. Response times include the whole response body, streamed or
+not.
+
+Usage:
+    python benchmarks/run_benchmarks.py [--sizes 1000,10000] [--users 3] [--repeat 10]
+                                        [--output results.json] [--compare previous.json]
+
+With --compare, every case is printed next to the same case of an earlier
+results file, with the ratio of the medians.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "urlmanager.settings")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.core.cache import caches  # noqa: E402
+from django.core.files.uploadedfile import SimpleUploadedFile  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.test.utils import CaptureQueriesContext, setup_test_environment  # noqa: E402
+from django.utils import timezone  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from urlsaver.generator import bench_users, generate_bookmarks  # noqa: E402
+from urlsaver.models import UrlEntry, tag_counts  # noqa: E402
+
+HEAVY_REPEAT_DIVISOR = 5
+
+
+def body_size(response):
+    # Streamed responses are consumed here, so their generation is timed too.
+    if response.streaming:
+        return sum(len(chunk) for chunk in response.streaming_content)
+    return len(response.content)
+
+
+def measure(run, repeat):
+    """
+    Calls `run` (which returns a response) `repeat` times plus once under
+    CaptureQueriesContext, clearing the caches first each time. Returns the
+    statistics of the case.
+    """
+    samples = []
+    for _ in range(repeat):
+        for cache in caches.all():
+            cache.clear()
+        started = time.perf_counter()
+        response = run()
+        size = body_size(response)
+        samples.append((time.perf_counter() - started) * 1000)
+        assert response.status_code < 400, response.status_code
+    for cache in caches.all():
+        cache.clear()
+    with CaptureQueriesContext(connection) as queries:
+        body_size(run())
+    samples.sort()
+    return {
+        "runs": repeat,
+        "median_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+        "min_ms": round(samples[0], 3),
+        "max_ms": round(samples[-1], 3),
+        "bytes": size,
+        "queries": len(queries),
+    }
+
+
+def import_file(rows, serial):
+    lines = ["Name,URL,Category,Sub Category,Tags"]
+    lines += [f"Imported {i},https://import{serial}.example.org/{i},website,Docs,\"bench, import\"" for i in range(rows)]
+    return SimpleUploadedFile("bench.csv", "\n".join(lines).encode(), content_type="text/csv")
+
+
+def cases(user, import_rows):
+    """
+    Returns (name, heavy, run) for every benchmarked request.
+    """
+    client = Client()
+    client.force_login(user)
+    api = APIClient()
+    api.force_authenticate(user)
+    entry = UrlEntry.objects.filter(user=user).active().order_by("-visit_count").first()
+    tag = tag_counts(user)[0][0]  # the most used one
+    imports = itertools.count()
+
+    return [
+        ("index", False, lambda: client.get("/index/", {"show_n_records": 25})),
+        ("index search", False, lambda: client.get("/index/", {"search": "guide", "show_n_records": 25})),
+        ("index tag filter", False, lambda: client.get("/index/", {"tag": tag, "show_n_records": 25})),
+        ("index category filter", False, lambda: client.get("/index/", {"category": "youtube", "show_n_records": 25})),
+        ("index_data", False, lambda: client.get("/index_data/", {"show_n_records": 25})),
+        ("trash_data", False, lambda: client.get("/trash_data/")),
+        ("activity_data", False, lambda: client.get("/activity-data/")),
+        ("visit_url", False, lambda: client.get(f"/visit/{entry.pk}/")),
+        ("export_all_csv", True, lambda: client.post("/export/all/csv/")),
+        ("export_all_pdf", True, lambda: client.get("/export/all/pdf/")),
+        ("api urls", False, lambda: api.get("/api/urls/")),
+        ("api urls filtered", False, lambda: api.get("/api/urls/", {"category": "website", "tag": tag})),
+        # Last: every run adds --import-rows bookmarks
+        ("import_csv", True, lambda: client.post("/import_csv/", {"csv_file": import_file(import_rows, next(imports))})),
+    ]
+
+
+def run_size(size, args):
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        users = bench_users(args.users)
+        started = time.perf_counter()
+        generate_bookmarks(users, size, seed=args.seed)
+        print(f"{size} bookmarks x {args.users} user(s) generated in {time.perf_counter() - started:.1f} s",
+              file=sys.stderr)
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+        results = {}
+        for name, heavy, run in cases(users[0], args.import_rows):
+            repeat = max(args.repeat // HEAVY_REPEAT_DIVISOR, 1) if heavy else args.repeat
+            results[name] = measure(run, repeat)
+            print(f"  {name:<24} median {results[name]['median_ms']:9.2f} ms  "
+                  f"{results[name]['queries']:4} queries  {results[name]['bytes'] / 1024:9.1f} KiB", file=sys.stderr)
+        return results
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(results, previous):
+    """
+    Prints every case next to the same case of an earlier run.
+    """
+    print(f"{'size':>8}  {'case':<24} {'before':>10} {'after':>10}  ratio", file=sys.stderr)
+    for size, by_case in results["sizes"].items():
+        for name, after in by_case.items():
+            before = previous.get("sizes", {}).get(size, {}).get(name)
+            if before:
+                ratio = after["median_ms"] / before["median_ms"] if before["median_ms"] else float("inf")
+                print(f"{size:>8}  {name:<24} {before['median_ms']:10.2f} {after['median_ms']:10.2f}  {ratio:5.2f}x",
+                      file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000", help="Comma separated bookmarks per user.")
+    parser.add_argument("--users", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--import-rows", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write the JSON results here instead of to stdout.")
+    parser.add_argument("--compare", help="An earlier results file to compare with.")
+    args = parser.parse_args()
+
+    setup_test_environment()
+    results = {
+        "meta": {
+            "started_at": timezone.now().isoformat(),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "database": connection.vendor,
+            "users": args.users,
+            "repeat": args.repeat,
+            "import_rows": args.import_rows,
+            "seed": args.seed,
+        },
+        "sizes": {},
+    }
+    for size in (int(size) for size in args.sizes.split(",")):
+        results["sizes"][str(size)] = run_size(size, args)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+    if args.compare:
+        with open(args.compare) as file:
+            compare(results, json.load(file))
+
+
+if __name__ == "__main__":
+    main()
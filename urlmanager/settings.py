@@ -59,6 +59,7 @@ REST_FRAMEWORK = {
 }
 
 MIDDLEWARE = [
+    'urlsaver.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -73,7 +74,8 @@ ROOT_URLCONF = 'urlmanager.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates, timed while LINKBOX_PROFILING is on
+        'BACKEND': 'urlsaver.profiling.ProfilingTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -150,6 +152,9 @@ STATIC_URL = 'static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 STATIC_DIRS = [os.path.join(BASE_DIR, 'urlsaver/static')]
 
+# Uploaded files and files produced by background jobs (never served directly)
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -163,3 +168,86 @@ LOGOUT_REDIRECT_URL = 'urlsaver:landing_page'
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
 SESSION_EXPIRE_AT_BROWSER_CLOSE = True
+
+# --- LinkBOX ---
+
+# Collections with more rows than this are paginated with keyset cursors
+# instead of page numbers.
+LINKBOX_KEYSET_THRESHOLD = 1000
+# Show the planner's row estimate next to cursor pagination (PostgreSQL only).
+LINKBOX_APPROXIMATE_COUNT = False
+# Seconds between batched writes of buffered visit counts, and the cache
+# alias the buffer lives in. `manage.py flush_visits` needs a cache shared
+# between processes (database, redis, memcached), not LocMemCache.
+LINKBOX_VISIT_FLUSH_INTERVAL = 30
+LINKBOX_VISIT_CACHE = 'default'
+# Rows fetched per database round trip by the streaming CSV export.
+LINKBOX_EXPORT_CHUNK_SIZE = 2000
+# Rows per table chunk in PDF exports (roughly one page each).
+LINKBOX_PDF_ROWS_PER_TABLE = 25
+# Rows written per bulk insert / update by the CSV import.
+LINKBOX_IMPORT_BATCH_SIZE = 500
+# CSV uploads larger than this many bytes are imported by the `run_jobs` worker.
+LINKBOX_ASYNC_IMPORT_THRESHOLD = 1024 * 1024
+# PDF exports of more URLs than this are built by the `run_jobs` worker, smaller
+# ones are sent straight away.
+LINKBOX_ASYNC_EXPORT_THRESHOLD = 5000
+# Seconds without progress after which a running job counts as abandoned, and
+# seconds finished jobs and their files are kept.
+LINKBOX_JOB_STALE_AFTER = 600
+LINKBOX_JOB_RESULT_TTL = 24 * 3600
+# Days hard deletions are remembered for /api/sync/ clients (older cursors get a 410).
+LINKBOX_TOMBSTONE_DAYS = 90
+# Maximum number of changed and of deleted entries per /api/sync/ response.
+LINKBOX_SYNC_BATCH_SIZE = 500
+# Maximum number of items per bulk request to the /api/urls/bulk-* actions.
+LINKBOX_API_BULK_LIMIT = 1000
+# Link previews: seconds a fetched preview (and a failed fetch) is reused
+# for, limits per fetched page, and the number of parallel fetches.
+LINKBOX_PREVIEW_TTL = 7 * 24 * 3600
+LINKBOX_PREVIEW_ERROR_TTL = 600
+LINKBOX_PREVIEW_TIMEOUT = 5
+LINKBOX_PREVIEW_MAX_BYTES = 256 * 1024
+LINKBOX_PREVIEW_WORKERS = 4
+# Allow previews of hosts on private / loopback networks. Keep this off in
+# production: it lets users make the server request internal addresses.
+LINKBOX_PREVIEW_ALLOW_PRIVATE = False
+# `check_links`: URLs checked in parallel, parallel checks per host, seconds
+# per request, entries per batch, and where an interrupted run's position is kept.
+LINKBOX_LINKCHECK_WORKERS = 16
+LINKBOX_LINKCHECK_PER_HOST = 2
+LINKBOX_LINKCHECK_TIMEOUT = 10
+LINKBOX_LINKCHECK_BATCH_SIZE = 500
+LINKBOX_LINKCHECK_CHECKPOINT = os.path.join(BASE_DIR, 'check_links.checkpoint.json')
+# Days trashed entries can be restored for, and how `purge_trash` deletes the
+# expired ones: rows per batch and seconds to pause between batches.
+LINKBOX_TRASH_DAYS = 30
+LINKBOX_PURGE_BATCH_SIZE = 500
+LINKBOX_PURGE_SLEEP = 0.1
+# Cache alias and lifetime (seconds) of the per-user category counts behind
+# the filter chips; they are recomputed after any change anyway.
+LINKBOX_FACET_CACHE = 'default'
+LINKBOX_FACET_CACHE_TIMEOUT = 3600
+# Cache of the index page's rendered URL rows and pagination, and how many
+# seconds they are kept for (any change re-renders them anyway). Set
+# LINKBOX_FRAGMENT_CACHE_DIR to keep them in files shared by all the server's
+# processes instead of in each process' memory.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'fragments': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ['LINKBOX_FRAGMENT_CACHE_DIR'],
+    } if os.environ.get('LINKBOX_FRAGMENT_CACHE_DIR') else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'linkbox-fragments',
+    },
+}
+LINKBOX_FRAGMENT_CACHE = 'fragments'
+LINKBOX_FRAGMENT_CACHE_TIMEOUT = 600
+# Request profiling (query count, database, template and total time per
+# request, Server-Timing headers, stats at /profiling/ for staff), and the
+# number of requests kept for the stats. Off unless LINKBOX_PROFILING=1.
+LINKBOX_PROFILING = os.environ.get('LINKBOX_PROFILING') == '1'
+LINKBOX_PROFILING_BUFFER = 5000
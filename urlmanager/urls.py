@@ -19,7 +19,7 @@ from django.urls import path, include
 from django.contrib.auth import views as auth_views
 from urlsaver.forms import CustomPasswordResetForm
 from rest_framework import routers
-from urlsaver.views import URLViewSet
+from urlsaver.views import URLViewSet, sync_urls
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
@@ -31,6 +31,7 @@ router.register(r'urls', URLViewSet)
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('api/sync/', sync_urls, name='api_sync'),
     path('api/', include(router.urls)),
     # Include all URLs from your 'urlsaver' app
     path('', include('urlsaver.urls')),
@@ -1,6 +1,18 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def ensure_search_index(sender, using, **kwargs):
+    # SQLite drops the FTS triggers whenever Django rebuilds the entries
+    # table during a migration, so put them back once migrate is done.
+    from django.db import connections
+    from .search import install_search_index
+    install_search_index(connections[using])
 
 
 class UrlsaverConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'urlsaver'
+
+    def ready(self):
+        post_migrate.connect(ensure_search_index, sender=self)
@@ -0,0 +1,190 @@
+"""
+Bulk writes for the REST API (see the bulk actions of URLViewSet).
+
+Every call is one transaction with a fixed number of queries: the affected
+rows are loaded with a single SELECT and written with bulk_create,
+bulk_update or one UPDATE, whatever the number of items. Items are
+validated one by one like add_url and import_csv do (URLs get a missing
+scheme added, blank names are derived from the domain), and invalid items
+are reported in the per-item results without stopping the others.
+
+Duplicates (URLs the user already saved, in any spelling, see
+utils.canonicalize_url) are found with one lookup on the (user, url_hash)
+unique index per request.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.utils.timezone import now
+
+from .models import UrlEntry, join_tags, parse_tags, sync_tags
+from .serializers import URLSerializer
+from .stats import adjust
+from .sync import next_change_seq
+from .utils import auto_name_from_url, canonical_url_hash, normalize_url
+
+DUPLICATE = "You have already saved this URL."
+
+
+def bulk_limit():
+    """
+    Returns the maximum number of items accepted by one bulk request.
+    """
+    return getattr(settings, 'LINKBOX_API_BULK_LIMIT', 1000)
+
+
+def _error(index, errors):
+    return {"index": index, "status": "error", "errors": errors}
+
+
+def _validate(item, instance=None):
+    """
+    Validates one item with URLSerializer, after the same URL clean up as
+    import_csv. Returns (validated_data, None) or (None, errors).
+    """
+    if not isinstance(item, dict):
+        return None, {"non_field_errors": ["Expected an object."]}
+    data = dict(item)
+    if "url" in data:
+        url = normalize_url(data["url"])
+        if url is None:
+            return None, {"url": ["Enter a valid URL."]}
+        data["url"] = url
+    serializer = URLSerializer(instance, data=data, partial=instance is not None)
+    if not serializer.is_valid():
+        return None, serializer.errors
+    return serializer.validated_data, None
+
+
+def _clean(entry):
+    # What add_url and UrlEntry.save() would do for a single entry.
+    if not (entry.name or "").strip():
+        entry.name = auto_name_from_url(entry.url)
+    entry.tags = join_tags(parse_tags(entry.tags))
+
+
+def _saved_hashes(user, hashes, exclude=()):
+    """
+    Returns {url_hash: id} for the user's entries among `hashes`.
+    """
+    entries = UrlEntry.objects.filter(user=user, url_hash__in=set(hashes)).exclude(pk__in=exclude)
+    return dict(entries.values_list("url_hash", "id"))
+
+
+def bulk_create_entries(user, items):
+    """
+    Creates an entry for every valid item. Items whose URL is already saved
+    (or repeats an earlier item) get a "duplicate" result with the id of
+    that entry. Returns the per-item results.
+    """
+    results, entries = [], []
+    for index, item in enumerate(items):
+        data, errors = _validate(item)
+        if errors:
+            results.append(_error(index, errors))
+            continue
+        entry = UrlEntry(user=user, url_hash=canonical_url_hash(data["url"]), **data)
+        _clean(entry)
+        if entry.is_deleted:
+            entry.deleted_at = now()
+        entries.append((index, entry))
+
+    with transaction.atomic():
+        saved = _saved_hashes(user, (entry.url_hash for _, entry in entries))
+        new = {}
+        for index, entry in entries:
+            if entry.url_hash in saved:
+                results.append({"index": index, "status": "duplicate", "id": saved[entry.url_hash]})
+            elif entry.url_hash in new:
+                results.append({"index": index, "status": "duplicate", "entry": new[entry.url_hash]})
+            else:
+                new[entry.url_hash] = entry
+                results.append({"index": index, "status": "created", "entry": entry})
+        created = UrlEntry.objects.bulk_create(list(new.values()))
+        sync_tags(created)
+        trashed = sum(entry.is_deleted for entry in created)
+        adjust(user, active=len(created) - trashed, trashed=trashed)
+
+    results.sort(key=lambda result: result["index"])
+    for result in results:
+        if "entry" in result:
+            result["id"] = result.pop("entry").pk
+    return results
+
+
+def bulk_update_entries(user, items):
+    """
+    Applies partial updates given as {"id": ..., <fields>} items to the
+    user's entries. An item that would give an entry the URL of another one
+    is rejected. Returns the per-item results.
+    """
+    ids = [item.get("id") for item in items if isinstance(item, dict)]
+    results, valid, changed, fields = [], [], {}, set()
+    active = trashed = 0
+    with transaction.atomic():
+        instances = UrlEntry.objects.filter(user=user).in_bulk([pk for pk in ids if isinstance(pk, int)])
+        for index, item in enumerate(items):
+            pk = item.get("id") if isinstance(item, dict) else None
+            entry = instances.get(pk) if isinstance(pk, int) else None
+            if entry is None:
+                results.append({"index": index, "status": "not_found", "id": pk})
+                continue
+            data, errors = _validate({key: value for key, value in item.items() if key != "id"}, entry)
+            if errors:
+                results.append(_error(index, errors))
+                continue
+            valid.append((index, entry, data))
+
+        # A new URL must not be taken by an entry outside the request, nor
+        # by one in it (whatever URL that one ends up with, so that the
+        # unique index can't be hit halfway through the UPDATE).
+        new_hashes = {index: canonical_url_hash(data["url"]) for index, _, data in valid if "url" in data}
+        taken = _saved_hashes(user, new_hashes.values(), exclude=[entry.pk for _, entry, _ in valid])
+        claimed = {entry.url_hash: entry.pk for _, entry, _ in valid}
+        for index, entry, data in valid:
+            url_hash = new_hashes.get(index)
+            if url_hash is not None and (url_hash in taken or claimed.setdefault(url_hash, entry.pk) != entry.pk):
+                results.append(_error(index, {"url": [DUPLICATE]}))
+                continue
+
+            was_deleted = entry.is_deleted
+            for field, value in data.items():
+                setattr(entry, field, value)
+            _clean(entry)
+            if entry.is_deleted != was_deleted:
+                entry.deleted_at = now() if entry.is_deleted else None
+                fields.add("deleted_at")
+                delta = 1 if entry.is_deleted else -1
+                active, trashed = active - delta, trashed + delta
+            entry.updated_at = now()
+            fields.update(data, ("name", "tags", "updated_at"))
+            changed[entry.pk] = entry
+            results.append({"index": index, "status": "updated", "id": entry.pk})
+        results.sort(key=lambda result: result["index"])
+
+        if changed:
+            UrlEntry.objects.bulk_update(list(changed.values()), sorted(fields), batch_size=500)
+            sync_tags(list(changed.values()))
+            adjust(user, active=active, trashed=trashed)
+    return results
+
+
+def set_trashed(user, ids, trashed):
+    """
+    Moves the user's entries with the given ids to the trash (or restores
+    them from it) with a single UPDATE. Returns the per-item results.
+    """
+    valid_ids = [pk for pk in ids if isinstance(pk, int)]
+    with transaction.atomic():
+        current = dict(UrlEntry.objects.filter(user=user, id__in=valid_ids).values_list("id", "is_deleted"))
+        moment = now()
+        count = UrlEntry.objects.filter(user=user, id__in=valid_ids, is_deleted=not trashed).update(
+            is_deleted=trashed, deleted_at=moment if trashed else None, updated_at=moment,
+            change_seq=next_change_seq(user))
+        adjust(user, active=-count if trashed else count, trashed=count if trashed else -count)
+
+    done = "trashed" if trashed else "restored"
+    return [
+        {"index": index, "id": pk,
+         "status": "not_found" if not isinstance(pk, int) or pk not in current else "unchanged" if current[pk] == trashed else done}
+        for index, pk in enumerate(ids)
+    ]
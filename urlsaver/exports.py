@@ -0,0 +1,293 @@
+"""
+Exports of URL entries.
+
+CSV rows are read with values_list() through a server-side iterator and
+written out as they are produced, so an export's memory use stays flat no
+matter how many URLs a user has.
+
+PDFs are laid out as a series of small tables fed from the same kind of
+iterator, see write_pdf().
+"""
+import csv
+import tempfile
+import zlib
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.http import FileResponse, StreamingHttpResponse
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+
+CSV_HEADER = ["Name", "URL", "Category", "Sub Category", "Tags"]
+CSV_FIELDS = ('name', 'url', 'category', 'sub_category', 'tags')
+
+# Lines are grouped into blocks of about this many characters before they
+# are handed to the server, instead of one write per row.
+BLOCK_SIZE = 64 * 1024
+
+# PDF exports are built in memory up to this size, then in a temporary file.
+SPOOL_SIZE = 4 * 1024 * 1024
+
+
+def export_chunk_size():
+    """
+    Returns the number of rows fetched from the database at a time.
+    """
+    return getattr(settings, 'LINKBOX_EXPORT_CHUNK_SIZE', 2000)
+
+
+class Echo:
+    """
+    A file-like object for csv.writer that hands back each written line
+    instead of storing it.
+    """
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(queryset):
+    """
+    Yields the CSV export of the queryset line by line, header first.
+    """
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_HEADER)
+    rows = queryset.order_by('-created_at', '-id').values_list(*CSV_FIELDS)
+    for row in rows.iterator(chunk_size=export_chunk_size()):
+        yield writer.writerow(row)
+
+
+def blocks(lines, size=BLOCK_SIZE):
+    """
+    Joins small strings into blocks of roughly `size` characters.
+    """
+    block, length = [], 0
+    for line in lines:
+        block.append(line)
+        length += len(line)
+        if length >= size:
+            yield ''.join(block)
+            block, length = [], 0
+    if block:
+        yield ''.join(block)
+
+
+def gzipped(chunks):
+    """
+    Compresses a stream of strings into a gzip stream, chunk by chunk.
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def csv_response(queryset, filename, compress=False):
+    """
+    Returns a StreamingHttpResponse with the CSV export of the queryset as a
+    file attachment, gzip compressed (and named *.csv.gz) when `compress`
+    is set.
+    """
+    content = blocks(csv_lines(queryset))
+    if compress:
+        response = StreamingHttpResponse(gzipped(content), content_type="application/gzip")
+        filename += ".gz"
+    else:
+        response = StreamingHttpResponse(content, content_type="text/csv")
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+class _LazyFlowables(list):
+    """
+    The flowables list handed to reportlab's doc.build(), filled from a
+    generator a few flowables at a time.
+
+    build() only ever looks at the front of the list and deletes what it
+    has drawn, so the tables of pages that are done (or not started yet)
+    are never in memory together.
+    """
+
+    def __init__(self, flowables, lookahead=2):
+        super().__init__()
+        self._source = iter(flowables)
+        self._lookahead = lookahead
+
+    def __len__(self):
+        while list.__len__(self) < self._lookahead:
+            try:
+                self.append(next(self._source))
+            except StopIteration:
+                break
+        return list.__len__(self)
+
+
+class _CellParagraph(Paragraph):
+    """
+    A table cell Paragraph that remembers its line breaks.
+
+    A Table wraps every cell again when it measures itself, when it is split
+    at the end of a page and when it is drawn. Cells always get the same
+    column width, so breaking the lines once is enough.
+    """
+
+    def wrap(self, availWidth, availHeight):
+        if getattr(self, '_wrapped_width', None) != availWidth:
+            self._wrapped_size = super().wrap(availWidth, availHeight)
+            self._wrapped_width = availWidth
+        return self._wrapped_size
+
+
+def pdf_rows_per_table():
+    """
+    Returns the number of rows put in each table chunk of a PDF export.
+    """
+    return getattr(settings, 'LINKBOX_PDF_ROWS_PER_TABLE', 25)
+
+
+_pdf_styles = None
+
+
+def pdf_styles():
+    """
+    Returns the (heading, cell, table) styles of the PDF export, built once
+    per process and shared by every table chunk.
+    """
+    global _pdf_styles
+    if _pdf_styles is None:
+        sample = getSampleStyleSheet()
+        _pdf_styles = (sample["Heading1"], sample["Normal"], TableStyle([
+            ("BACKGROUND", (0, 0), (-1, 0), colors.grey),
+            ("TEXTCOLOR", (0, 0), (-1, 0), colors.whitesmoke),
+            ("ALIGN", (0, 0), (-1, -1), "LEFT"),
+            ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+            ("FONTNAME", (0, 1), (-1, -1), sample["Normal"].fontName),
+            ("FONTSIZE", (0, 1), (-1, -1), sample["Normal"].fontSize),
+            ("LEADING", (0, 1), (-1, -1), sample["Normal"].leading),
+            ("BOTTOMPADDING", (0, 0), (-1, 0), 12),
+            ("BACKGROUND", (0, 1), (-1, -1), colors.beige),
+            ("GRID", (0, 0), (-1, -1), 0.5, colors.black),
+            ("VALIGN", (0, 0), (-1, -1), "TOP"),
+        ]))
+    return _pdf_styles
+
+
+PDF_HEADER = ["Name", "URL", "Category", "Sub-Category", "Tags"]
+# Fixed column widths (as fractions of the frame width) so that the columns
+# of consecutive table chunks line up.
+PDF_COLUMNS = (0.2, 0.32, 0.14, 0.14, 0.2)
+
+
+def pdf_tables(rows, width, rows_per_table, on_progress=None):
+    """
+    Yields one Table per `rows_per_table` rows, each with its own header row.
+
+    :param rows: An iterable of (name, url, category, sub_category, tags) tuples.
+    :param width: The width of the frame the tables are drawn in.
+    :param rows_per_table: The number of rows in each table.
+    :param on_progress: Called with the number of rows done after each table.
+    """
+    _, cell, table_style = pdf_styles()
+    col_widths = [width * fraction for fraction in PDF_COLUMNS]
+    # Room for text inside a cell once the default 6pt paddings are taken off
+    text_widths = [col_width - 12 for col_width in col_widths]
+
+    def text_cell(text, column):
+        # Wrapping a Paragraph is by far the most expensive part of the
+        # layout; text that fits on one line is drawn as a plain string.
+        text = text or "-"
+        if "\n" not in text and stringWidth(text, cell.fontName, cell.fontSize) <= text_widths[column]:
+            return text
+        return _CellParagraph(escape(text), cell)
+
+    def table(data):
+        chunk = Table(data, colWidths=col_widths, repeatRows=1)
+        chunk.setStyle(table_style)
+        return chunk
+
+    done, data = 0, [PDF_HEADER]
+    for name, url, category, sub_category, tags in rows:
+        # Quotes too, the URL goes in an attribute
+        url = escape(url, {'"': '&quot;'})
+        data.append([
+            text_cell(name, 0),
+            _CellParagraph(f'<a href="{url}">{url}</a>', cell),
+            text_cell(category, 2),
+            text_cell(sub_category, 3),
+            text_cell(tags, 4),
+        ])
+        if len(data) > rows_per_table:
+            done += len(data) - 1
+            yield table(data)
+            if on_progress is not None:
+                on_progress(done)
+            data = [PDF_HEADER]
+    if len(data) > 1:
+        done += len(data) - 1
+        yield table(data)
+        if on_progress is not None:
+            on_progress(done)
+
+
+def write_pdf(rows, out, title, heading, author, rows_per_table=None, on_progress=None):
+    """
+    Writes a PDF with a table of the given rows to the file-like `out`.
+
+    Rows are consumed lazily and laid out in small tables of rows_per_table
+    rows, so the cost of a page doesn't depend on the size of the export
+    and only the tables being drawn are held in memory.
+
+    :param rows: An iterable of (name, url, category, sub_category, tags) tuples.
+    :param out: A binary file-like object the PDF is written to.
+    :param title: The document title (PDF metadata).
+    :param heading: The heading printed above the table.
+    :param author: The document author (PDF metadata).
+    :param rows_per_table: Defaults to LINKBOX_PDF_ROWS_PER_TABLE.
+    :param on_progress: Called with the number of rows written so far.
+    """
+    doc = SimpleDocTemplate(out, pagesize=A4)
+    doc.title = title
+    doc.author = author
+    doc.subject = "Exported URLs with categories and tags"
+    doc.keywords = ["urls", "export", "pdf", "linkbox"]
+
+    heading_style = pdf_styles()[0]
+
+    def flowables():
+        yield Paragraph(escape(heading), heading_style)
+        yield Spacer(1, 12)
+        yield from pdf_tables(rows, doc.width, rows_per_table or pdf_rows_per_table(), on_progress)
+
+    doc.build(_LazyFlowables(flowables()))
+
+
+def build_urls_pdf(urls, out, title, heading, author, on_progress=None):
+    """
+    Writes a PDF with a table of the given URL entries to the file-like `out`.
+
+    :param urls: The UrlEntry queryset to export.
+    :param out: A binary file-like object the PDF is written to.
+    :param title: The document title (PDF metadata).
+    :param heading: The heading printed above the table.
+    :param author: The document author (PDF metadata).
+    :param on_progress: Called with the number of rows written so far.
+    """
+    rows = urls.order_by('-created_at', '-id').values_list(*CSV_FIELDS)
+    write_pdf(rows.iterator(chunk_size=export_chunk_size()), out, title, heading, author, on_progress=on_progress)
+
+
+def pdf_response(urls, filename, title, heading, author):
+    """
+    Returns a FileResponse with the PDF export of the queryset as a file
+    attachment. The PDF is spooled to a temporary file (on disk once it
+    outgrows a few MB) and sent from there in blocks.
+    """
+    out = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+    build_urls_pdf(urls, out, title, heading, author)
+    out.seek(0)
+    return FileResponse(out, as_attachment=True, filename=filename, content_type="application/pdf")
@@ -0,0 +1,67 @@
+"""
+Category facets: how many of a user's active entries there are per
+category and sub-category, for the filter chips of the index page.
+
+The counts come from one GROUP BY over the (user, effective_category,
+sub_category) index and are cached per user. The cache key includes the
+user's collection version (see urlsaver.versioning), so any write makes the
+next request recompute them and nothing has to be invalidated explicitly.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Count
+
+from .models import UrlEntry
+from .versioning import collection_version
+
+
+def facet_cache():
+    """
+    Returns the cache the facets are kept in (LINKBOX_FACET_CACHE).
+    """
+    return caches[getattr(settings, 'LINKBOX_FACET_CACHE', 'default')]
+
+
+def facet_cache_timeout():
+    """
+    Returns the number of seconds computed facets are kept for.
+    """
+    return getattr(settings, 'LINKBOX_FACET_CACHE_TIMEOUT', 3600)
+
+
+def compute_facets(user):
+    """
+    Counts the user's active entries per category and sub-category with a
+    single GROUP BY. Returns a list of
+    {"name": ..., "count": ..., "sub_categories": [{"name": ..., "count": ...}]}
+    ordered by decreasing count, entries without a category under "".
+    """
+    rows = (UrlEntry.objects.filter(user=user).active()
+            .values_list('effective_category', 'sub_category')
+            .annotate(count=Count('id')).order_by())
+    categories = {}
+    for category, sub_category, count in rows:
+        facet = categories.setdefault(category, {"name": category, "count": 0, "sub_categories": []})
+        facet["count"] += count
+        if sub_category:
+            facet["sub_categories"].append({"name": sub_category, "count": count})
+
+    def by_count(facet):
+        return -facet["count"], facet["name"].lower()
+    for facet in categories.values():
+        facet["sub_categories"].sort(key=by_count)
+    return sorted(categories.values(), key=by_count)
+
+
+def category_facets(user):
+    """
+    Returns compute_facets(user), from the cache while the user's collection
+    is unchanged.
+    """
+    cache = facet_cache()
+    key = f'linkbox:facets:{user.pk}:{collection_version(user)}'
+    facets = cache.get(key)
+    if facets is None:
+        facets = compute_facets(user)
+        cache.set(key, facets, facet_cache_timeout())
+    return facets
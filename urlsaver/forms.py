@@ -6,12 +6,36 @@ from django.contrib.auth.models import User
 class UrlForm(forms.ModelForm):
     class Meta:
         model = UrlEntry
-        exclude = ['user', 'visit_count', 'created_at', 'is_deleted', 'deleted_at']
+        exclude = ['user', 'visit_count', 'created_at', 'is_deleted', 'deleted_at', 'tag_set']
         widgets = {
             'url': forms.Textarea(attrs={'rows': 2, 'placeholder': 'https://example.com'}),
             'name': forms.TextInput(attrs={'placeholder': 'e.g. Google'}),
         }
-        
+
+    def clean_url(self):
+        """
+        Rejects a URL the user has already saved, in any spelling (see
+        utils.canonicalize_url). The form's instance must carry the user.
+
+        When adding, a duplicate that is in the trash is not an error: the
+        form switches to that entry, so that saving restores it with the
+        submitted details instead of creating a second one.
+        """
+        url = self.cleaned_data['url']
+        if self.instance.user_id is None:
+            return url
+        duplicate = (UrlEntry.objects.filter(user_id=self.instance.user_id).with_url(url)
+                     .exclude(pk=self.instance.pk).first())
+        if duplicate is None:
+            return url
+        if duplicate.is_deleted and self.instance.pk is None:
+            self.instance = duplicate
+            return url
+        if duplicate.is_deleted:
+            raise forms.ValidationError("This URL is already saved, it is in your trash.")
+        raise forms.ValidationError("You have already saved this URL.")
+
+
 class SignUpForm(UserCreationForm):
     email = forms.EmailField(required=True)
 
@@ -0,0 +1,211 @@
+"""
+Synthetic bookmarks for benchmarks and load tests, used by
+`manage.py generate_bookmarks` and benchmarks/run_benchmarks.py.
+
+The data is shaped like real collections rather than uniform: a few big
+sites (YouTube, GitHub, Wikipedia...) get most of the bookmarks and a long
+tail of small sites gets the rest (Zipf-like weights), categories follow
+the domain (YouTube links are "youtube"), tag vocabularies are skewed so a
+handful of tags are on many entries, most entries are rarely visited and a
+few very often, creation dates lean towards the recent past and a small
+share of the collection sits in the trash, some of it past the restore
+period. Generation is deterministic for a given seed.
+
+Rows are written with bulk inserts, LINKBOX_IMPORT_BATCH_SIZE-sized batches
+by default, through the same bulk paths as the CSV import (url_hash,
+effective_category and tag_set are kept), and the owners' counters are
+recomputed at the end.
+"""
+import random
+import string
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .importer import import_batch_size
+from .models import UrlEntry, sync_tags, trash_days
+from .stats import bump_versions, reconcile
+from .utils import canonical_url_hash
+
+# (domain, category, weight): the big sites, then the long tail.
+POPULAR_SITES = [
+    ("youtube.com", "youtube", 30),
+    ("github.com", "website", 18),
+    ("en.wikipedia.org", "website", 12),
+    ("stackoverflow.com", "website", 10),
+    ("medium.com", "website", 8),
+    ("instagram.com", "instagram", 7),
+    ("facebook.com", "facebook", 6),
+    ("reddit.com", "website", 6),
+    ("news.ycombinator.com", "website", 4),
+    ("docs.python.org", "website", 4),
+    ("developer.mozilla.org", "website", 3),
+    ("arxiv.org", "website", 2),
+]
+LONG_TAIL_SITES = 2000
+LONG_TAIL_SHARE = 0.35
+
+CUSTOM_CATEGORIES = ["Recipes", "Reading List", "Travel", "Research", "Shopping", "Jobs", "Music"]
+SUB_CATEGORIES = {
+    "youtube": ["Tutorials", "Talks", "Music", "Podcasts"],
+    "website": ["Docs", "Blogs", "Tools", "News", "Courses", "Free Illustrations"],
+    "instagram": ["Photography", "Design"],
+    "facebook": ["Groups", "Events"],
+    "others": ["Later", "Favourites"],
+}
+TAGS = [
+    "python", "django", "javascript", "css", "design", "ml", "data", "devops", "linux", "career",
+    "productivity", "security", "databases", "react", "rust", "go", "testing", "ux", "math", "history",
+    "inspiration", "vector", "fonts", "tutorial", "reference", "cooking", "travel", "music", "finance", "health",
+]
+WORDS = [
+    "guide", "intro", "deep", "dive", "fast", "simple", "modern", "advanced", "notes", "tips",
+    "patterns", "scaling", "building", "understanding", "practical", "complete", "hidden", "better",
+    "api", "cache", "query", "index", "layout", "grid", "async", "stream", "memory", "search",
+]
+
+
+def zipf_weights(count, exponent=1.1):
+    """
+    Returns Zipf-like weights for `count` ranked items (1 / rank^exponent).
+    """
+    return [1 / (rank ** exponent) for rank in range(1, count + 1)]
+
+
+class BookmarkGenerator:
+    """
+    Produces unsaved UrlEntry objects for a user, see the module docstring.
+    """
+
+    def __init__(self, seed=None):
+        self.random = random.Random(seed)
+        self.now = timezone.now()
+        self.popular_weights = [weight for _, _, weight in POPULAR_SITES]
+        self.tail_weights = zipf_weights(LONG_TAIL_SITES)
+        self.tag_weights = zipf_weights(len(TAGS), exponent=0.9)
+
+    def site(self):
+        rand = self.random
+        if rand.random() < LONG_TAIL_SHARE:
+            rank = rand.choices(range(LONG_TAIL_SITES), self.tail_weights)[0]
+            category = "others" if rand.random() < 0.2 else "website"
+            return f"site{rank}.example.com", category
+        domain, category, _ = rand.choices(POPULAR_SITES, self.popular_weights)[0]
+        return domain, category
+
+    def path(self, domain, serial):
+        rand = self.random
+        if domain == "youtube.com":
+            return "/watch?v=" + "".join(rand.choices(string.ascii_letters + string.digits + "-_", k=11))
+        slug = "-".join(rand.sample(WORDS, rand.randint(1, 4)))
+        # The serial keeps the URLs of a user distinct however skewed the draws are.
+        return f"/{slug}-{serial}" + ("?utm_source=newsletter" if rand.random() < 0.05 else "")
+
+    def tags(self):
+        rand = self.random
+        count = rand.choices([0, 1, 2, 3, 4], [30, 30, 22, 12, 6])[0]
+        return ", ".join(dict.fromkeys(rand.choices(TAGS, self.tag_weights, k=count)))
+
+    def entry(self, user, serial):
+        rand = self.random
+        domain, category = self.site()
+        # Recent bookmarks are more common than old ones
+        created_at = self.now - timedelta(days=730 * rand.random() ** 2, seconds=rand.randrange(86400))
+        deleted_at = None
+        if rand.random() < 0.05:
+            deleted_at = self.now - timedelta(days=rand.uniform(0, trash_days() * 1.5))
+            created_at = min(created_at, deleted_at)
+        name = "" if rand.random() < 0.15 else " ".join(rand.sample(WORDS, rand.randint(2, 5))).title()
+        return UrlEntry(
+            user=user,
+            name=name,
+            url=f"https://{domain}{self.path(domain, serial)}",
+            category=category,
+            custom_category=rand.choice(CUSTOM_CATEGORIES) if category == "others" else "",
+            sub_category=rand.choice(SUB_CATEGORIES[category]) if rand.random() < 0.6 else "",
+            tags=self.tags(),
+            # Most bookmarks are hardly ever opened, a few all the time
+            visit_count=min(int(rand.paretovariate(1.2)) - 1, 100000),
+            is_deleted=deleted_at is not None,
+            deleted_at=deleted_at,
+            created_at=created_at,
+            updated_at=deleted_at or created_at,
+        )
+
+
+def set_dates(entries, dates):
+    """
+    Sets the (created_at, updated_at) of saved entries, one UPDATE per row
+    in a single executemany (much cheaper than bulk_update's CASE WHENs).
+    """
+    ops = connection.ops
+    table = ops.quote_name(UrlEntry._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"UPDATE {table} SET created_at = %s, updated_at = %s WHERE id = %s",
+            [
+                (ops.adapt_datetimefield_value(created_at), ops.adapt_datetimefield_value(updated_at), entry.pk)
+                for entry, (created_at, updated_at) in zip(entries, dates)
+            ],
+        )
+    for entry, (created_at, updated_at) in zip(entries, dates):
+        entry.created_at, entry.updated_at = created_at, updated_at
+
+
+def generate_bookmarks(users, per_user, seed=None, batch_size=None, on_batch=None):
+    """
+    Adds `per_user` generated bookmarks to every user in `users`, in bulk
+    inserts of `batch_size` rows (LINKBOX_IMPORT_BATCH_SIZE by default).
+    After each batch `on_batch(user, done)` is called. Returns the number of
+    bookmarks created.
+    """
+    generator = BookmarkGenerator(seed)
+    batch_size = batch_size or import_batch_size()
+    created = 0
+    for user in users:
+        hashes = set(UrlEntry.objects.filter(user=user).values_list('url_hash', flat=True))
+        serial = UrlEntry.objects.filter(user=user).count()
+        done = 0
+        while done < per_user:
+            batch = []
+            while len(batch) < min(batch_size, per_user - done):
+                serial += 1
+                entry = generator.entry(user, serial)
+                url_hash = canonical_url_hash(entry.url)
+                if url_hash not in hashes:
+                    hashes.add(url_hash)
+                    batch.append(entry)
+            dates = [(entry.created_at, entry.updated_at) for entry in batch]
+            with transaction.atomic():
+                UrlEntry.objects.bulk_create(batch)
+                sync_tags(batch)
+                # auto_now_add / auto_now overwrote the generated dates on insert
+                set_dates(batch, dates)
+            done += len(batch)
+            if on_batch:
+                on_batch(user, done)
+        created += done
+        reconcile(user)
+    bump_versions(user.pk for user in users)
+    return created
+
+
+def bench_users(count, prefix="bench", password=None):
+    """
+    Returns `count` users named <prefix>1, <prefix>2, ..., creating the
+    missing ones (with `password`, else an unusable one).
+    """
+    names = [f"{prefix}{i}" for i in range(1, count + 1)]
+    existing = {user.username: user for user in User.objects.filter(username__in=names)}
+    for name in names:
+        if name not in existing:
+            user = User(username=name)
+            if password:
+                user.set_password(password)
+            else:
+                user.set_unusable_password()
+            user.save()
+            existing[name] = user
+    return [existing[name] for name in names]
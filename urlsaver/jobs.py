@@ -0,0 +1,194 @@
+"""
+A small database-backed job queue for exports and imports that are too slow
+for the request/response cycle.
+
+Views queue a Job row and return its id straight away. `manage.py run_jobs`
+claims queued jobs one at a time, runs the handler registered for the job's
+kind and stores the progress, the result and any produced file on the row,
+where the job_status view picks them up for the polling page.
+
+No broker is needed: claiming is a conditional UPDATE, so several workers
+can share the queue safely.
+
+Only work that is too big to be done while the user waits is queued (see
+the LINKBOX_ASYNC_* thresholds), everything else stays synchronous, so a
+site running without a worker only loses the largest exports and imports.
+A running job records a heartbeat with its progress; the worker fails the
+jobs whose heartbeat is older than LINKBOX_JOB_STALE_AFTER seconds (their
+worker died) and deletes finished jobs and their files after
+LINKBOX_JOB_RESULT_TTL seconds.
+"""
+import tempfile
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.utils.timezone import now
+
+from .exports import build_urls_pdf
+from .importer import CsvImporter
+from .models import Job, UrlEntry
+
+HANDLERS = {}
+
+
+def async_export_threshold():
+    """
+    Returns the number of URLs above which a PDF export is queued.
+    """
+    return getattr(settings, 'LINKBOX_ASYNC_EXPORT_THRESHOLD', 5000)
+
+
+def stale_after():
+    """
+    Returns the number of seconds without a heartbeat after which a running
+    job is considered abandoned by its worker.
+    """
+    return getattr(settings, 'LINKBOX_JOB_STALE_AFTER', 600)
+
+
+def result_ttl():
+    """
+    Returns the number of seconds finished jobs and their files are kept.
+    """
+    return getattr(settings, 'LINKBOX_JOB_RESULT_TTL', 24 * 3600)
+
+
+def handler(kind):
+    """
+    Registers the decorated function as the handler for jobs of `kind`.
+    The handler receives the Job and returns the JSON-serializable result.
+    """
+    def register(func):
+        HANDLERS[kind] = func
+        return func
+    return register
+
+
+def enqueue(user, kind, params=None, input_file=None):
+    """
+    Queues a job of the given kind for the user and returns it.
+    """
+    job = Job(user=user, kind=kind, params=params or {})
+    if input_file is not None:
+        job.input_file.save(input_file.name, input_file, save=False)
+    job.save()
+    return job
+
+
+def claim_next():
+    """
+    Marks the oldest queued job as running and returns it, or returns None
+    if the queue is empty. Losing a race against another worker just moves
+    on to the next job.
+    """
+    while True:
+        job_id = Job.objects.filter(status=Job.QUEUED).order_by('created_at', 'id').values_list('id', flat=True).first()
+        if job_id is None:
+            return None
+        claimed = Job.objects.filter(pk=job_id, status=Job.QUEUED).update(
+            status=Job.RUNNING, started_at=now(), heartbeat_at=now())
+        if claimed:
+            return Job.objects.select_related('user').get(pk=job_id)
+
+
+def set_progress(job, progress, total=None):
+    """
+    Stores the job's progress without touching its other fields. This is
+    also the job's heartbeat, see fail_stale_jobs().
+    """
+    job.progress = progress
+    fields = {'progress': progress, 'heartbeat_at': now()}
+    if total is not None:
+        job.total = total
+        fields['total'] = total
+    Job.objects.filter(pk=job.pk).update(**fields)
+
+
+def run_job(job):
+    """
+    Runs a claimed job and records its outcome on the row.
+    """
+    try:
+        result = HANDLERS[job.kind](job)
+    except Exception:
+        job.status = Job.FAILED
+        job.error = traceback.format_exc(limit=5)
+    else:
+        job.status = Job.DONE
+        job.result = result
+        job.progress = max(job.progress, job.total)
+    job.finished_at = now()
+    job.save(update_fields=['status', 'result', 'error', 'progress', 'result_file', 'finished_at'])
+    return job
+
+
+def run_next():
+    """
+    Claims and runs one job. Returns the job, or None if nothing was queued.
+    """
+    job = claim_next()
+    if job is not None:
+        run_job(job)
+    return job
+
+
+def fail_stale_jobs():
+    """
+    Marks as failed the running jobs without a heartbeat for stale_after()
+    seconds: their worker was killed or crashed and they would otherwise
+    stay running forever. Returns the number of jobs failed.
+    """
+    return Job.objects.filter(status=Job.RUNNING, heartbeat_at__lt=now() - timedelta(seconds=stale_after())).update(
+        status=Job.FAILED, error='The worker stopped before finishing the job.', finished_at=now())
+
+
+def expire_jobs():
+    """
+    Deletes the jobs that finished more than result_ttl() seconds ago, with
+    their uploaded and produced files. Returns the number of jobs deleted.
+    """
+    expired = list(Job.objects.filter(finished_at__lt=now() - timedelta(seconds=result_ttl())))
+    for job in expired:
+        for file in (job.input_file, job.result_file):
+            if file:
+                file.delete(save=False)
+    return Job.objects.filter(pk__in=[job.pk for job in expired]).delete()[0]
+
+
+@handler(Job.EXPORT_PDF)
+def export_pdf(job):
+    """
+    Builds a PDF of the user's active URLs, or of the ids in params["ids"].
+    """
+    urls = UrlEntry.objects.filter(user=job.user, is_deleted=False)
+    ids = job.params.get('ids')
+    if ids:
+        urls = urls.filter(id__in=ids)
+    set_progress(job, 0, urls.count())
+
+    with tempfile.TemporaryFile() as out:
+        build_urls_pdf(
+            urls, out,
+            title="Selected URLs Export" if ids else "All URLs Export",
+            heading="LinkBOX URL Export" if ids else "LinkBOX URL Export - All URLs",
+            author=job.user.username,
+            on_progress=lambda done: set_progress(job, done),
+        )
+        out.seek(0)
+        filename = "urls_export.pdf" if ids else "all_urls_export.pdf"
+        job.result_file.save(f'{job.pk}-{filename}', File(out), save=False)
+    return {"filename": filename, "count": job.total}
+
+
+@handler(Job.IMPORT_CSV)
+def import_csv(job):
+    """
+    Imports the uploaded CSV stored in job.input_file.
+    """
+    with job.input_file.open('rb') as csv_file:
+        importer = CsvImporter(job.user, on_progress=lambda done: set_progress(job, done)).run_file(csv_file)
+    job.input_file.delete(save=False)
+    Job.objects.filter(pk=job.pk).update(input_file='')
+    return importer.report()
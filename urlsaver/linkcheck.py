@@ -0,0 +1,202 @@
+"""
+Link health checks, run by `manage.py check_links`.
+
+URLs are checked by a thread pool of LINKBOX_LINKCHECK_WORKERS threads, with
+at most LINKBOX_LINKCHECK_PER_HOST of them on the same host at a time: the
+URLs of a host are queued together and only that many workers drain the
+queue, so a collection dominated by one site neither hammers it nor holds up
+the other hosts. Every worker thread keeps its own requests.Session, so the
+checks on a host reuse its keep-alive connections.
+
+A URL is checked with a HEAD request first. Servers that reject HEAD or
+answer it with an error get a GET, of which only the headers are read.
+Hosts on private networks are refused like link previews are (see
+urlsaver.previews.check_public and LINKBOX_PREVIEW_ALLOW_PRIVATE), on every
+redirect too: redirects are followed one by one, at most MAX_REDIRECTS of
+them, and every request goes to the address that was checked.
+
+Entries are checked in primary key order, one batch at a time, and every
+batch's results are saved before the next one starts, so an interrupted run
+can carry on from the last saved entry.
+"""
+import threading
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlsplit
+
+import requests
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import LinkCheck, UrlEntry
+from .previews import MAX_REDIRECTS, PreviewError, check_public, open_pinned, pinned_session
+from .stats import bump_versions
+
+HEADERS = {"User-Agent": "LinkBOX-linkcheck/1.0"}
+
+
+def linkcheck_workers():
+    """
+    Returns the number of URLs checked in parallel.
+    """
+    return getattr(settings, 'LINKBOX_LINKCHECK_WORKERS', 16)
+
+
+def linkcheck_per_host():
+    """
+    Returns the maximum number of parallel checks on one host.
+    """
+    return getattr(settings, 'LINKBOX_LINKCHECK_PER_HOST', 2)
+
+
+def linkcheck_timeout():
+    """
+    Returns the timeout of one request, in seconds.
+    """
+    return getattr(settings, 'LINKBOX_LINKCHECK_TIMEOUT', 10)
+
+
+def linkcheck_batch_size():
+    """
+    Returns the number of entries checked (and saved) per batch.
+    """
+    return getattr(settings, 'LINKBOX_LINKCHECK_BATCH_SIZE', 500)
+
+
+_local = threading.local()
+
+
+def _session():
+    # One keep-alive session per worker thread.
+    if not hasattr(_local, "session"):
+        _local.session = pinned_session(HEADERS)
+    return _local.session
+
+
+def _status_code(method, url, timeout):
+    """
+    Requests `url` with `method`, following redirects after checking every
+    target with check_public, and returns the final status code. Raises
+    PreviewError for refused targets and redirect loops.
+    """
+    for _ in range(MAX_REDIRECTS + 1):
+        address = check_public(url)
+        with open_pinned(_session(), method, url, address, allow_redirects=False, timeout=timeout,
+                         stream=True) as response:
+            if not response.is_redirect:
+                return response.status_code
+            url = urljoin(url, response.headers["Location"])
+    raise PreviewError("Too many redirects.")
+
+
+def check_url(url, timeout):
+    """
+    Checks one URL. Returns (status, status_code, error), status being one
+    of the LinkCheck statuses.
+    """
+    try:
+        code = _status_code("HEAD", url, timeout)
+        if code >= 400:
+            # Plenty of servers don't implement HEAD (405, 501) or treat it
+            # differently; a GET has the last word.
+            code = _status_code("GET", url, timeout)
+    except PreviewError as exc:
+        return LinkCheck.UNREACHABLE, None, str(exc)
+    except requests.Timeout:
+        return LinkCheck.UNREACHABLE, None, "Timed out."
+    except requests.RequestException:
+        return LinkCheck.UNREACHABLE, None, "Could not connect."
+    return (LinkCheck.OK if code < 400 else LinkCheck.BROKEN), code, ""
+
+
+class LinkChecker:
+    """
+    Checks URLs concurrently with per-host limits. Use it as a context
+    manager; the worker threads (and their connections) are kept until it
+    exits.
+    """
+
+    def __init__(self, workers=None, per_host=None, timeout=None):
+        self.workers = workers or linkcheck_workers()
+        self.per_host = per_host or linkcheck_per_host()
+        self.timeout = timeout or linkcheck_timeout()
+        self._pool = None
+
+    def __enter__(self):
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="linkbox-linkcheck")
+        return self
+
+    def __exit__(self, *exc_info):
+        self._pool.shutdown(wait=True)
+
+    def check(self, urls):
+        """
+        Checks every distinct URL in `urls`. Returns {url: (status,
+        status_code, error)}.
+        """
+        by_host = defaultdict(deque)
+        for url in dict.fromkeys(urls):
+            by_host[urlsplit(url).hostname or ""].append(url)
+        results = {}
+
+        def drain(queue):
+            while True:
+                try:
+                    url = queue.popleft()
+                except IndexError:
+                    return
+                results[url] = check_url(url, self.timeout)
+
+        futures = [
+            self._pool.submit(drain, queue)
+            for queue in by_host.values()
+            for _ in range(min(self.per_host, len(queue)))
+        ]
+        for future in futures:
+            future.result()
+        return results
+
+
+def save_results(rows, results):
+    """
+    Stores the results of a batch, rows being (entry id, user id, url), and
+    bumps the owners' collection versions so their cached pages are
+    revalidated. Entries deleted in the meantime are skipped.
+    """
+    moment = timezone.now()
+    with transaction.atomic():
+        existing = set(UrlEntry.objects.filter(pk__in=[pk for pk, _, _ in rows]).values_list('pk', flat=True))
+        checks = [
+            LinkCheck(entry_id=pk, status=status, status_code=code, error=error[:255], checked_at=moment)
+            for pk, _, url in rows if pk in existing
+            for status, code, error in [results[url]]
+        ]
+        LinkCheck.objects.bulk_create(
+            checks, update_conflicts=True, unique_fields=['entry'],
+            update_fields=['status', 'status_code', 'error', 'checked_at'],
+        )
+        bump_versions(user_id for pk, user_id, _ in rows if pk in existing)
+    return checks
+
+
+def check_links(entries, after=0, batch_size=None, on_batch=None, **checker_options):
+    """
+    Checks the URLs of `entries` (a UrlEntry queryset) with a primary key
+    greater than `after`, in primary key order, and stores the results.
+    After each batch `on_batch(last_id, totals)` is called, e.g. to save a
+    checkpoint. Returns the totals, a Counter of statuses.
+    """
+    batch_size = batch_size or linkcheck_batch_size()
+    totals = Counter()
+    with LinkChecker(**checker_options) as checker:
+        while True:
+            rows = list(entries.filter(pk__gt=after).order_by('pk').values_list('pk', 'user_id', 'url')[:batch_size])
+            if not rows:
+                break
+            results = checker.check(url for _, _, url in rows)
+            totals.update(check.status for check in save_results(rows, results))
+            after = rows[-1][0]
+            if on_batch:
+                on_batch(after, totals)
+    return totals
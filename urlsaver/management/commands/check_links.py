@@ -0,0 +1,56 @@
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from urlsaver.linkcheck import check_links
+from urlsaver.models import LinkCheck, UrlEntry
+
+
+class Command(BaseCommand):
+    help = ("Checks whether the URLs of active entries still work and stores the results. "
+            "An interrupted run resumes from its checkpoint file unless --restart is given.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", help="Only check the entries of this username.")
+        parser.add_argument("--batch-size", type=int, help="Entries checked and saved per batch.")
+        parser.add_argument("--workers", type=int, help="URLs checked in parallel.")
+        parser.add_argument("--per-host", type=int, help="Parallel checks per host.")
+        parser.add_argument("--timeout", type=float, help="Seconds to wait for each request.")
+        parser.add_argument("--checkpoint", help="Checkpoint file (default: LINKBOX_LINKCHECK_CHECKPOINT).")
+        parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and start over.")
+
+    def handle(self, *args, **options):
+        entries = UrlEntry.objects.filter(is_deleted=False)
+        if options["user"]:
+            entries = entries.filter(user__username=options["user"])
+            if not entries.exists():
+                raise CommandError(f"No active entries for user {options['user']!r}.")
+
+        path = options["checkpoint"] or getattr(settings, "LINKBOX_LINKCHECK_CHECKPOINT", "check_links.checkpoint.json")
+        after = 0
+        if not options["restart"] and os.path.exists(path):
+            with open(path) as f:
+                checkpoint = json.load(f)
+            if checkpoint.get("user") == options["user"]:
+                after = checkpoint["after"]
+                self.stdout.write(f"Resuming after entry #{after}.")
+
+        def save_checkpoint(last_id, totals):
+            with open(path + ".tmp", "w") as f:
+                json.dump({"after": last_id, "user": options["user"]}, f)
+            os.replace(path + ".tmp", path)
+            self.stdout.write(f"Checked up to entry #{last_id}: " + ", ".join(
+                f"{totals[status]} {label.lower()}" for status, label in LinkCheck.STATUS_CHOICES))
+
+        totals = check_links(
+            entries, after=after, batch_size=options["batch_size"], on_batch=save_checkpoint,
+            workers=options["workers"], per_host=options["per_host"], timeout=options["timeout"],
+        )
+        if os.path.exists(path):
+            os.remove(path)
+        self.stdout.write(self.style.SUCCESS(
+            f"Checked {sum(totals.values())} link(s): {totals[LinkCheck.BROKEN]} broken, "
+            f"{totals[LinkCheck.UNREACHABLE]} unreachable."
+        ))
@@ -0,0 +1,21 @@
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand, CommandError
+
+from urlsaver.visits import flush_visits, visit_cache
+
+
+class Command(BaseCommand):
+    help = "Writes the buffered URL visit counts to the database."
+
+    def handle(self, *args, **options):
+        if isinstance(visit_cache(), LocMemCache):
+            # This process's memory holds none of the workers' clicks.
+            raise CommandError(
+                "The visit buffer is in a local-memory cache, which only the process that filled it can "
+                "read. Set LINKBOX_VISIT_CACHE to a cache shared between processes (database, redis, "
+                "memcached) to flush it from here."
+            )
+        flushed = flush_visits()
+        self.stdout.write(self.style.SUCCESS(
+            f"Flushed {sum(flushed.values())} visit(s) for {len({entry_id for entry_id, _ in flushed})} URL(s)."
+        ))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from urlsaver.generator import bench_users, generate_bookmarks
+
+
+class Command(BaseCommand):
+    help = ("Creates USERS users (<prefix>1, <prefix>2, ...) if missing and adds BOOKMARKS generated "
+            "bookmarks to each, with realistic site, category, tag and visit distributions. "
+            "For benchmarks and load tests.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1, help="Number of users (default: 1).")
+        parser.add_argument("--bookmarks", type=int, default=1000, help="Bookmarks per user (default: 1000).")
+        parser.add_argument("--prefix", default="bench", help="Username prefix (default: bench).")
+        parser.add_argument("--password", help="Password of the created users (default: unusable).")
+        parser.add_argument("--seed", type=int, help="Random seed, for reproducible data.")
+        parser.add_argument("--batch-size", type=int, help="Rows per bulk insert (default: LINKBOX_IMPORT_BATCH_SIZE).")
+
+    def handle(self, *args, **options):
+        users = bench_users(options["users"], prefix=options["prefix"], password=options["password"])
+        per_user = options["bookmarks"]
+        created = generate_bookmarks(
+            users, per_user, seed=options["seed"], batch_size=options["batch_size"],
+            on_batch=lambda user, done: self.stdout.write(f"{user.username}: {done}/{per_user}"),
+        )
+        self.stdout.write(self.style.SUCCESS(f"Created {created} bookmarks for {len(users)} user(s)."))
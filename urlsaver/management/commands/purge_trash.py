@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from urlsaver.models import UrlEntry, purge_expired, trash_days
+
+
+class Command(BaseCommand):
+    help = ("Permanently deletes the entries that have been in the trash for longer than "
+            "LINKBOX_TRASH_DAYS days, in small batches. Meant to be run daily, e.g. from cron.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, help="Rows deleted per batch (default: LINKBOX_PURGE_BATCH_SIZE).")
+        parser.add_argument("--sleep", type=float, help="Seconds to pause between batches (default: LINKBOX_PURGE_SLEEP).")
+        parser.add_argument("--dry-run", action="store_true", help="Only count the expired entries.")
+
+    def handle(self, *args, **options):
+        dry_run = options["dry_run"]
+        total = UrlEntry.objects.expired().count()
+        verb = "Would purge" if dry_run else "Purged"
+        self.stdout.write(f"{total} entr{'y' if total == 1 else 'ies'} in the trash for more than {trash_days()} days.")
+
+        purged = purge_expired(
+            batch_size=options["batch_size"], sleep=options["sleep"], dry_run=dry_run,
+            on_batch=lambda done: self.stdout.write(f"{verb} {done}/{total}"),
+        )
+        self.stdout.write(self.style.SUCCESS(f"{verb} {purged} expired entr{'y' if purged == 1 else 'ies'}."))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from urlsaver.stats import reconcile_all
+
+
+class Command(BaseCommand):
+    help = "Recomputes the cached per-user URL and visit counters from the URL entries."
+
+    def handle(self, *args, **options):
+        checked, drifted = reconcile_all()
+        self.stdout.write(self.style.SUCCESS(
+            f"Checked {checked} user(s), fixed {drifted} with drifted counters."
+        ))
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from urlsaver.jobs import expire_jobs, fail_stale_jobs, run_next
+
+
+class Command(BaseCommand):
+    help = ("Runs queued export and import jobs. Keeps polling the queue unless --once is given. "
+            "Abandoned and expired jobs are cleaned up whenever the queue is empty.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Exit once the queue is empty.")
+        parser.add_argument("--sleep", type=float, default=2.0, help="Seconds to wait when the queue is empty.")
+
+    def handle(self, *args, **options):
+        while True:
+            job = run_next()
+            if job is not None:
+                self.stdout.write(f"{job}: {job.error.strip().splitlines()[-1] if job.error else 'ok'}")
+                continue
+            failed, expired = fail_stale_jobs(), expire_jobs()
+            if failed or expired:
+                self.stdout.write(f"{failed} abandoned job(s) failed, {expired} expired job(s) deleted")
+            if options["once"]:
+                break
+            time.sleep(options["sleep"])
@@ -0,0 +1,86 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:36
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def split_tags(apps, schema_editor):
+    """
+    Creates Tag and UrlTag rows from the comma separated UrlEntry.tags strings
+    and rewrites those strings in their normalized form. Like
+    models.join_tags, whole tags that would take a string past the column's
+    255 characters are dropped, and get no UrlTag row either.
+    """
+    UrlEntry = apps.get_model('urlsaver', 'UrlEntry')
+    Tag = apps.get_model('urlsaver', 'Tag')
+    UrlTag = apps.get_model('urlsaver', 'UrlTag')
+
+    tag_ids = {}
+    links = []
+    changed = []
+    for entry in UrlEntry.objects.exclude(tags='').only('id', 'user_id', 'tags').iterator(chunk_size=1000):
+        names = []
+        for name in entry.tags.split(','):
+            name = name.strip().lower()[:100]
+            if name and name not in names:
+                names.append(name)
+        normalized = ''
+        for index, name in enumerate(names):
+            candidate = f'{normalized}, {name}' if normalized else name
+            if len(candidate) > 255:
+                del names[index:]
+                break
+            normalized = candidate
+        for name in names:
+            key = (entry.user_id, name)
+            if key not in tag_ids:
+                tag_ids[key] = Tag.objects.create(user_id=entry.user_id, name=name).pk
+            links.append(UrlTag(entry_id=entry.pk, tag_id=tag_ids[key]))
+        if normalized != entry.tags:
+            entry.tags = normalized
+            changed.append(entry)
+
+    UrlTag.objects.bulk_create(links, batch_size=1000)
+    UrlEntry.objects.bulk_update(changed, ['tags'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('urlsaver', '0002_urlentry_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tags', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='UrlTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entry', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='urlsaver.urlentry')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='urlsaver.tag')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='urlentry',
+            name='tag_set',
+            field=models.ManyToManyField(blank=True, related_name='entries', through='urlsaver.UrlTag', to='urlsaver.tag'),
+        ),
+        migrations.AddConstraint(
+            model_name='tag',
+            constraint=models.UniqueConstraint(fields=('user', 'name'), name='urlsaver_tag_unique_user_name'),
+        ),
+        migrations.AddConstraint(
+            model_name='urltag',
+            constraint=models.UniqueConstraint(fields=('tag', 'entry'), name='urlsaver_urltag_unique_tag_entry'),
+        ),
+        migrations.RunPython(split_tags, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('urlsaver', '0003_tags'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='urlentry',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['user', '-created_at', '-id'], name='urlentry_user_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='urlentry',
+            index=models.Index(condition=models.Q(('is_deleted', True)), fields=['user', '-deleted_at', '-id'], name='urlentry_user_trash_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='urlentry',
+            index=models.Index(fields=['user', 'url'], name='urlentry_user_url_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='urlentry',
+            index=models.Index(condition=models.Q(('is_deleted', True)), fields=['deleted_at'], name='urlentry_purge_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.4 on 2026-10-18 17:19
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('urlsaver', '0005_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='url_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('active_count', models.IntegerField(default=0)),
+                ('trashed_count', models.IntegerField(default=0)),
+                ('visit_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'user stats',
+            },
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.4 on 2026-10-18 17:25
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+from django.db.models.functions import Coalesce
+
+
+def backfill_updated_at(apps, schema_editor):
+    """
+    Existing rows got the migration time as updated_at. Use the last change
+    that is known instead: the deletion for trashed rows, else the creation.
+    """
+    UrlEntry = apps.get_model('urlsaver', 'UrlEntry')
+    UrlEntry.objects.update(updated_at=Coalesce(F('deleted_at'), F('created_at')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('urlsaver', '0006_userstats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entry_id', models.IntegerField()),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='urlentry',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='urlentry',
+            index=models.Index(fields=['user', 'updated_at', 'id'], name='urlentry_user_updated_idx'),
+        ),
+        migrations.AddField(
+            model_name='tombstone',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tombstones', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['user', 'deleted_at', 'id'], name='tombstone_user_deleted_idx'),
+        ),
+    ]
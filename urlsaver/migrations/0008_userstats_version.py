@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 17:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('urlsaver', '0007_sync'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='version',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
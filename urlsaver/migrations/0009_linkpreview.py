@@ -0,0 +1,27 @@
+# Generated by Django 5.2.4 on 2026-10-18 17:36
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('urlsaver', '0008_userstats_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LinkPreview',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url_hash', models.CharField(max_length=64, unique=True)),
+                ('url', models.URLField(max_length=2000)),
+                ('title', models.CharField(blank=True, max_length=300)),
+                ('description', models.TextField(blank=True)),
+                ('image', models.URLField(blank=True, max_length=2000)),
+                ('error', models.CharField(blank=True, max_length=255)),
+                ('fetched_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-18 17:40
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('urlsaver', '0009_linkpreview'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LinkCheck',
+            fields=[
+                ('entry', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='link_check', serialize=False, to='urlsaver.urlentry')),
+                ('status', models.CharField(choices=[('ok', 'OK'), ('broken', 'Broken'), ('unreachable', 'Unreachable')], max_length=12)),
+                ('status_code', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('error', models.CharField(blank=True, max_length=255)),
+                ('checked_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'entry'], name='linkcheck_status_idx')],
+            },
+        ),
+    ]
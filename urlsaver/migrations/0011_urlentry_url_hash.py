@@ -0,0 +1,149 @@
+# Generated by Django 5.2.4 on 2026-10-18 19:02
+
+import hashlib
+import re
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from django.db import migrations, models
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+# A frozen copy of urlsaver.utils.canonical_url_hash as of this migration,
+# so that later changes to the canonical form don't change which rows it
+# merges.
+_tracking_param_re = re.compile(
+    r"^(utm_\w+|fbclid|gclid|dclid|gbraid|wbraid|msclkid|yclid|mc_cid|mc_eid|igshid|_hsenc|_hsmi|mkt_tok)$", re.I)
+
+
+def canonical_url_hash(url):
+    url = (url or "").strip()
+    parts = urlsplit(url if "//" in url else "//" + url)
+    scheme = parts.scheme.lower()
+    if scheme in ("", "http"):
+        scheme = "https"
+    netloc = parts.netloc.lower()
+    if parts.hostname:
+        netloc = f"[{parts.hostname}]" if ":" in parts.hostname else parts.hostname.rstrip(".")
+        try:
+            port = parts.port
+        except ValueError:
+            port = None
+        if port and port not in (80, 443):
+            netloc += f":{port}"
+        userinfo = parts.netloc.rpartition("@")[0]
+        if userinfo:
+            netloc = f"{userinfo}@{netloc}"
+    query = urlencode(sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not _tracking_param_re.match(key)
+    ))
+    canonical = urlunsplit((scheme, netloc, parts.path.rstrip("/"), query, parts.fragment))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def _merge_tags(*values):
+    """
+    Returns the distinct tag names of the tag strings `values`, without the
+    whole tags that would take the joined string past 255 characters.
+    """
+    names, joined = [], ''
+    for value in values:
+        for name in (value or '').split(','):
+            name = name.strip().lower()
+            if not name or name in names:
+                continue
+            candidate = f'{joined}, {name}' if joined else name
+            if len(candidate) > 255:
+                return names
+            names.append(name)
+            joined = candidate
+    return names
+
+
+def backfill_url_hash(apps, schema_editor):
+    """
+    Hashes the existing URLs, one user at a time, and merges the entries
+    that turn out to be duplicates: the oldest active one (else the oldest
+    trashed one) is kept and gets the others' visits and tags, the others
+    are deleted with a tombstone for sync clients. The counters and the
+    collection version of the users concerned are updated.
+    """
+    UrlEntry = apps.get_model('urlsaver', 'UrlEntry')
+    UrlTag = apps.get_model('urlsaver', 'UrlTag')
+    Tombstone = apps.get_model('urlsaver', 'Tombstone')
+    UserStats = apps.get_model('urlsaver', 'UserStats')
+
+    def merge(duplicates):
+        for keeper, dups in duplicates.values():
+            dup_ids = [entry.pk for entry in dups]
+            names = _merge_tags(keeper.tags, *(entry.tags for entry in dups))
+            # The keeper is linked to exactly the tags left in its string.
+            tag_ids = dict(UrlTag.objects.filter(entry_id__in=[keeper.pk, *dup_ids])
+                           .values_list('tag__name', 'tag_id'))
+            wanted = {tag_ids[name] for name in names if name in tag_ids}
+            linked = set(UrlTag.objects.filter(entry_id=keeper.pk).values_list('tag_id', flat=True))
+            UrlTag.objects.filter(entry_id=keeper.pk).exclude(tag_id__in=wanted).delete()
+            UrlTag.objects.bulk_create([UrlTag(entry_id=keeper.pk, tag_id=tag_id) for tag_id in wanted - linked])
+            UrlEntry.objects.filter(pk=keeper.pk).update(
+                visit_count=F('visit_count') + sum(entry.visit_count for entry in dups),
+                tags=', '.join(names),
+                updated_at=timezone.now(),
+            )
+            Tombstone.objects.bulk_create([
+                Tombstone(user_id=keeper.user_id, entry_id=pk, deleted_at=timezone.now()) for pk in dup_ids
+            ])
+            UrlEntry.objects.filter(pk__in=dup_ids).delete()
+
+    # Active rows first, oldest first: the first row of a URL is the keeper.
+    rows = UrlEntry.objects.order_by('user_id', 'is_deleted', 'created_at', 'id').only(
+        'id', 'user_id', 'url', 'tags', 'visit_count')
+    batch, affected_users = [], set()
+    current_user, keepers, duplicates = None, {}, {}
+    for entry in rows.iterator(chunk_size=2000):
+        if entry.user_id != current_user:
+            merge(duplicates)
+            current_user, keepers, duplicates = entry.user_id, {}, {}
+        url_hash = canonical_url_hash(entry.url)
+        keeper = keepers.get(url_hash)
+        if keeper is not None:
+            duplicates.setdefault(url_hash, (keeper, []))[1].append(entry)
+            affected_users.add(entry.user_id)
+            continue
+        entry.url_hash = url_hash
+        keepers[url_hash] = entry
+        batch.append(entry)
+        if len(batch) >= 1000:
+            UrlEntry.objects.bulk_update(batch, ['url_hash'])
+            batch = []
+    merge(duplicates)
+    UrlEntry.objects.bulk_update(batch, ['url_hash'])
+
+    for user_id in affected_users:
+        totals = UrlEntry.objects.filter(user_id=user_id).aggregate(
+            active_count=Count('id', filter=Q(is_deleted=False)),
+            trashed_count=Count('id', filter=Q(is_deleted=True)),
+            visit_count=Coalesce(Sum('visit_count'), 0),
+        )
+        UserStats.objects.filter(user_id=user_id).update(**totals, version=F('version') + 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('urlsaver', '0010_linkcheck'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='urlentry',
+            name='url_hash',
+            field=models.CharField(default='', editable=False, max_length=64),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_url_hash, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='urlentry',
+            name='urlentry_user_url_idx',
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.4 on 2026-10-18 19:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Separate from 0011 so that the constraint isn't added in the
+    # transaction that merged the duplicates (PostgreSQL refuses to alter a
+    # table with pending deferred foreign key checks).
+
+    dependencies = [
+        ('urlsaver', '0011_urlentry_url_hash'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='urlentry',
+            constraint=models.UniqueConstraint(fields=('user', 'url_hash'), name='urlentry_user_url_hash_uniq'),
+        ),
+    ]
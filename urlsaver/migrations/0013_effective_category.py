@@ -0,0 +1,39 @@
+# Generated by Django 5.2.4 on 2026-10-18 17:53
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Coalesce
+
+
+def backfill_effective_category(apps, schema_editor):
+    """
+    Stores the category every existing row shows: custom_category for
+    "others", else category.
+    """
+    UrlEntry = apps.get_model('urlsaver', 'UrlEntry')
+    UrlEntry.objects.update(effective_category=Case(
+        When(category='others', then=F('custom_category')),
+        default=Coalesce(F('category'), Value('')),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('urlsaver', '0012_urlentry_url_hash_uniq'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='urlentry',
+            name='effective_category',
+            field=models.CharField(blank=True, editable=False, max_length=100),
+        ),
+        migrations.RunPython(backfill_effective_category, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='urlentry',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['user', 'effective_category', 'sub_category'], name='urlentry_user_category_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+from django.db import migrations
+
+
+def rebuild(apps, schema_editor):
+    """
+    The PostgreSQL search column is only added when missing, so drop it to
+    have it generated again from the fixed document expression. The SQLite
+    FTS table indexes every column separately and is left alone.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    from urlsaver.search import install_search_index, uninstall_search_index
+    uninstall_search_index(schema_editor.connection)
+    install_search_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('urlsaver', '0013_effective_category'),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild, migrations.RunPython.noop),
+    ]
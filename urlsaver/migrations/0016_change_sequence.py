@@ -0,0 +1,55 @@
+# Generated by Django 5.2.4 on 2026-10-18 18:32
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('urlsaver', '0015_job_heartbeat_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeSequence',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='change_sequence', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name='tombstone',
+            name='tombstone_user_deleted_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='urlentry',
+            name='urlentry_user_updated_idx',
+        ),
+        migrations.AddField(
+            model_name='tombstone',
+            name='change_seq',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='urlentry',
+            name='change_seq',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='tombstone',
+            name='entry_id',
+            field=models.BigIntegerField(),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['user', 'change_seq', 'id'], name='tombstone_user_change_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='urlentry',
+            index=models.Index(fields=['user', 'change_seq', 'id'], name='urlentry_user_change_idx'),
+        ),
+    ]
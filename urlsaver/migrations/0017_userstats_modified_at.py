@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-18 19:05
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('urlsaver', '0016_change_sequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='modified_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
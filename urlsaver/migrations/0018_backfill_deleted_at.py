@@ -0,0 +1,25 @@
+# Generated by Django 5.2.4 on 2026-10-18 20:10
+
+from django.db import migrations
+from django.utils import timezone
+
+
+def backfill_deleted_at(apps, schema_editor):
+    """
+    Trashed rows without a deletion time (from before it was always set)
+    match neither the trash nor the expired predicate. Their retention
+    period starts now.
+    """
+    UrlEntry = apps.get_model('urlsaver', 'UrlEntry')
+    UrlEntry.objects.filter(is_deleted=True, deleted_at__isnull=True).update(deleted_at=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('urlsaver', '0017_userstats_modified_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_deleted_at, migrations.RunPython.noop),
+    ]
@@ -1,32 +1,293 @@
 from django.db import models
 
 # Create your models here.
-from django.db import models
+import time
+
+from django.conf import settings
+from django.db import models, transaction
 from django.utils import timezone
 from datetime import timedelta
 from django.contrib.auth.models import User
 
+from .utils import canonical_url_hash
+
+def parse_tags(value):
+    """
+    Splits a comma separated tag string into a list of tag names.
+
+    Names are stripped and lowercased, empty and repeated names are dropped
+    and the original order is kept.
+    """
+    names = []
+    for name in (value or '').split(','):
+        name = name.strip().lower()[:Tag.NAME_MAX_LENGTH]
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def forget_checks(old_urls):
+    """
+    Drops what was found out about the URLs entries had before their URL was
+    changed: the entries' LinkCheck rows and the stored previews of the old
+    URLs (refetched on demand by whoever still saves them). `old_urls` maps
+    entry ids to their previous URL.
+    """
+    from .previews import url_hash
+
+    if old_urls:
+        LinkCheck.objects.filter(entry__in=list(old_urls)).delete()
+        LinkPreview.objects.filter(url_hash__in=[url_hash(url) for url in old_urls.values()]).delete()
+
+
+def join_tags(names):
+    """
+    Joins tag names into the comma separated string stored in UrlEntry.tags.
+
+    The string must fit the column, so tags that would take it past
+    UrlEntry.TAGS_MAX_LENGTH characters are left out, whole tags only.
+    """
+    joined = ''
+    for name in names:
+        candidate = f'{joined}, {name}' if joined else name
+        if len(candidate) > UrlEntry.TAGS_MAX_LENGTH:
+            break
+        joined = candidate
+    return joined
+
+
+class Tag(models.Model):
+    """
+    A tag owned by a user. URL entries are linked to their tags through
+    UrlTag, so filtering and counting by tag is an indexed join.
+    """
+    NAME_MAX_LENGTH = 100
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='tags')
+    name = models.CharField(max_length=NAME_MAX_LENGTH)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'name'], name='urlsaver_tag_unique_user_name'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class UrlTag(models.Model):
+    # Join table between UrlEntry and Tag.
+    entry = models.ForeignKey('UrlEntry', on_delete=models.CASCADE)
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['tag', 'entry'], name='urlsaver_urltag_unique_tag_entry'),
+        ]
+
+
+def trash_days():
+    """
+    Returns the number of days trashed entries can be restored for.
+    """
+    return getattr(settings, 'LINKBOX_TRASH_DAYS', 30)
+
+
+def trash_cutoff():
+    """
+    Returns the deletion time before which trashed entries have expired.
+    """
+    return timezone.now() - timedelta(days=trash_days())
+
+
+class UrlEntryQuerySet(models.QuerySet):
+    """
+    The predicates the views and commands select entries with, each matching
+    one of UrlEntry's partial indexes, and url_hash / change_seq upkeep on
+    the bulk write paths, which bypass save().
+    """
+
+    def active(self):
+        """
+        Entries that are not in the trash.
+        """
+        return self.filter(is_deleted=False)
+
+    def trashed(self, cutoff=None):
+        """
+        Entries in the trash that can still be restored.
+        """
+        return self.filter(is_deleted=True, deleted_at__gte=cutoff or trash_cutoff())
+
+    def expired(self, cutoff=None):
+        """
+        Entries that have been in the trash for longer than trash_days(),
+        see purge_expired(). UrlEntry.is_expired() is the same test.
+        """
+        return self.filter(is_deleted=True, deleted_at__lt=cutoff or trash_cutoff())
+
+    def with_url(self, url):
+        """
+        Filters on entries whose URL is a duplicate of `url` (see
+        utils.canonicalize_url), through the (user, url_hash) index.
+        """
+        return self.filter(url_hash=canonical_url_hash(url))
+
+    def bulk_create(self, objs, *args, **kwargs):
+        from .sync import next_change_seqs
+
+        objs = list(objs)
+        for obj in objs:
+            obj.url_hash = obj.url_hash or canonical_url_hash(obj.url)
+            obj.effective_category = obj.compute_effective_category()
+        with transaction.atomic(using=self.db, savepoint=False):
+            # Objects already stamped by the caller (once for a whole
+            # transaction, see CsvImporter) keep their number.
+            seqs = next_change_seqs(obj.user_id for obj in objs if not obj.change_seq)
+            for obj in objs:
+                obj.change_seq = obj.change_seq or seqs[obj.user_id]
+            return super().bulk_create(objs, *args, **kwargs)
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        from .sync import next_change_seqs
+
+        objs = list(objs)
+        fields = [*fields, 'change_seq']
+        moved = []
+        if 'url' in fields:
+            for obj in objs:
+                url_hash = canonical_url_hash(obj.url)
+                if obj.pk is not None and obj.url_hash != url_hash:
+                    moved.append(obj.pk)
+                obj.url_hash = url_hash
+            fields = [*fields, 'url_hash']
+        if 'category' in fields or 'custom_category' in fields:
+            for obj in objs:
+                obj.effective_category = obj.compute_effective_category()
+            fields = [*fields, 'effective_category']
+        with transaction.atomic(using=self.db, savepoint=False):
+            seqs = next_change_seqs(obj.user_id for obj in objs)
+            for obj in objs:
+                obj.change_seq = seqs[obj.user_id]
+            if moved:
+                forget_checks(dict(self.model.objects.filter(pk__in=moved).values_list('pk', 'url')))
+            return super().bulk_update(objs, fields, *args, **kwargs)
+
+
 class UrlEntry(models.Model):
+    TAGS_MAX_LENGTH = 255
+
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     name = models.CharField(max_length=255, blank=True)
     url = models.URLField()
+    # sha256 of the canonical URL, unique per user: duplicate detection is a
+    # single index lookup. Set by save() and by the bulk writes of
+    # UrlEntryQuerySet; QuerySet.update(url=...) must set it too.
+    url_hash = models.CharField(max_length=64, editable=False)
     category = models.CharField(max_length=100, null=True, blank=True)
     custom_category = models.CharField(max_length=100, blank=True)
     sub_category = models.CharField(max_length=100, blank=True)
-    tags = models.CharField(max_length=255, blank=True)
+    # The category shown and filtered on: custom_category for "others",
+    # else category. Set by save() and the bulk writes of UrlEntryQuerySet.
+    effective_category = models.CharField(max_length=100, blank=True, editable=False)
+    # Comma separated copy of the entry's tags, kept for display, search and
+    # the CSV/PDF/API formats. The normalized tags live in tag_set.
+    tags = models.CharField(max_length=TAGS_MAX_LENGTH, blank=True)
+    tag_set = models.ManyToManyField(Tag, through=UrlTag, related_name='entries', blank=True)
     visit_count = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     is_deleted = models.BooleanField(default=False)
     deleted_at = models.DateTimeField(null=True, blank=True)
+    # Time of the last change of any kind. QuerySet.update() calls on
+    # UrlEntry must set it explicitly.
+    updated_at = models.DateTimeField(auto_now=True)
+    # Number of the last change in the owner's change sequence, what the
+    # /api/sync/ cursor is made of (see urlsaver.sync). Set by save() and the
+    # bulk writes of UrlEntryQuerySet; QuerySet.update() calls on UrlEntry
+    # must set it too, from next_change_seqs() in the same transaction.
+    change_seq = models.BigIntegerField(default=0, editable=False)
+
+    objects = UrlEntryQuerySet.as_manager()
 
-    def effective_category(self):
+    class Meta:
+        # One index per hot access path, see urlsaver/views.py. They are
+        # partial on is_deleted because Django compiles is_deleted=True/False
+        # to "is_deleted" / "NOT is_deleted", which can't be used as an
+        # equality prefix of a composite index but does match a partial one.
+        indexes = [
+            # index, activity_data, export_all_*: user's active rows newest
+            # first; also serves the keyset pagination cursor.
+            models.Index(fields=['user', '-created_at', '-id'], name='urlentry_user_active_idx',
+                         condition=models.Q(is_deleted=False)),
+            # trash_data: user's trash ordered by deletion time.
+            models.Index(fields=['user', '-deleted_at', '-id'], name='urlentry_user_trash_idx',
+                         condition=models.Q(is_deleted=True)),
+            # purge_expired: trashed rows past the retention period.
+            models.Index(fields=['deleted_at'], name='urlentry_purge_idx',
+                         condition=models.Q(is_deleted=True)),
+            # Category filter and the category facets (a GROUP BY on the
+            # user's active rows, answered from the index alone).
+            models.Index(fields=['user', 'effective_category', 'sub_category'], name='urlentry_user_category_idx',
+                         condition=models.Q(is_deleted=False)),
+            # /api/sync/: a user's changes in the order they were committed.
+            models.Index(fields=['user', 'change_seq', 'id'], name='urlentry_user_change_idx'),
+        ]
+        constraints = [
+            # One entry per canonical URL and user, trashed ones included;
+            # also the duplicate check of every write path.
+            models.UniqueConstraint(fields=['user', 'url_hash'], name='urlentry_user_url_hash_uniq'),
+        ]
+
+    def save(self, *args, **kwargs):
+        """
+        Saves the entry, stamped with the next number of the owner's change
+        sequence, and keeps its tag_set in line with the tags string. A new
+        URL drops the link check and preview of the old one (forget_checks).
         """
-        Returns the effective category of the URL entry.
+        from .sync import next_change_seq
+
+        self.tags = join_tags(parse_tags(self.tags))
+        url_hash = canonical_url_hash(self.url)
+        # Deferred when loaded with only(): the URL wasn't loaded to be edited
+        moved = (self.pk is not None and not self._state.adding and 'url_hash' not in self.get_deferred_fields()
+                 and self.url_hash != url_hash)
+        self.url_hash = url_hash
+        self.effective_category = self.compute_effective_category()
+        if self.is_deleted and self.deleted_at is None:
+            # Trashed entries always carry a deletion time, the trash is
+            # ordered and paginated by it.
+            self.deleted_at = timezone.now()
+        if kwargs.get('update_fields') is not None:
+            # auto_now is only written when listed, every save is a change
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'updated_at', 'change_seq'}
+            if 'url' in kwargs['update_fields']:
+                kwargs['update_fields'].add('url_hash')
+            if kwargs['update_fields'] & {'category', 'custom_category'}:
+                kwargs['update_fields'].add('effective_category')
+        with transaction.atomic(using=kwargs.get('using'), savepoint=False):
+            self.change_seq = next_change_seq(self.user_id)
+            if moved:
+                forget_checks(dict(UrlEntry.objects.filter(pk=self.pk).values_list('pk', 'url')))
+            super().save(*args, **kwargs)
+            update_fields = kwargs.get('update_fields')
+            if update_fields is None or 'tags' in update_fields:
+                sync_tags([self])
+
+    def tag_names(self):
+        """
+        Returns the entry's tags as a list of names.
+        """
+        return parse_tags(self.tags)
+
+    def compute_effective_category(self):
+        """
+        Returns the effective category of the URL entry, as stored in
+        effective_category.
 
         If the category is "others", returns the custom_category, otherwise
         returns the category.
         """
-        return self.custom_category if self.category == "others" else self.category
+        return (self.custom_category if self.category == "others" else self.category) or ""
 
     def is_expired(self):
         """
@@ -36,13 +297,14 @@ class UrlEntry(models.Model):
         deleted_at field is set. If the URL entry is not deleted or the
         deleted_at field is not set, it is not considered expired.
 
-        The URL entry is considered expired if the current time is more than 30
-        days after the deleted_at field. Otherwise, it is not expired.
+        The URL entry is considered expired if it was deleted before
+        trash_cutoff(), i.e. more than LINKBOX_TRASH_DAYS (30) days ago, the
+        same test as UrlEntryQuerySet.expired(). Otherwise, it is not expired.
 
         Returns True if the URL entry has expired, False otherwise.
         """
         if self.is_deleted and self.deleted_at:
-            return timezone.now() > self.deleted_at + timedelta(days=30)
+            return self.deleted_at < trash_cutoff()
         return False
 
     def __str__(self):
@@ -50,6 +312,73 @@ class UrlEntry(models.Model):
        # If the URL entry has a name, returns the name. Otherwise, returns the URL.
         return self.name or self.url
 
+def sync_tags(entries):
+    """
+    Makes the tag_set of every given entry match its tags string.
+
+    Works on any number of saved entries with a fixed number of queries, so
+    bulk paths (bulk_create, imports) can call it once per batch. Missing
+    Tag rows are created for the entry owners as needed.
+    """
+    entries = [entry for entry in entries if entry.pk]
+    if not entries:
+        return
+
+    wanted = {entry.pk: (entry.user_id, parse_tags(entry.tags)) for entry in entries}
+    user_ids = {user_id for user_id, names in wanted.values()}
+    all_names = {name for user_id, names in wanted.values() for name in names}
+
+    tag_ids = {}
+    if all_names:
+        existing = Tag.objects.filter(user_id__in=user_ids, name__in=all_names)
+        tag_ids = {(tag.user_id, tag.name): tag.pk for tag in existing}
+        missing = {
+            (user_id, name)
+            for user_id, names in wanted.values()
+            for name in names
+            if (user_id, name) not in tag_ids
+        }
+        if missing:
+            Tag.objects.bulk_create(
+                [Tag(user_id=user_id, name=name) for user_id, name in missing],
+                ignore_conflicts=True,
+            )
+            created = Tag.objects.filter(user_id__in=user_ids, name__in={name for _, name in missing})
+            tag_ids.update({(tag.user_id, tag.name): tag.pk for tag in created})
+
+    desired = {
+        (entry_id, tag_ids[(user_id, name)])
+        for entry_id, (user_id, names) in wanted.items()
+        for name in names
+    }
+    current = set(UrlTag.objects.filter(entry_id__in=wanted).values_list('entry_id', 'tag_id'))
+
+    stale = current - desired
+    if stale:
+        stale_filter = models.Q()
+        for entry_id, tag_id in stale:
+            stale_filter |= models.Q(entry_id=entry_id, tag_id=tag_id)
+        UrlTag.objects.filter(stale_filter).delete()
+    if desired - current:
+        UrlTag.objects.bulk_create(
+            [UrlTag(entry_id=entry_id, tag_id=tag_id) for entry_id, tag_id in desired - current],
+            ignore_conflicts=True,
+        )
+
+
+def tag_counts(user):
+    """
+    Returns (name, count) pairs for the user's tags, counting only active
+    URL entries, most used first. One aggregate query over the join table.
+    """
+    return list(
+        Tag.objects.filter(user=user, entries__is_deleted=False)
+        .annotate(count=models.Count('entries'))
+        .order_by('-count', 'name')
+        .values_list('name', 'count')
+    )
+
+
 def restore_url(entry_id):
     """
     Restores a deleted URL entry to active status.
@@ -57,20 +386,234 @@ def restore_url(entry_id):
     Given an entry_id, looks up the corresponding UrlEntry and sets is_deleted to False
     and deleted_at to None if the UrlEntry is currently marked as deleted.
     """    
+    from .stats import adjust
+
     url = UrlEntry.objects.get(id=entry_id)
     if url.is_deleted:
         url.is_deleted = False
         url.deleted_at = None
         url.save()
+        adjust(url.user_id, active=1, trashed=-1)
 
-def purge_expired():
+def purge_batch_size():
+    """
+    Returns the number of expired entries deleted per batch.
+    """
+    return getattr(settings, 'LINKBOX_PURGE_BATCH_SIZE', 500)
+
+
+def purge_sleep():
+    """
+    Returns the pause between two purge batches, in seconds.
+    """
+    return getattr(settings, 'LINKBOX_PURGE_SLEEP', 0.1)
+
+
+def purge_expired(batch_size=None, sleep=None, dry_run=False, on_batch=None):
     """
     Purges expired URL entries from the database.
 
     A URL entry is considered expired if it has been marked as deleted for
-    30 days or more. This function looks up all expired URL entries and
-    deletes them from the database.
+    more than LINKBOX_TRASH_DAYS (30) days. This function looks up all
+    expired URL entries and deletes them from the database, in primary key
+    batches of `batch_size` rows (LINKBOX_PURGE_BATCH_SIZE) with a pause of
+    `sleep` seconds (LINKBOX_PURGE_SLEEP) between them, so that other
+    writers get the database in between. Tombstones past their retention
+    period are dropped as well.
+
+    With `dry_run` nothing is deleted. If given, `on_batch` is called with
+    the number of entries purged so far after every batch. Returns the
+    number of entries purged (or that would be).
+    """
+    from .stats import hard_delete
+    from .sync import prune_tombstones
+
+    batch_size = batch_size or purge_batch_size()
+    sleep = purge_sleep() if sleep is None else sleep
+    expired = UrlEntry.objects.expired(trash_cutoff())
+    purged = last_id = 0
+    while True:
+        ids = list(expired.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            break
+        if dry_run:
+            purged += len(ids)
+        else:
+            # Filtered again: an entry restored since is left alone
+            purged += hard_delete(expired.filter(pk__in=ids))
+        last_id = ids[-1]
+        if on_batch:
+            on_batch(purged)
+        if len(ids) == batch_size and sleep and not dry_run:
+            time.sleep(sleep)
+    if not dry_run:
+        prune_tombstones()
+    return purged
+
+
+class Job(models.Model):
+    """
+    A long running export or import, queued by a view and carried out by the
+    `run_jobs` management command (see urlsaver/jobs.py).
+    """
+    EXPORT_PDF = 'export_pdf'
+    IMPORT_CSV = 'import_csv'
+    KIND_CHOICES = [
+        (EXPORT_PDF, 'PDF export'),
+        (IMPORT_CSV, 'CSV import'),
+    ]
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='jobs')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    params = models.JSONField(default=dict, blank=True)
+    # Work done so far out of total; total is 0 while it is unknown.
+    progress = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+    input_file = models.FileField(upload_to='jobs/input/', blank=True)
+    result_file = models.FileField(upload_to='jobs/results/', blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Last sign of life of the worker running the job, see jobs.fail_stale_jobs().
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # The worker picks the oldest queued job.
+            models.Index(fields=['created_at'], name='job_queued_idx', condition=models.Q(status='queued')),
+        ]
+
+    def __str__(self):
+        return f'{self.get_kind_display()} #{self.pk} ({self.status})'
+
+
+class UserStats(models.Model):
     """
-    now = timezone.now()
-    expired = UrlEntry.objects.filter(is_deleted=True, deleted_at__lt=now - timedelta(days=30))
-    expired.delete()
+    Cached per-user counters shown in the activity panel.
+
+    The views keep them up to date incrementally (see urlsaver/stats.py), so
+    opening the panel is a primary key lookup instead of COUNT(*) over the
+    user's rows. `manage.py reconcile_stats` recomputes them from UrlEntry.
+
+    `version` goes up with every write to the user's entries except visits,
+    and `modified_at` records when the counters or the version last changed.
+    They are the collection version behind the ETags and Last-Modified
+    headers of urlsaver/versioning.py.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='url_stats')
+    active_count = models.IntegerField(default=0)
+    trashed_count = models.IntegerField(default=0)
+    # Sum of visit_count over the user's entries, trashed ones included.
+    visit_count = models.IntegerField(default=0)
+    version = models.BigIntegerField(default=0)
+    modified_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'user stats'
+
+    def __str__(self):
+        return f'Stats for {self.user_id}'
+
+
+class Tombstone(models.Model):
+    """
+    Records the hard deletion of a UrlEntry so that /api/sync/ clients can
+    drop their copy. Kept for LINKBOX_TOMBSTONE_DAYS days.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='tombstones')
+    entry_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+    # The deletion's number in the owner's change sequence, see UrlEntry.change_seq.
+    change_seq = models.BigIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'change_seq', 'id'], name='tombstone_user_change_idx'),
+        ]
+
+    def __str__(self):
+        return f'Deleted entry #{self.entry_id}'
+
+
+class ChangeSequence(models.Model):
+    """
+    The last number handed out of a user's change sequence. Every write to
+    the user's entries takes the next number (urlsaver.sync.next_change_seqs)
+    and stamps it on the rows it writes.
+
+    Kept apart from UserStats, whose row is only created on first read by
+    counting the user's entries: created on a first write it would be
+    counted before the write.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='change_sequence')
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f'Change sequence of {self.user_id}: {self.value}'
+
+
+class LinkPreview(models.Model):
+    """
+    Page metadata fetched for the preview button (see urlsaver.previews).
+    Shared by every user who saved the same URL and refetched once it is
+    older than LINKBOX_PREVIEW_TTL seconds. A failed fetch is stored too,
+    with the reason in `error`, so it is not retried on every click.
+    """
+    # sha256 of the URL: URLs can be longer than an index allows.
+    url_hash = models.CharField(max_length=64, unique=True)
+    url = models.URLField(max_length=2000)
+    title = models.CharField(max_length=300, blank=True)
+    description = models.TextField(blank=True)
+    image = models.URLField(max_length=2000, blank=True)
+    error = models.CharField(max_length=255, blank=True)
+    fetched_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return self.title or self.url
+
+
+class LinkCheck(models.Model):
+    """
+    The result of the last health check of a UrlEntry's URL, written by the
+    `check_links` management command (see urlsaver/linkcheck.py). Dropped
+    when the entry's URL changes, see forget_checks.
+    """
+    OK = 'ok'
+    BROKEN = 'broken'
+    UNREACHABLE = 'unreachable'
+    STATUS_CHOICES = [
+        (OK, 'OK'),
+        (BROKEN, 'Broken'),
+        (UNREACHABLE, 'Unreachable'),
+    ]
+
+    entry = models.OneToOneField(UrlEntry, on_delete=models.CASCADE, primary_key=True, related_name='link_check')
+    status = models.CharField(max_length=12, choices=STATUS_CHOICES)
+    # Final HTTP status after redirects; null when there was no response.
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    error = models.CharField(max_length=255, blank=True)
+    checked_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # The index view's link status filter.
+            models.Index(fields=['status', 'entry'], name='linkcheck_status_idx'),
+        ]
+
+    def __str__(self):
+        return f'Entry #{self.entry_id}: {self.status}'
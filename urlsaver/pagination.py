@@ -0,0 +1,247 @@
+"""
+Pagination helpers for the URL listing and the trash panel.
+
+Small collections keep using Django's page-number Paginator. Once a
+collection grows past LINKBOX_KEYSET_THRESHOLD rows, pages are fetched
+with keyset (cursor) pagination instead: every page is a single indexed
+range query on the ordering columns, with no COUNT(*) and no OFFSET, so
+page 500 costs the same as page 1.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from rest_framework.pagination import CursorPagination
+
+
+def keyset_threshold():
+    """
+    Returns the collection size above which keyset pagination is used.
+    """
+    return getattr(settings, 'LINKBOX_KEYSET_THRESHOLD', 1000)
+
+
+def encode_cursor(values, direction, offset):
+    """
+    Packs a position into an opaque, URL safe token.
+
+    :param values: The ordering column values of the row the page starts after.
+    :param direction: "next" or "prev".
+    :param offset: The number of rows before the page, used for row numbering.
+    """
+    # isoformat() rather than DjangoJSONEncoder, which drops microseconds
+    # and would make rows sharing a millisecond fall between two pages.
+    values = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps([values, direction, offset])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """
+    Unpacks a token made by encode_cursor(). Returns None for a missing or
+    tampered token, which callers treat as "first page".
+    """
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        values, direction, offset = json.loads(raw)
+    except (ValueError, TypeError, binascii.Error):
+        return None
+    if direction not in ('next', 'prev') or not isinstance(values, list) or not isinstance(offset, int):
+        return None
+    return values, direction, max(offset, 0)
+
+
+def estimate_count(queryset):
+    """
+    Returns the planner's row estimate for the queryset, or None when the
+    database can't provide one cheaply (SQLite has no estimates).
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class KeysetPage:
+    """
+    One page of a keyset paginated queryset.
+
+    Iterates like a django.core.paginator.Page. Instead of page numbers it
+    carries next_cursor / previous_cursor tokens.
+    """
+    is_keyset = True
+
+    def __init__(self, object_list, offset, has_next, has_previous, paginator):
+        self.object_list = object_list
+        self.offset = offset
+        self._has_next = has_next
+        self._has_previous = has_previous
+        self.paginator = paginator
+
+    def __repr__(self):
+        return f'<KeysetPage starting at {self.start_index()}>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    def start_index(self):
+        return self.offset + 1 if self.object_list else 0
+
+    def end_index(self):
+        return self.offset + len(self.object_list)
+
+    @property
+    def next_cursor(self):
+        if not self._has_next:
+            return None
+        last = self.paginator.key_of(self.object_list[-1])
+        return encode_cursor(last, 'next', self.end_index())
+
+    @property
+    def previous_cursor(self):
+        if not self._has_previous:
+            return None
+        first = self.paginator.key_of(self.object_list[0])
+        return encode_cursor(first, 'prev', max(self.offset - self.paginator.per_page, 0))
+
+    @property
+    def approximate_count(self):
+        return self.paginator.approximate_count
+
+
+class KeysetPaginator:
+    """
+    Paginates a queryset by the values of its ordering columns.
+
+    The ordering must end in a unique column (the primary key) so that every
+    row has a distinct position, e.g. ('-created_at', '-id').
+    """
+
+    def __init__(self, queryset, per_page, ordering, approximate_count=None):
+        self.queryset = queryset.order_by(*ordering)
+        self.per_page = per_page
+        self.ordering = ordering
+        self.fields = [name.lstrip('-') for name in ordering]
+        self.descending = [name.startswith('-') for name in ordering]
+        if approximate_count is None:
+            approximate_count = getattr(settings, 'LINKBOX_APPROXIMATE_COUNT', False)
+        self._approximate = approximate_count
+
+    def key_of(self, obj):
+        return [getattr(obj, field) for field in self.fields]
+
+    def _to_python(self, values):
+        model = self.queryset.model
+        return [model._meta.get_field(field).to_python(value) for field, value in zip(self.fields, values)]
+
+    def _beyond(self, values, forward):
+        """
+        Builds the lexicographic "row comes after (or before) values" filter,
+        e.g. for ('-created_at', '-id') going forward:
+        created_at < v0 OR (created_at = v0 AND id < v1).
+        """
+        condition = Q()
+        for i, field in enumerate(self.fields):
+            smaller = self.descending[i] == forward
+            step = Q(**{f'{field}__{"lt" if smaller else "gt"}': values[i]})
+            for previous, value in zip(self.fields[:i], values[:i]):
+                step &= Q(**{previous: value})
+            condition |= step
+        return condition
+
+    def get_page(self, cursor=None):
+        """
+        Returns the KeysetPage for the given token, or the first page when the
+        token is missing or invalid.
+        """
+        position = decode_cursor(cursor)
+        if position is not None and len(position[0]) != len(self.fields):
+            position = None
+
+        if position is None:
+            rows = list(self.queryset[:self.per_page + 1])
+            return KeysetPage(rows[:self.per_page], 0, len(rows) > self.per_page, False, self)
+
+        values, direction, offset = position
+        try:
+            values = self._to_python(values)
+        except ValidationError:
+            return self.get_page(None)
+
+        if direction == 'next':
+            rows = list(self.queryset.filter(self._beyond(values, True))[:self.per_page + 1])
+            return KeysetPage(rows[:self.per_page], offset, len(rows) > self.per_page, True, self)
+
+        reverse = [name[1:] if name.startswith('-') else '-' + name for name in self.ordering]
+        rows = list(self.queryset.filter(self._beyond(values, False)).order_by(*reverse)[:self.per_page + 1])
+        has_previous = len(rows) > self.per_page
+        rows = rows[:self.per_page][::-1]
+        return KeysetPage(rows, offset if has_previous else 0, True, has_previous, self)
+
+    @property
+    def approximate_count(self):
+        if not self._approximate:
+            return None
+        if not hasattr(self, '_approximate_count'):
+            self._approximate_count = estimate_count(self.queryset)
+        return self._approximate_count
+
+
+def paginate(queryset, per_page, ordering, page_number=None, cursor=None):
+    """
+    Returns a page of the queryset in the cheapest suitable mode.
+
+    Collections of up to keyset_threshold() rows get a regular numbered
+    Page, counted with a bounded COUNT so the check itself stays cheap. Larger
+    collections, or any request carrying a cursor, get a KeysetPage.
+    """
+    queryset = queryset.order_by(*ordering)
+    if not cursor:
+        threshold = keyset_threshold()
+        count = queryset[:threshold + 1].count()
+        if count <= threshold:
+            paginator = Paginator(queryset, per_page)
+            paginator.count = count  # already known, skip the second COUNT(*)
+            return paginator.get_page(page_number)
+    return KeysetPaginator(queryset, per_page, ordering).get_page(cursor)
+
+
+class UrlCursorPagination(CursorPagination):
+    """
+    Cursor pagination for the /api/urls/ endpoint, newest first. Like the
+    keyset pages above, every page is an indexed range query on created_at
+    with no COUNT(*) and no OFFSET.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
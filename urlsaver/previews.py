@@ -0,0 +1,356 @@
+"""
+Link previews: the title, description and image of a saved page, shown by
+the preview button on the index page.
+
+Pages are fetched server side by a small thread pool and only their <head>
+is read: the download stops at </head> (or <body>), after
+LINKBOX_PREVIEW_MAX_BYTES bytes or after LINKBOX_PREVIEW_TIMEOUT seconds,
+whichever comes first. Concurrent requests for the same URL share one
+fetch, and when the pool's queue is full new fetches are refused instead of
+piling up. Results, failures included, are stored as LinkPreview rows and
+served from the database until they expire (LINKBOX_PREVIEW_TTL, or
+LINKBOX_PREVIEW_ERROR_TTL for failures).
+
+Hosts that resolve to private, loopback, link-local or otherwise
+non-public addresses are refused, on every redirect too, unless
+LINKBOX_PREVIEW_ALLOW_PRIVATE is set; otherwise the endpoint would let any
+user probe the server's internal network. Requests are sent to the address
+that was checked (see open_pinned): letting requests resolve the host again
+would let a DNS server answer with a private address the second time.
+"""
+import codecs
+import hashlib
+from http.cookiejar import DefaultCookiePolicy
+import ipaddress
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from datetime import timedelta
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from django.utils import timezone
+
+from .models import LinkPreview
+
+MAX_REDIRECTS = 5
+HEADERS = {
+    "User-Agent": "LinkBOX-preview/1.0",
+    "Accept": "text/html,application/xhtml+xml;q=0.9,*/*;q=0.1",
+}
+
+
+class PreviewError(Exception):
+    """
+    The page couldn't be previewed; the message says why.
+    """
+
+
+class PreviewBusy(Exception):
+    """
+    Too many previews are being fetched already.
+    """
+
+
+def preview_ttl():
+    """
+    Returns the number of seconds a fetched preview is reused for.
+    """
+    return getattr(settings, 'LINKBOX_PREVIEW_TTL', 7 * 24 * 3600)
+
+
+def preview_error_ttl():
+    """
+    Returns the number of seconds a failed fetch is remembered for.
+    """
+    return getattr(settings, 'LINKBOX_PREVIEW_ERROR_TTL', 600)
+
+
+def preview_timeout():
+    """
+    Returns the maximum number of seconds spent fetching one page.
+    """
+    return getattr(settings, 'LINKBOX_PREVIEW_TIMEOUT', 5)
+
+
+def preview_max_bytes():
+    """
+    Returns the maximum number of bytes read from one page.
+    """
+    return getattr(settings, 'LINKBOX_PREVIEW_MAX_BYTES', 256 * 1024)
+
+
+def preview_workers():
+    """
+    Returns the number of pages fetched in parallel by the process.
+    """
+    return getattr(settings, 'LINKBOX_PREVIEW_WORKERS', 4)
+
+
+class HeadParser(HTMLParser):
+    """
+    Collects the <title> and the <meta> tags of an HTML document, and sets
+    `done` once the head is over.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = ""
+        self.meta = {}
+        self.done = False
+        self._in_title = False
+
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        if tag == "body":
+            self.done = True
+        elif tag == "title":
+            self._in_title = True
+        elif tag == "meta":
+            attrs = dict(attrs)
+            key = (attrs.get("property") or attrs.get("name") or "").strip().lower()
+            if key and attrs.get("content"):
+                self.meta.setdefault(key, attrs["content"].strip())
+
+    def handle_endtag(self, tag):
+        if tag == "title":
+            self._in_title = False
+        elif tag == "head":
+            self.done = True
+
+    def handle_data(self, data):
+        if self._in_title and not self.done:
+            self.title += data
+
+    def metadata(self, base_url):
+        """
+        Returns the title, description and absolute image URL found so far,
+        preferring the OpenGraph tags.
+        """
+        meta = self.meta
+        image = meta.get("og:image") or meta.get("twitter:image") or ""
+        image = urljoin(base_url, image) if image else ""
+        if urlsplit(image).scheme not in ("http", "https"):
+            image = ""
+        return {
+            "title": " ".join((meta.get("og:title") or meta.get("twitter:title") or self.title).split())[:300],
+            "description": (meta.get("og:description") or meta.get("description") or "").strip(),
+            "image": image if len(image) <= 2000 else "",
+        }
+
+
+def check_public(url):
+    """
+    Raises PreviewError unless `url` is an http(s) URL whose host only
+    resolves to public addresses (any host will do with
+    LINKBOX_PREVIEW_ALLOW_PRIVATE). Returns the address to send the request
+    to, see open_pinned.
+    """
+    parts = urlsplit(url)
+    try:
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+    except ValueError:
+        raise PreviewError("Invalid URL.")
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise PreviewError("Only http(s) pages can be previewed.")
+    try:
+        addresses = socket.getaddrinfo(parts.hostname, port, type=socket.SOCK_STREAM)
+    except (socket.gaierror, UnicodeError):
+        raise PreviewError("Unknown host.")
+    if not getattr(settings, 'LINKBOX_PREVIEW_ALLOW_PRIVATE', False):
+        for *_, sockaddr in addresses:
+            if not ipaddress.ip_address(sockaddr[0].split("%")[0]).is_global:
+                raise PreviewError("This address can't be previewed.")
+    return addresses[0][4][0]
+
+
+class PinnedAdapter(HTTPAdapter):
+    """
+    Transport adapter of the sessions open_pinned sends requests with: the
+    TLS handshake (SNI and certificate check) is done for the host named in
+    the Host header rather than for the address in the URL.
+    """
+
+    def build_connection_pool_key_attributes(self, request, verify, cert=None):
+        host_params, pool_kwargs = super().build_connection_pool_key_attributes(request, verify, cert)
+        host = request.headers.get("Host")
+        if host_params["scheme"] == "https" and host:
+            pool_kwargs["server_hostname"] = urlsplit("//" + host).hostname
+        return host_params, pool_kwargs
+
+
+def pinned_session(headers):
+    """
+    Returns a requests.Session for open_pinned, sending `headers`.
+    """
+    session = requests.Session()
+    session.headers.update(headers)
+    session.mount("http://", PinnedAdapter())
+    session.mount("https://", PinnedAdapter())
+    # Cookies would be stored for the address, and sent to every site on it.
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    return session
+
+
+def open_pinned(session, method, url, address, **kwargs):
+    """
+    Sends a `method` request for `url` with `session` (a pinned_session) to
+    `address`, as returned by check_public, without resolving the URL's host
+    again. The host is still sent in the Host header, and https
+    certificates are checked against it.
+    """
+    parts = urlsplit(url)
+    host = parts.hostname.encode("idna").decode()
+    host = f"[{host}]" if ":" in host else host
+    netloc = f"[{address}]" if ":" in address else address
+    if parts.port:
+        host, netloc = f"{host}:{parts.port}", f"{netloc}:{parts.port}"
+    headers = {**kwargs.pop("headers", {}), "Host": host}
+    return session.request(method, parts._replace(netloc=netloc).geturl(), headers=headers, **kwargs)
+
+
+_local = threading.local()
+
+
+def _session():
+    # One keep-alive session per worker thread.
+    if not hasattr(_local, "session"):
+        _local.session = pinned_session(HEADERS)
+    return _local.session
+
+
+def _read_head(response, url, deadline):
+    content_type = response.headers.get("Content-Type", "").lower()
+    if content_type and "html" not in content_type:
+        raise PreviewError("Not an HTML page.")
+    encoding = response.encoding if "charset" in content_type else "utf-8"
+    try:
+        decoder = codecs.getincrementaldecoder(encoding or "utf-8")(errors="replace")
+    except LookupError:
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+    parser, remaining = HeadParser(), preview_max_bytes()
+    for chunk in response.iter_content(chunk_size=4096):
+        chunk = chunk[:remaining]
+        remaining -= len(chunk)
+        parser.feed(decoder.decode(chunk))
+        if parser.done or remaining <= 0:
+            break
+        if time.monotonic() > deadline:
+            if not (parser.title or parser.meta):
+                raise PreviewError("Timed out.")
+            break
+    return parser.metadata(url)
+
+
+def fetch_metadata(url):
+    """
+    Fetches the head of the page at `url`, following redirects, and returns
+    its metadata as a dict with `title`, `description` and `image`. Raises
+    PreviewError if the page can't be fetched within the limits.
+    """
+    deadline = time.monotonic() + preview_timeout()
+    for _ in range(MAX_REDIRECTS + 1):
+        address = check_public(url)
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise PreviewError("Timed out.")
+        try:
+            response = open_pinned(_session(), "GET", url, address, stream=True, allow_redirects=False,
+                                   timeout=remaining)
+        except requests.Timeout:
+            raise PreviewError("Timed out.")
+        except requests.RequestException:
+            raise PreviewError("Could not connect.")
+        with response:
+            if response.is_redirect:
+                url = urljoin(url, response.headers["Location"])
+                continue
+            if response.status_code >= 400:
+                raise PreviewError(f"The page answered with HTTP {response.status_code}.")
+            try:
+                return _read_head(response, url, deadline)
+            except requests.Timeout:
+                raise PreviewError("Timed out.")
+            except requests.RequestException:
+                raise PreviewError("Could not read the page.")
+    raise PreviewError("Too many redirects.")
+
+
+_lock = threading.RLock()
+_executor = None
+_in_flight = {}
+
+
+def _submit(url):
+    """
+    Returns the future of the fetch of `url`, starting one unless it's
+    already running. Raises PreviewBusy if the pool's queue is full.
+    """
+    global _executor
+    with _lock:
+        future = _in_flight.get(url)
+        if future is not None:
+            return future
+        if len(_in_flight) >= 2 * preview_workers():
+            raise PreviewBusy()
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=preview_workers(), thread_name_prefix="linkbox-preview")
+        future = _in_flight[url] = _executor.submit(fetch_metadata, url)
+
+    def forget(done):
+        with _lock:
+            if _in_flight.get(url) is done:
+                del _in_flight[url]
+    future.add_done_callback(forget)
+    return future
+
+
+def url_hash(url):
+    """
+    Returns the key a URL's preview is stored under.
+    """
+    return hashlib.sha256(url.encode()).hexdigest()
+
+
+def is_fresh(preview):
+    """
+    Tells whether a stored preview can still be served.
+    """
+    ttl = preview_error_ttl() if preview.error else preview_ttl()
+    return preview.fetched_at > timezone.now() - timedelta(seconds=ttl)
+
+
+def get_preview(url):
+    """
+    Returns (LinkPreview, cached) for `url`: the stored preview while it's
+    fresh, else a newly fetched (and stored) one. A failed fetch is stored
+    with its reason in `error`. Raises PreviewBusy when the fetch can't be
+    started right now.
+    """
+    key = url_hash(url)
+    preview = LinkPreview.objects.filter(url_hash=key).first()
+    if preview is not None and is_fresh(preview):
+        return preview, True
+
+    data, error = {}, ""
+    try:
+        data = _submit(url).result(timeout=preview_timeout() + 1)
+    except FutureTimeout:
+        error = "Timed out."
+    except PreviewError as exc:
+        error = str(exc)
+    preview, _ = LinkPreview.objects.update_or_create(url_hash=key, defaults={
+        "url": url,
+        "title": data.get("title", ""),
+        "description": data.get("description", ""),
+        "image": data.get("image", ""),
+        "error": error,
+        "fetched_at": timezone.now(),
+    })
+    return preview, False
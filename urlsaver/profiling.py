@@ -0,0 +1,208 @@
+"""
+Request profiling, switched on with LINKBOX_PROFILING.
+
+ProfilingMiddleware measures every request: the number of SQL queries and
+the time spent in them (through a database execute wrapper, so it works
+without DEBUG), the time spent rendering templates (through the
+ProfilingTemplates backend, see TEMPLATES) and the total time. It
+reports them to the client in a Server-Timing header, which browsers show
+in their developer tools, and keeps the last LINKBOX_PROFILING_BUFFER
+measurements in an in-process ring buffer. The staff-only profiling_stats
+view summarizes the buffer per URL name with p50 / p95 / p99.
+
+Times are measured up to the moment the view returns its response, so the
+body of streaming responses (CSV exports) isn't included. With profiling
+off the middleware removes itself from the chain (MiddlewareNotUsed) and
+the template backend only looks up that no request is being profiled.
+Every process has its own buffer.
+"""
+import math
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.backends.django import DjangoTemplates
+from django.utils import timezone
+
+PERCENTILES = (50, 95, 99)
+METRICS = ('queries', 'db_ms', 'template_ms', 'total_ms')
+
+
+def profiling_enabled():
+    """
+    Tells whether requests are profiled.
+    """
+    return getattr(settings, 'LINKBOX_PROFILING', False)
+
+
+def profiling_buffer_size():
+    """
+    Returns the number of requests kept in the ring buffer.
+    """
+    return getattr(settings, 'LINKBOX_PROFILING_BUFFER', 5000)
+
+
+class Profile:
+    """
+    The measurements of one request.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.rendering = False
+
+    def __call__(self, execute, sql, params, many, context):
+        # Database execute wrapper, see connection.execute_wrapper()
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+
+
+_current = ContextVar('linkbox_profile', default=None)
+
+
+class TimedTemplate:
+    """
+    A template of the ProfilingTemplates backend: adds its rendering time to
+    the profile of the request being rendered, if any.
+    """
+
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        # Only the outermost template is timed, one rendered by another
+        # (render_to_string in a template tag) is part of it.
+        profile = _current.get()
+        if profile is None or profile.rendering:
+            return self.template.render(context, request)
+        profile.rendering = True
+        started = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            profile.template_time += time.perf_counter() - started
+            profile.rendering = False
+
+
+class ProfilingTemplates(DjangoTemplates):
+    """
+    The Django template backend, with the templates it returns wrapped in
+    TimedTemplate.
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
+
+
+_lock = threading.Lock()
+_records = deque(maxlen=profiling_buffer_size())
+
+
+def records():
+    """
+    Returns the buffered measurements, oldest first.
+    """
+    with _lock:
+        return list(_records)
+
+
+def clear():
+    """
+    Empties the ring buffer.
+    """
+    with _lock:
+        _records.clear()
+
+
+class ProfilingMiddleware:
+    """
+    Measures every request while LINKBOX_PROFILING is on, see the module
+    docstring. Put it first in MIDDLEWARE so the other middleware is
+    included in the measurements.
+    """
+
+    def __init__(self, get_response):
+        global _records
+        if not profiling_enabled():
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        with _lock:
+            if _records.maxlen != profiling_buffer_size():
+                _records = deque(_records, maxlen=profiling_buffer_size())
+
+    def __call__(self, request):
+        profile = Profile()
+        token = _current.set(profile)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(profile))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        total = time.perf_counter() - started
+
+        match = request.resolver_match
+        record = {
+            'url_name': match.view_name if match else '<unresolved>',
+            'method': request.method,
+            'status': response.status_code,
+            'queries': profile.queries,
+            'db_ms': round(profile.db_time * 1000, 3),
+            'template_ms': round(profile.template_time * 1000, 3),
+            'total_ms': round(total * 1000, 3),
+            'at': timezone.now().isoformat(),
+        }
+        with _lock:
+            _records.append(record)
+        response['Server-Timing'] = (
+            f'db;dur={record["db_ms"]};desc="{profile.queries} queries", '
+            f'template;dur={record["template_ms"]}, '
+            f'total;dur={record["total_ms"]}'
+        )
+        return response
+
+
+def percentile(values, p):
+    """
+    Returns the p-th percentile (nearest rank) of the sorted list `values`.
+    """
+    return values[max(math.ceil(p / 100 * len(values)) - 1, 0)]
+
+
+def summary():
+    """
+    Summarizes the buffer per URL name: the number of requests and the p50,
+    p95 and p99 of every metric, e.g.
+
+        {"urlsaver:index": {"count": 12, "queries": {"p50": 5, ...},
+                            "db_ms": {...}, "template_ms": {...}, "total_ms": {...}}}
+    """
+    by_name = defaultdict(list)
+    for record in records():
+        by_name[record['url_name']].append(record)
+    views = {}
+    for name, rows in sorted(by_name.items()):
+        views[name] = {'count': len(rows)}
+        for metric in METRICS:
+            values = sorted(row[metric] for row in rows)
+            views[name][metric] = {f'p{p}': percentile(values, p) for p in PERCENTILES}
+    return views
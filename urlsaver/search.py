@@ -0,0 +1,208 @@
+"""
+Full-text search over a user's URL entries.
+
+On SQLite the entries are mirrored into an FTS5 virtual table that is kept in
+sync by triggers, on PostgreSQL a generated ``tsvector`` column with a GIN
+index is used. Because both are maintained by the database itself, every
+write path (``save()``, ``QuerySet.update()``, ``bulk_create()``, deletes)
+keeps the index up to date without any Python-side bookkeeping.
+
+Any other database falls back to the old ``icontains`` scan.
+"""
+import re
+
+from django.db import connections
+from django.db.models import Q
+
+FTS_TABLE = 'urlsaver_urlentry_fts'
+ENTRY_TABLE = 'urlsaver_urlentry'
+PG_COLUMN = 'search_vector'
+PG_INDEX = 'urlsaver_urlentry_search_gin'
+
+# Columns that are indexed, in FTS column order.
+SEARCH_FIELDS = ('name', 'url', 'tags', 'category', 'custom_category', 'sub_category')
+
+# Relative weight of a match in each column (same order as SEARCH_FIELDS).
+# A hit in the name counts far more than a hit somewhere in the URL.
+FTS_WEIGHTS = (10.0, 2.0, 5.0, 3.0, 3.0, 3.0)
+
+# Keystroke driven searches never need more than a handful of terms.
+MAX_TERMS = 8
+
+_TERM_RE = re.compile(r'[^\W_]+', re.UNICODE)
+
+# Detected backend per database, so a search doesn't cost an extra query.
+_backends = {}
+
+_columns = ', '.join(SEARCH_FIELDS)
+_new_values = ', '.join(f'new.{field}' for field in SEARCH_FIELDS)
+_old_values = ', '.join(f'old.{field}' for field in SEARCH_FIELDS)
+
+SQLITE_TRIGGERS = {
+    f'{FTS_TABLE}_ai': f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {ENTRY_TABLE} BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, {_columns}) VALUES (new.id, {_new_values});
+        END
+    """,
+    f'{FTS_TABLE}_ad': f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {ENTRY_TABLE} BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_columns}) VALUES ('delete', old.id, {_old_values});
+        END
+    """,
+    # Only fire when an indexed column changes, so visit counter updates
+    # and soft deletes don't touch the index at all.
+    f'{FTS_TABLE}_au': f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF {_columns} ON {ENTRY_TABLE} BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_columns}) VALUES ('delete', old.id, {_old_values});
+            INSERT INTO {FTS_TABLE}(rowid, {_columns}) VALUES (new.id, {_new_values});
+        END
+    """,
+}
+
+
+def _pg_document():
+    """
+    Returns the SQL expression the PostgreSQL search vector is generated from.
+
+    URLs are split on punctuation first so that "github.com/django" is indexed
+    as the words "github", "com" and "django".
+    """
+    def part(expression, weight):
+        return f"setweight(to_tsvector('simple', coalesce({expression}, '')), '{weight}')"
+
+    return ' || '.join([
+        part('name', 'A'),
+        part('tags', 'B'),
+        # category is nullable and NULL || text is NULL: coalesce each column.
+        part("coalesce(category, '') || ' ' || coalesce(custom_category, '') || ' ' || coalesce(sub_category, '')",
+             'C'),
+        part("regexp_replace(url, '[^[:alnum:]]+', ' ', 'g')", 'D'),
+    ])
+
+
+def backend_for(connection):
+    """
+    Returns the name of the search backend used on the given connection:
+    "fts5", "postgres" or None when only the icontains fallback is available.
+    """
+    key = (connection.alias, str(connection.settings_dict['NAME']))
+    if key not in _backends:
+        backend = None
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+                backend = 'fts5' if cursor.fetchone() else None
+        elif connection.vendor == 'postgresql':
+            backend = 'postgres'
+        _backends[key] = backend
+    return _backends[key]
+
+
+def install_search_index(connection):
+    """
+    Creates the search index structures for the given connection if they are
+    missing. Safe to call repeatedly.
+
+    On SQLite, Django rebuilds a table (and so drops its triggers) for many
+    schema changes, so this is also run after every migrate. When a trigger
+    had to be recreated the FTS table is rebuilt from the entries table.
+    """
+    _backends.clear()
+    if ENTRY_TABLE not in connection.introspection.table_names():
+        return
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger') AND name LIKE %s",
+                [FTS_TABLE + '%'],
+            )
+            existing = {row[0] for row in cursor.fetchall()}
+            if FTS_TABLE not in existing:
+                try:
+                    cursor.execute(
+                        f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+                        f"{_columns}, content='{ENTRY_TABLE}', content_rowid='id', "
+                        f"tokenize='unicode61 remove_diacritics 2')"
+                    )
+                except Exception:
+                    # SQLite compiled without FTS5: keep the icontains fallback.
+                    return
+            missing = [name for name in SQLITE_TRIGGERS if name not in existing]
+            for name in missing:
+                cursor.execute(SQLITE_TRIGGERS[name])
+            if missing:
+                cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    elif connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"ALTER TABLE {ENTRY_TABLE} ADD COLUMN IF NOT EXISTS {PG_COLUMN} tsvector "
+                f"GENERATED ALWAYS AS ({_pg_document()}) STORED"
+            )
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {PG_INDEX} ON {ENTRY_TABLE} USING GIN ({PG_COLUMN})")
+
+
+def uninstall_search_index(connection):
+    """
+    Drops everything created by install_search_index().
+    """
+    _backends.clear()
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            for name in SQLITE_TRIGGERS:
+                cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+            cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+        elif connection.vendor == 'postgresql':
+            cursor.execute(f"DROP INDEX IF EXISTS {PG_INDEX}")
+            cursor.execute(f"ALTER TABLE {ENTRY_TABLE} DROP COLUMN IF EXISTS {PG_COLUMN}")
+
+
+def search_terms(query):
+    """
+    Splits a free-text query into lowercase search terms.
+    """
+    return [term.lower() for term in _TERM_RE.findall(query)][:MAX_TERMS]
+
+
+def icontains_filter(query):
+    """
+    Returns the Q object used when no search index is available.
+    """
+    condition = Q()
+    for field in SEARCH_FIELDS:
+        condition |= Q(**{f'{field}__icontains': query})
+    return condition
+
+
+def apply_search(queryset, query):
+    """
+    Filters the queryset down to the entries matching the query and orders
+    them by relevance (best first, newest first on ties).
+
+    Every term is matched as a prefix, so "git" finds "github" while the
+    user is still typing. The rank is available as ``search_rank`` on the
+    returned rows (higher is better).
+    """
+    terms = search_terms(query)
+    backend = backend_for(connections[queryset.db]) if terms else None
+
+    if backend == 'fts5':
+        match = ' '.join(f'"{term}"*' for term in terms)
+        weights = ', '.join(str(weight) for weight in FTS_WEIGHTS)
+        queryset = queryset.extra(
+            select={'search_rank': f'-bm25({FTS_TABLE}, {weights})'},
+            tables=[FTS_TABLE],
+            where=[f'{FTS_TABLE}.rowid = {ENTRY_TABLE}.id', f'{FTS_TABLE} MATCH %s'],
+            params=[match],
+        )
+    elif backend == 'postgres':
+        tsquery = ' & '.join(f'{term}:*' for term in terms)
+        queryset = queryset.extra(
+            select={'search_rank': f"ts_rank({ENTRY_TABLE}.{PG_COLUMN}, to_tsquery('simple', %s))"},
+            select_params=[tsquery],
+            where=[f"{ENTRY_TABLE}.{PG_COLUMN} @@ to_tsquery('simple', %s)"],
+            params=[tsquery],
+        )
+    else:
+        return queryset.filter(icontains_filter(query)).order_by('-created_at')
+
+    return queryset.order_by('-search_rank', '-created_at')
@@ -1,7 +1,51 @@
 from rest_framework import serializers
 from .models import UrlEntry
 
-class URLSerializer(serializers.ModelSerializer):
+
+class SparseFieldsMixin:
+    """
+    Lets API clients pick the fields they need with `?fields=id,url,name`.
+    Unknown names are ignored; without the parameter all fields are returned.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        requested = self.requested_fields(self.context.get('request'))
+        if requested:
+            for name in set(self.fields) - requested:
+                self.fields.pop(name)
+
+    @staticmethod
+    def requested_fields(request):
+        if request is None or request.method != 'GET':
+            return None
+        value = request.query_params.get('fields', '')
+        return {name.strip() for name in value.split(',') if name.strip()} or None
+
+
+class URLSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = UrlEntry
-        fields = '__all__'   # OR we can also list specific fields
+        # tag_set is the normalized copy of `tags`, clients read and write
+        # the comma separated string.
+        # url_hash is the duplicate check's key, change_seq the sync cursor's.
+        exclude = ['tag_set', 'url_hash', 'change_seq']
+        # Entries always belong to the requesting user, see URLViewSet.
+        read_only_fields = ['user', 'visit_count', 'created_at', 'deleted_at']
+
+    def validate_url(self, value):
+        """
+        Rejects a URL the requesting user has already saved, in any
+        spelling (see utils.canonicalize_url), trashed entries included.
+        """
+        request = self.context.get('request')
+        if request is None or not request.user.is_authenticated:
+            return value
+        duplicates = UrlEntry.objects.filter(user=request.user).with_url(value)
+        if self.instance is not None:
+            duplicates = duplicates.exclude(pk=self.instance.pk)
+        duplicate = duplicates.values_list('pk', 'is_deleted').first()
+        if duplicate is not None:
+            where = " (in the trash)" if duplicate[1] else ""
+            raise serializers.ValidationError(f"This URL is already saved as entry {duplicate[0]}{where}.")
+        return value
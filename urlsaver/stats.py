@@ -0,0 +1,146 @@
+"""
+Incrementally maintained per-user counters (active URLs, trashed URLs and
+total visits) backing the activity panel.
+
+Every view that adds, trashes, restores or hard deletes entries applies the
+matching delta with a single UPDATE ... SET count = count + delta, computed
+by the database. A user's row is created on first read by counting their
+entries once; users without a row are simply skipped by the deltas.
+
+Every delta also bumps the user's collection version and its timestamp,
+which the ETags and Last-Modified headers of urlsaver.versioning are
+derived from. Flushed visits only move the timestamp: they change no
+entry the listings show.
+
+Writes that bypass the views (the admin, the shell, raw SQL) make the
+counters drift; `manage.py reconcile_stats` recomputes them.
+"""
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Q, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils.timezone import now
+
+from .models import UrlEntry, UserStats
+from .sync import record_tombstones
+
+COUNTERS = ('active_count', 'trashed_count', 'visit_count')
+
+
+def _bump():
+    """
+    Returns the UPDATE assignments that move a collection version forward.
+    """
+    return {'version': F('version') + 1, 'modified_at': now()}
+
+
+def _totals(queryset):
+    """
+    Returns the counter values for the entries in `queryset`, per user:
+    {user_id: {"active_count": ..., "trashed_count": ..., "visit_count": ...}}
+    """
+    rows = queryset.order_by().values('user').annotate(
+        active_count=Count('id', filter=Q(is_deleted=False)),
+        trashed_count=Count('id', filter=Q(is_deleted=True)),
+        visit_count=Coalesce(Sum('visit_count'), 0),
+    )
+    return {row.pop('user'): row for row in rows}
+
+
+def reconcile(user):
+    """
+    Recomputes the user's counters from their entries and returns the
+    UserStats row, creating it if needed.
+    """
+    user_id = getattr(user, 'pk', user)
+    totals = _totals(UrlEntry.objects.filter(user_id=user_id)).get(user_id, dict.fromkeys(COUNTERS, 0))
+    stats, _ = UserStats.objects.update_or_create(user_id=user_id, defaults=totals)
+    return stats
+
+
+def get_stats(user):
+    """
+    Returns the user's UserStats row, computing it on first use.
+    """
+    try:
+        return UserStats.objects.get(user=user)
+    except UserStats.DoesNotExist:
+        return reconcile(user)
+
+
+def adjust(user, active=0, trashed=0, visits=0):
+    """
+    Adds the given deltas to the user's counters and bumps their collection
+    version. Called without deltas it only records that something changed.
+    """
+    changes = _bump()
+    for field, delta in zip(COUNTERS, (active, trashed, visits)):
+        if delta:
+            changes[field] = F(field) + delta
+    UserStats.objects.filter(user=user).update(**changes)
+
+
+def add_visits(visits_by_user):
+    """
+    Adds flushed visits to the visit counters, {user_id: visits}, in one UPDATE.
+    The collection version is left as it is, see the module docstring.
+    """
+    visits_by_user = {user_id: count for user_id, count in visits_by_user.items() if count}
+    if not visits_by_user:
+        return
+    UserStats.objects.filter(user__in=visits_by_user).update(
+        visit_count=F('visit_count') + Case(
+            *[When(user=user_id, then=Value(count)) for user_id, count in visits_by_user.items()],
+            default=Value(0),
+            output_field=IntegerField(),
+        ),
+        modified_at=now(),
+    )
+
+
+def bump_versions(user_ids):
+    """
+    Bumps the collection version of several users at once, for changes that
+    don't affect their counters.
+    """
+    UserStats.objects.filter(user__in=set(user_ids)).update(**_bump())
+
+
+def hard_delete(queryset):
+    """
+    Deletes the entries in `queryset`, takes them off their owners'
+    counters and leaves tombstones for sync clients (see urlsaver.sync).
+    Returns the number of entries deleted.
+    """
+    with transaction.atomic():
+        removed = _totals(queryset)
+        record_tombstones(queryset)
+        deleted = queryset.delete()[1].get(UrlEntry._meta.label, 0)
+        for user_id, totals in removed.items():
+            adjust(user_id, active=-totals['active_count'], trashed=-totals['trashed_count'],
+                   visits=-totals['visit_count'])
+    return deleted
+
+
+def reconcile_all():
+    """
+    Recomputes the counters of every user. Returns (users checked, users
+    whose counters had drifted).
+    """
+    totals = _totals(UrlEntry.objects.all())
+    stored = {stats.user_id: stats for stats in UserStats.objects.all()}
+    zero = dict.fromkeys(COUNTERS, 0)
+    checked = drifted = 0
+    for user_id in User.objects.values_list('id', flat=True).iterator():
+        checked += 1
+        expected = totals.get(user_id, zero)
+        stats = stored.get(user_id)
+        if stats is not None and all(getattr(stats, field) == expected[field] for field in COUNTERS):
+            continue
+        if stats is None:
+            UserStats.objects.create(user_id=user_id, **expected)
+            continue
+        drifted += 1
+        # Bump the version too, cached pages may show the drifted numbers.
+        UserStats.objects.filter(user_id=user_id).update(**expected, **_bump())
+    return checked, drifted
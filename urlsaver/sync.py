@@ -0,0 +1,200 @@
+"""
+Incremental sync for clients that mirror a user's bookmarks through the API.
+
+GET /api/sync/ without a cursor returns the user's entries (trashed ones
+included) in batches; every response carries a `cursor` for the next call.
+GET /api/sync/?since=<cursor> then returns only what changed after that
+point: entries created or modified (including being trashed or restored)
+and the ids of entries that were hard deleted, recorded as Tombstone rows
+by urlsaver.stats.hard_delete().
+
+Changes are ordered by a per-user change sequence, not by time. Every
+write takes the next number of its user's sequence (next_change_seqs())
+and stamps it on the rows it writes, in the same transaction. Taking a
+number locks the user's ChangeSequence row until the transaction ends, so
+a user's numbers are handed out in commit order: a client that synced up
+to number N can never see N + 1 before N is committed. A wall clock time
+can't promise that: a row written early in a long transaction (a CSV
+import, a bulk API call) becomes visible after rows written later.
+
+Both streams are read with keyset conditions on (change_seq, id) through
+their (user, change_seq, id) indexes, so a sync costs O(changes), not
+O(collection). Tombstones are kept for LINKBOX_TOMBSTONE_DAYS days; a
+cursor older than that can't be answered reliably and clients must start
+over.
+"""
+import base64
+import binascii
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import ChangeSequence, Tombstone, UrlEntry
+
+
+class CursorExpired(Exception):
+    """
+    The cursor predates the oldest tombstone that is still kept.
+    """
+
+
+def tombstone_days():
+    """
+    Returns the number of days tombstones (and sync cursors) stay valid.
+    """
+    return getattr(settings, 'LINKBOX_TOMBSTONE_DAYS', 90)
+
+
+def sync_batch_size():
+    """
+    Returns the maximum number of entries (and of tombstones) per response.
+    """
+    return getattr(settings, 'LINKBOX_SYNC_BATCH_SIZE', 500)
+
+
+def next_change_seqs(user_ids):
+    """
+    Takes the next number of every user's change sequence and returns them,
+    {user_id: number}. Must be called inside the transaction that writes
+    the changes, see the module docstring.
+    """
+    user_ids = set(user_ids)
+    if not user_ids:
+        return {}
+    sequences = ChangeSequence.objects.filter(user__in=user_ids)
+    if sequences.update(value=F('value') + 1) < len(user_ids):
+        # First change of some users. A concurrent first change may create
+        # the same row: whoever loses the race increments it afterwards.
+        missing = user_ids - set(sequences.values_list('user_id', flat=True))
+        ChangeSequence.objects.bulk_create([ChangeSequence(user_id=user_id) for user_id in missing],
+                                           ignore_conflicts=True)
+        ChangeSequence.objects.filter(user__in=missing).update(value=F('value') + 1)
+    return dict(sequences.values_list('user_id', 'value'))
+
+
+def next_change_seq(user):
+    """
+    next_change_seqs() for a single user (or user id).
+    """
+    user_id = getattr(user, 'pk', user)
+    return next_change_seqs([user_id])[user_id]
+
+
+def encode_sync_cursor(issued_at, entries_after, tombstones_after):
+    """
+    Packs a sync position into an opaque, URL safe token.
+
+    :param issued_at: When the client first synced, for the expiry check.
+    :param entries_after: (change_seq, id) of the last entry sent, or None.
+    :param tombstones_after: (change_seq, id) of the last tombstone sent, or None.
+    """
+    positions = [None if pos is None else list(pos) for pos in (entries_after, tombstones_after)]
+    raw = json.dumps([issued_at.isoformat(), *positions])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_sync_cursor(token):
+    """
+    Unpacks a token made by encode_sync_cursor(). Raises ValueError if it
+    is malformed, CursorExpired if it predates the change sequence.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        issued_at, *positions = json.loads(raw)
+        issued_at = parse_datetime(issued_at)
+        if any(pos and isinstance(pos[0], str) for pos in positions):
+            # Positions used to be (time, id): start over.
+            raise CursorExpired(token)
+        decoded = [None if pos is None else (int(pos[0]), int(pos[1])) for pos in positions]
+    except (ValueError, TypeError, IndexError, binascii.Error):
+        raise ValueError("Invalid sync cursor.")
+    if issued_at is None or len(decoded) != 2:
+        raise ValueError("Invalid sync cursor.")
+    return issued_at, decoded[0], decoded[1]
+
+
+def _after(position):
+    if position is None:
+        return Q()
+    seq, pk = position
+    return Q(change_seq__gt=seq) | Q(change_seq=seq, id__gt=pk)
+
+
+def record_tombstones(queryset, batch_size=1000):
+    """
+    Records a tombstone for every entry in `queryset`, before it is deleted.
+    Must be called inside the transaction that deletes them.
+    """
+    moment = timezone.now()
+    seqs, batch = {}, []
+    for pk, user_id in queryset.values_list('id', 'user_id').iterator(chunk_size=batch_size):
+        if user_id not in seqs:
+            seqs.update(next_change_seqs([user_id]))
+        batch.append(Tombstone(user_id=user_id, entry_id=pk, deleted_at=moment, change_seq=seqs[user_id]))
+        if len(batch) >= batch_size:
+            Tombstone.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        Tombstone.objects.bulk_create(batch)
+
+
+def prune_tombstones():
+    """
+    Deletes the tombstones older than tombstone_days().
+    """
+    return Tombstone.objects.filter(deleted_at__lt=timezone.now() - timedelta(days=tombstone_days())).delete()[0]
+
+
+def changes_since(user, token=None, limit=None):
+    """
+    Returns the user's changes after the sync cursor `token` (everything if
+    it is None) as a dict with:
+
+    * `changed`: the created or modified UrlEntry objects, oldest change first;
+    * `deleted`: the ids of the hard deleted entries;
+    * `cursor`: the token to pass as `since` next time;
+    * `has_more`: whether a batch was cut at `limit` and the client should
+      call again straight away.
+
+    Raises ValueError for a malformed token and CursorExpired for an
+    expired one.
+    """
+    limit = limit or sync_batch_size()
+    tombstones = Tombstone.objects.filter(user=user)
+    if token:
+        issued_at, entries_after, tombstones_after = decode_sync_cursor(token)
+        if issued_at < timezone.now() - timedelta(days=tombstone_days()):
+            raise CursorExpired(token)
+    else:
+        # A full sync: older tombstones are about entries the client never saw.
+        issued_at, entries_after = timezone.now(), None
+        tombstones_after = tombstones.order_by('-change_seq', '-id').values_list('change_seq', 'id').first()
+
+    changed = list(
+        UrlEntry.objects.filter(user=user).filter(_after(entries_after))
+        .order_by('change_seq', 'id')[:limit + 1]
+    )
+    deleted = list(
+        tombstones.filter(_after(tombstones_after))
+        .order_by('change_seq', 'id').values_list('change_seq', 'id', 'entry_id')[:limit + 1]
+    )
+    has_more = len(changed) > limit or len(deleted) > limit
+    changed, deleted = changed[:limit], deleted[:limit]
+
+    if changed:
+        entries_after = (changed[-1].change_seq, changed[-1].pk)
+    if deleted:
+        tombstones_after = deleted[-1][:2]
+    if not has_more:
+        # The cursor's age is measured from the last complete sync.
+        issued_at = timezone.now()
+    return {
+        'changed': changed,
+        'deleted': [entry_id for _, _, entry_id in deleted],
+        'cursor': encode_sync_cursor(issued_at, entries_after, tombstones_after),
+        'has_more': has_more,
+    }
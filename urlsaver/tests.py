@@ -1,3 +1,1790 @@
-from django.test import TestCase
+import base64
+import csv
+import gzip
+import io
+import json
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.db.models import Count
+from django.db.migrations.executor import MigrationExecutor
+from django.template import Template
+from django.test import Client, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from urlmanager.urls import router
+from django.utils import timezone
+from unittest import mock, skipUnless
+import requests
+from rest_framework.test import APIClient
+
+from .exports import pdf_tables
+from .facets import category_facets, compute_facets
+from .forms import UrlForm
+from .generator import BookmarkGenerator
+from .jobs import run_next
+from .linkcheck import LinkChecker
+from .models import (ChangeSequence, Job, LinkCheck, LinkPreview, Tag, Tombstone, UrlEntry, UserStats, parse_tags,
+                     purge_expired, sync_tags, tag_counts)
+from .pagination import KeysetPaginator, decode_cursor
+from .previews import MAX_REDIRECTS, PinnedAdapter, url_hash as preview_key
+from . import profiling, urls as urlsaver_urls
+from .visits import LOCK_KEY, LockTimeout, _Locked, flush_visits, pending_visits
+from .search import apply_search
+from .serializers import URLSerializer
+from .sync import next_change_seq
+from .stats import get_stats, hard_delete, reconcile
+from .versioning import fragment_cache
+from .utils import _domain_extractor, auto_name_from_url, canonicalize_url, domain_of_host
+
+
+class SearchIndexTests(TestCase):
+    """
+    Tests for the full-text search used by the index view.
+    """
+
+    def setUp(self):
+        caches[fragment_cache()].clear()
+        self.user = User.objects.create_user('alice', password='pw')
+        self.other = User.objects.create_user('bob', password='pw')
+        self.github = UrlEntry.objects.create(
+            user=self.user, name='GitHub', url='https://github.com/django/django', tags='code, python')
+        self.docs = UrlEntry.objects.create(
+            user=self.user, name='Docs', url='https://docs.djangoproject.com/', category='website')
+        self.video = UrlEntry.objects.create(
+            user=self.user, name='Talk', url='https://youtube.com/watch?v=1', category='youtube', tags='django')
+        UrlEntry.objects.create(user=self.other, name='Django', url='https://djangoproject.com/')
+
+    def search(self, query):
+        return list(apply_search(UrlEntry.objects.filter(user=self.user), query))
+
+    def test_prefix_match_across_fields(self):
+        self.assertEqual(set(self.search('djang')), {self.github, self.docs, self.video})
+        self.assertEqual(self.search('pyth'), [self.github])
+        self.assertEqual(self.search('youtube'), [self.video])
+
+    def test_all_terms_must_match(self):
+        self.assertEqual(self.search('django code'), [self.github])
+
+    def test_name_matches_rank_first(self):
+        self.docs.name = 'Django docs'
+        self.docs.save()
+        self.assertEqual(self.search('django')[0], self.docs)
+
+    def test_index_follows_queryset_update_and_delete(self):
+        UrlEntry.objects.filter(pk=self.video.pk).update(name='Keynote')
+        self.assertEqual(self.search('keynote'), [self.video])
+        self.github.delete()
+        self.assertEqual(self.search('pyth'), [])
+
+    def test_bulk_create_is_indexed(self):
+        UrlEntry.objects.bulk_create([UrlEntry(user=self.user, name='Bulk', url='https://bulk.example/')])
+        self.assertEqual(len(self.search('bulk')), 1)
+
+    def test_punctuation_only_query_falls_back_to_icontains(self):
+        self.assertEqual(len(self.search('://')), 3)
+
+    def test_index_view_uses_search(self):
+        self.client.login(username='alice', password='pw')
+        response = self.client.get(reverse('urlsaver:index'), {'search': 'pyth'})
+        self.assertEqual(list(response.context['page_obj']), [self.github])
+
+
+class TagTests(TestCase):
+    """
+    Tests for the normalized Tag model behind UrlEntry.tags.
+    """
+
+    def setUp(self):
+        caches[fragment_cache()].clear()
+        self.user = User.objects.create_user('alice', password='pw')
+        self.client.login(username='alice', password='pw')
+
+    def test_save_splits_and_normalizes_tags(self):
+        entry = UrlEntry.objects.create(user=self.user, url='https://a.example/', tags=' Python, django,,python ')
+        self.assertEqual(entry.tags, 'python, django')
+        self.assertEqual(sorted(entry.tag_set.values_list('name', flat=True)), ['django', 'python'])
+
+        entry.tags = 'django'
+        entry.save()
+        self.assertEqual(list(entry.tag_set.values_list('name', flat=True)), ['django'])
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+
+    def test_normalized_tags_fit_the_column(self):
+        # 85 three letter tags are 253 characters raw but 338 once joined with ", "
+        raw = ','.join(f'{i:03}' for i in range(85))
+        entry = UrlEntry.objects.create(user=self.user, url='https://a.example/', tags=raw)
+        self.assertLessEqual(len(entry.tags), UrlEntry.TAGS_MAX_LENGTH)
+        self.assertEqual(entry.tag_names(), [f'{i:03}' for i in range(len(entry.tag_names()))])
+        self.assertEqual(entry.tag_set.count(), len(entry.tag_names()))
+
+    def test_tag_filter_is_exact(self):
+        python = UrlEntry.objects.create(user=self.user, url='https://a.example/', tags='python')
+        UrlEntry.objects.create(user=self.user, url='https://b.example/', tags='py')
+        response = self.client.get(reverse('urlsaver:index'), {'tag': 'Python'})
+        self.assertEqual(list(response.context['page_obj']), [python])
+
+    def test_tag_counts_skip_trashed_entries(self):
+        UrlEntry.objects.create(user=self.user, url='https://a.example/', tags='python, web')
+        UrlEntry.objects.create(user=self.user, url='https://b.example/', tags='python')
+        UrlEntry.objects.create(user=self.user, url='https://c.example/', tags='web', is_deleted=True)
+        self.assertEqual(tag_counts(self.user), [('python', 2), ('web', 1)])
+
+    def test_form_and_api_keep_comma_separated_tags(self):
+        self.client.post(reverse('urlsaver:add_url'), {'url': 'https://a.example/', 'tags': 'b, a'})
+        entry = UrlEntry.objects.get(user=self.user)
+        self.assertEqual(entry.tags, 'b, a')
+        self.assertEqual(entry.tag_set.count(), 2)
+        details = self.client.get(reverse('urlsaver:get_url_details', args=[entry.pk])).json()
+        self.assertEqual(details['tags'], 'b, a')
+
+
+class AutoNameTests(SimpleTestCase):
+    """
+    Tests for the names derived from URLs when none is given.
+    """
+
+    def test_names_come_from_the_registrable_domain(self):
+        self.assertEqual(auto_name_from_url('https://www.bbc.co.uk/news'), 'bbc')
+        self.assertEqual(auto_name_from_url('leetcode.com/problems'), 'leetcode')
+        self.assertEqual(auto_name_from_url('HTTP://user:pw@Docs.Python.org:8080/3/?q#x'), 'Python')
+        self.assertEqual(auto_name_from_url('https://192.168.0.1/admin'), '192.168.0.1')
+        self.assertEqual(auto_name_from_url('not a url'), 'not a url')
+
+    def test_offline_and_memoized_per_host(self):
+        self.assertEqual(_domain_extractor.suffix_list_urls, ())
+        domain_of_host.cache_clear()
+        for path in ('a', 'b', 'c'):
+            auto_name_from_url(f'https://github.com/{path}')
+        info = domain_of_host.cache_info()
+        self.assertEqual((info.misses, info.hits), (1, 2))
+
+
+class KeysetPaginationTests(TestCase):
+    """
+    Tests for cursor based pagination of the index and the trash.
+    """
+
+    def setUp(self):
+        caches[fragment_cache()].clear()
+        self.user = User.objects.create_user('alice', password='pw')
+        self.client.login(username='alice', password='pw')
+        base = timezone.now()
+        entries = UrlEntry.objects.bulk_create([
+            UrlEntry(user=self.user, name=f'e{i}', url=f'https://e{i}.example/',
+                     is_deleted=i % 2 == 1, deleted_at=base - timedelta(minutes=i) if i % 2 else None)
+            for i in range(12)
+        ])
+        # Two entries share a timestamp so the id tie-breaker is exercised.
+        UrlEntry.objects.filter(pk__in=[entries[2].pk, entries[4].pk]).update(created_at=base)
+        self.active = list(UrlEntry.objects.filter(user=self.user, is_deleted=False).order_by('-created_at', '-id'))
+
+    def test_walks_forward_and_back_without_gaps(self):
+        paginator = KeysetPaginator(UrlEntry.objects.filter(user=self.user, is_deleted=False), 4, ('-created_at', '-id'))
+        first = paginator.get_page()
+        second = paginator.get_page(first.next_cursor)
+        self.assertEqual(list(first) + list(second), self.active)
+        self.assertFalse(second.has_next())
+        self.assertEqual(second.start_index(), 5)
+        back = paginator.get_page(second.previous_cursor)
+        self.assertEqual(list(back), list(first))
+        self.assertFalse(back.has_previous())
+
+    def test_invalid_cursor_gives_first_page(self):
+        self.assertIsNone(decode_cursor('not-a-cursor'))
+        response = self.client.get(reverse('urlsaver:index'), {'cursor': 'garbage', 'show_n_records': 5})
+        self.assertEqual(list(response.context['page_obj']), self.active[:5])
+
+    def test_small_collections_keep_page_numbers(self):
+        response = self.client.get(reverse('urlsaver:index'), {'page': 2, 'show_n_records': 5})
+        self.assertFalse(getattr(response.context['page_obj'], 'is_keyset', False))
+        self.assertEqual(list(response.context['page_obj']), self.active[5:])
+
+    @override_settings(LINKBOX_KEYSET_THRESHOLD=3)
+    def test_large_collections_switch_to_cursors(self):
+        response = self.client.get(reverse('urlsaver:index'), {'show_n_records': 5})
+        page = response.context['page_obj']
+        self.assertTrue(page.is_keyset)
+        self.assertContains(response, f'cursor={page.next_cursor}')
+        response = self.client.get(reverse('urlsaver:index'), {'cursor': page.next_cursor, 'show_n_records': 5})
+        self.assertEqual(list(response.context['page_obj']), self.active[5:])
+
+    @override_settings(LINKBOX_KEYSET_THRESHOLD=3)
+    def test_index_data_renders_the_same_page(self):
+        params = {'show_n_records': 5}
+        page = self.client.get(reverse('urlsaver:index'), params).content.decode()
+        data = self.client.get(reverse('urlsaver:index_data'), params).json()
+        self.assertIn(data['rows_html'].strip(), page)
+        self.assertIn(data['pagination_html'].strip(), page)
+        self.assertLess(len(data['rows_html']) + len(data['pagination_html']), len(page) // 5)
+
+        next_cursor = self.client.get(reverse('urlsaver:index'), params).context['page_obj'].next_cursor
+        data = self.client.get(reverse('urlsaver:index_data'), {'cursor': next_cursor, **params}).json()
+        self.assertIn(self.active[5].name, data['rows_html'])
+        self.assertNotIn(f'>{self.active[0].name}<', data['rows_html'])
+
+    @override_settings(LINKBOX_KEYSET_THRESHOLD=3)
+    def test_trash_data_uses_deleted_at_cursor(self):
+        trashed = list(UrlEntry.objects.filter(user=self.user, is_deleted=True).order_by('-deleted_at', '-id'))
+        data = self.client.get(reverse('urlsaver:trash_data')).json()
+        self.assertIn('loadTrashCursor', data['pagination_html'])
+        self.assertIn(trashed[0].name, data['rows_html'])
+        self.assertNotIn(trashed[5].name, data['rows_html'])
+
+
+@skipUnless(connection.vendor == 'sqlite', 'query plans are checked against SQLite')
+class QueryPlanTests(TestCase):
+    """
+    Pins the hot UrlEntry queries to the composite indexes from migration 0004,
+    so a changed filter or ordering that stops using them fails loudly.
+    """
+
+    def setUp(self):
+        users = [User.objects.create_user(f'user{n}') for n in range(10)]
+        self.user = users[0]
+        UrlEntry.objects.bulk_create([
+            UrlEntry(user=user, url=f'https://e{i}.example/', is_deleted=i % 3 == 0,
+                     deleted_at=timezone.now() if i % 3 == 0 else None)
+            for user in users
+            for i in range(30)
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan)
+        self.assertNotIn('USE TEMP B-TREE FOR ORDER BY', plan)
+
+    def test_index_listing(self):
+        queryset = UrlEntry.objects.filter(user=self.user, is_deleted=False).order_by('-created_at', '-id')[:6]
+        self.assertUsesIndex(queryset, 'urlentry_user_active_idx')
+
+    def test_activity_counts(self):
+        self.assertUsesIndex(UrlEntry.objects.filter(user=self.user, is_deleted=False).values('pk'),
+                             'urlentry_user_active_idx')
+        self.assertUsesIndex(UrlEntry.objects.filter(user=self.user, is_deleted=True).values('pk'),
+                             'urlentry_user_trash_idx')
+
+    def test_trash_listing(self):
+        queryset = UrlEntry.objects.filter(user=self.user).trashed().order_by('-deleted_at', '-id')[:6]
+        self.assertUsesIndex(queryset, 'urlentry_user_trash_idx')
+
+    def test_duplicate_check(self):
+        queryset = UrlEntry.objects.filter(user=self.user).with_url('http://E1.example')
+        # SQLite names the index of urlentry_user_url_hash_uniq sqlite_autoindex_*
+        self.assertUsesIndex(queryset, '(user_id=? AND url_hash=?)')
+
+    def test_purge_expired(self):
+        self.assertUsesIndex(UrlEntry.objects.expired(), 'urlentry_purge_idx')
+
+    def test_category_facets(self):
+        queryset = (UrlEntry.objects.filter(user=self.user).active()
+                    .values('effective_category', 'sub_category').annotate(n=Count('id')).order_by())
+        self.assertUsesIndex(queryset, 'urlentry_user_category_idx')
+
+
+@override_settings(LINKBOX_VISIT_FLUSH_INTERVAL=3600)
+class VisitBufferTests(TestCase):
+    """
+    Tests for the write-behind visit counter used by visit_url.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('alice', password='pw')
+        self.client.login(username='alice', password='pw')
+        self.first = UrlEntry.objects.create(user=self.user, url='https://a.example/')
+        self.second = UrlEntry.objects.create(user=self.user, url='https://b.example/', visit_count=5)
+
+    def visit(self, entry):
+        return self.client.get(reverse('urlsaver:visit_url', args=[entry.pk]))
+
+    def test_visit_redirects_without_writing(self):
+        with self.assertNumQueries(3):  # session, user, entry lookup
+            response = self.visit(self.first)
+        self.assertRedirects(response, 'https://a.example/', fetch_redirect_response=False)
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.visit_count, 0)
+        self.assertEqual(pending_visits(), {(self.first.pk, self.user.pk): 1})
+
+    def test_flush_applies_all_deltas_in_one_update(self):
+        for entry in (self.first, self.first, self.second):
+            self.visit(entry)
+        with CaptureQueriesContext(connection) as queries:
+            flush_visits()
+        self.assertEqual(len([q for q in queries if q['sql'].startswith('UPDATE "urlsaver_urlentry"')]), 1)
+        self.first.refresh_from_db()
+        self.second.refresh_from_db()
+        self.assertEqual((self.first.visit_count, self.second.visit_count), (2, 6))
+        self.assertEqual(pending_visits(), {})
+
+    def test_lock_is_only_released_by_its_holder(self):
+        cache.set(LOCK_KEY, 'another holder', 60)
+        with self.assertRaises(LockTimeout):
+            with _Locked(cache, timeout=0.01):
+                pass
+        cache.delete(LOCK_KEY)
+        with _Locked(cache, timeout=0.01):
+            # An expired holder finishing late leaves the new lock alone.
+            cache.set(LOCK_KEY, 'a later holder', 60)
+        self.assertEqual(cache.get(LOCK_KEY), 'a later holder')
+
+    def test_management_command_flushes(self):
+        with self.assertRaisesMessage(CommandError, 'LINKBOX_VISIT_CACHE'):
+            call_command('flush_visits', stdout=io.StringIO())
+
+        shared = {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'linkbox_visits'}
+        with self.settings(CACHES={**settings.CACHES, 'visits': shared}, LINKBOX_VISIT_CACHE='visits'):
+            call_command('createcachetable', 'linkbox_visits', verbosity=0)
+            self.visit(self.second)
+            call_command('flush_visits', stdout=io.StringIO())
+        self.second.refresh_from_db()
+        self.assertEqual(self.second.visit_count, 6)
+
+    def test_clicks_on_deleted_entries_are_dropped(self):
+        get_stats(self.user)
+        self.visit(self.first)
+        self.visit(self.second)
+        hard_delete(UrlEntry.objects.filter(pk=self.first.pk))
+        flush_visits()
+        self.assertEqual(get_stats(self.user).visit_count, 6)
+        self.assertEqual(pending_visits(), {})
+
+    def test_trashed_entry_is_not_counted(self):
+        self.first.is_deleted = True
+        self.first.save()
+        self.assertEqual(self.visit(self.first).status_code, 404)
+        self.assertEqual(pending_visits(), {})
+
+
+class CsvExportTests(TestCase):
+    """
+    Tests for the streaming CSV exports.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='pw')
+        self.client.login(username='alice', password='pw')
+        self.entries = [
+            UrlEntry.objects.create(user=self.user, name=f'Site {i}', url=f'https://s{i}.example/',
+                                    category='website', sub_category='docs', tags='a, b')
+            for i in range(3)
+        ]
+        UrlEntry.objects.create(user=self.user, name='Gone', url='https://gone.example/', is_deleted=True)
+
+    def rows(self, content):
+        return list(csv.reader(io.StringIO(content.decode())))
+
+    def test_export_all_streams_active_rows(self):
+        response = self.client.post(reverse('urlsaver:export_all_csv'))
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="all_urls.csv"')
+        rows = self.rows(b''.join(response.streaming_content))
+        self.assertEqual(rows[0], ['Name', 'URL', 'Category', 'Sub Category', 'Tags'])
+        self.assertEqual(rows[1:], [
+            [f'Site {i}', f'https://s{i}.example/', 'website', 'docs', 'a, b'] for i in (2, 1, 0)
+        ])
+
+    def test_export_selected_gzip(self):
+        response = self.client.post(reverse('urlsaver:export_selected_csv'), {
+            'selected_urls[]': [self.entries[0].pk], 'compress': 'gzip',
+        })
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertIn('selected_urls.csv.gz', response['Content-Disposition'])
+        rows = self.rows(gzip.decompress(b''.join(response.streaming_content)))
+        self.assertEqual(rows[1][0], 'Site 0')
+        self.assertEqual(len(rows), 2)
+
+
+class PdfExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='pw')
+        self.client.force_login(self.user)
+
+    def test_rows_are_split_into_table_chunks(self):
+        rows = [(f'Site {i}', f'https://site{i}.example/', '', '', '') for i in range(7)]
+        progress = []
+        tables = list(pdf_tables(iter(rows), 500, 3, on_progress=progress.append))
+        self.assertEqual([len(table._cellvalues) for table in tables], [4, 4, 2])  # header + rows
+        self.assertEqual(progress, [3, 6, 7])
+
+    @override_settings(LINKBOX_PDF_ROWS_PER_TABLE=2)
+    def test_export_all_pdf_handles_markup_characters(self):
+        for i in range(5):
+            UrlEntry.objects.create(user=self.user, name=f'<b>Q&A {i}', url=f'https://site{i}.example/?a=1&b=2')
+        UrlEntry.objects.create(user=self.user, url='https://quote.example/?q="x"')
+        response = self.client.get(reverse('urlsaver:export_all_pdf'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="all_urls_export.pdf"')
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+
+
+class CsvImportTests(TestCase):
+    """
+    Tests for the batched CSV import behind import_csv.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='pw')
+        self.client.login(username='alice', password='pw')
+        UrlEntry.objects.create(user=self.user, url='https://active.example/')
+        self.trashed = UrlEntry.objects.create(user=self.user, url='https://trashed.example/', is_deleted=True)
+
+    def upload(self, text):
+        csv_file = SimpleUploadedFile('urls.csv', text.encode(), content_type='text/csv')
+        return self.client.post(reverse('urlsaver:import_csv'), {'csv_file': csv_file}).json()
+
+    def test_report_matches_add_restore_skip_rules(self):
+        result = self.upload(
+            'Name,URL,Category,Sub Category,Tags\n'
+            ',newsite.com/path,website,docs,"Python, web"\n'
+            'Again,https://newsite.com/path,,,\n'
+            ',https://active.example/,,,\n'
+            ',https://trashed.example/,,,\n'
+            ',not a url,,,\n'
+            ',,,,\n'
+        )
+        self.assertEqual((result['added'], result['restored'], result['skipped']), (1, 1, 3))
+        new = UrlEntry.objects.get(url='https://newsite.com/path')
+        self.assertEqual((new.name, new.category, new.sub_category, new.tags), ('newsite', 'website', 'docs', 'python, web'))
+        self.assertEqual(new.tag_set.count(), 2)
+        self.trashed.refresh_from_db()
+        self.assertFalse(self.trashed.is_deleted)
+        self.assertIsNone(self.trashed.deleted_at)
+
+    @override_settings(LINKBOX_IMPORT_BATCH_SIZE=10)
+    def test_query_count_does_not_grow_per_row(self):
+        def import_rows(count, offset):
+            lines = ['URL'] + [f'https://site{offset + i}.example/' for i in range(count)]
+            with CaptureQueriesContext(connection) as queries:
+                result = self.upload('\n'.join(lines))
+            self.assertEqual(result['added'], count)
+            return len(queries)
+
+        # 9 and 10 rows are one batch, 100 rows are ten.
+        self.assertEqual(import_rows(9, 0), import_rows(10, 100))
+        self.assertLessEqual(import_rows(100, 1000), import_rows(10, 200) + 9 * 2)
+
+    def test_rejects_undecodable_file(self):
+        csv_file = SimpleUploadedFile('urls.csv', b'URL\n\xff\xfe', content_type='text/csv')
+        response = self.client.post(reverse('urlsaver:import_csv'), {'csv_file': csv_file})
+        self.assertEqual(response.status_code, 400)
+
+
+class JobTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.user = User.objects.create_user('alice', password='pw')
+        self.client.force_login(self.user)
+        self.entries = [
+            UrlEntry.objects.create(user=self.user, name=f'Site {i}', url=f'https://site{i}.example/')
+            for i in range(3)
+        ]
+
+    def test_pdf_export_job_is_run_and_downloaded(self):
+        response = self.client.post(reverse('urlsaver:queue_pdf_export'), {'selected_urls[]': [self.entries[0].pk]})
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['status'], Job.QUEUED)
+        status_url = response.json()['status_url']
+
+        job = run_next()
+        self.assertEqual(job.status, Job.DONE)
+        self.assertIsNone(run_next())
+
+        status = self.client.get(status_url).json()
+        self.assertEqual((status['status'], status['progress'], status['total']), (Job.DONE, 1, 1))
+        download = self.client.get(status['download_url'])
+        self.assertEqual(download['Content-Disposition'], 'attachment; filename="urls_export.pdf"')
+        self.assertTrue(b''.join(download.streaming_content).startswith(b'%PDF'))
+
+    @override_settings(LINKBOX_ASYNC_IMPORT_THRESHOLD=10)
+    def test_large_import_is_queued(self):
+        csv_file = SimpleUploadedFile('urls.csv', b'URL\nhttps://queued.example/\n', content_type='text/csv')
+        response = self.client.post(reverse('urlsaver:import_csv'), {'csv_file': csv_file})
+        self.assertEqual(response.status_code, 202)
+        self.assertFalse(UrlEntry.objects.filter(url='https://queued.example/').exists())
+
+        job = run_next()
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(job.result['added'], 1)
+        self.assertTrue(UrlEntry.objects.filter(user=self.user, url='https://queued.example/').exists())
+        self.assertFalse(job.input_file)
+
+    def test_failed_job_records_error(self):
+        job = Job.objects.create(user=self.user, kind=Job.IMPORT_CSV)  # no input file
+        run_next()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertTrue(job.error)
+        self.assertEqual(self.client.get(reverse('urlsaver:job_status', args=[job.pk])).json()['error'], 'The job failed.')
+
+    def test_jobs_are_private(self):
+        job = Job.objects.create(user=User.objects.create_user('bob'), kind=Job.EXPORT_PDF)
+        self.assertEqual(self.client.get(reverse('urlsaver:job_status', args=[job.pk])).status_code, 404)
+
+    def test_only_large_pdf_exports_are_queued(self):
+        url = reverse('urlsaver:export_selected_pdf')
+        ids = [entry.pk for entry in self.entries]
+        response = self.client.post(url, {'selected_urls[]': ids})
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertFalse(Job.objects.exists())
+
+        with override_settings(LINKBOX_ASYNC_EXPORT_THRESHOLD=2):
+            response = self.client.post(url, {'confirm_export': 'true'})
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(Job.objects.get().params, {'ids': []})
+
+        url = reverse('urlsaver:export_all_pdf')
+        self.assertEqual(self.client.get(url)['Content-Type'], 'application/pdf')
+        with override_settings(LINKBOX_ASYNC_EXPORT_THRESHOLD=2):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['status_url'], reverse('urlsaver:job_status', args=[response.json()['job_id']]))
+        self.assertEqual(Job.objects.count(), 2)
+
+    def test_abandoned_jobs_fail_and_old_ones_expire(self):
+        stale = Job.objects.create(user=self.user, kind=Job.EXPORT_PDF, status=Job.RUNNING,
+                                   heartbeat_at=timezone.now() - timedelta(hours=1))
+        alive = Job.objects.create(user=self.user, kind=Job.EXPORT_PDF, status=Job.RUNNING,
+                                   heartbeat_at=timezone.now())
+        old = Job.objects.create(user=self.user, kind=Job.EXPORT_PDF, status=Job.DONE,
+                                 finished_at=timezone.now() - timedelta(days=2))
+        old.result_file.save('old.pdf', ContentFile(b'%PDF'))
+        path = old.result_file.path
+
+        call_command('run_jobs', '--once', stdout=io.StringIO())
+        stale.refresh_from_db()
+        alive.refresh_from_db()
+        self.assertEqual((stale.status, alive.status), (Job.FAILED, Job.RUNNING))
+        self.assertFalse(Job.objects.filter(pk=old.pk).exists())
+        self.assertFalse(os.path.exists(path))
+        # Failed just now, kept until it expires in turn
+        self.assertTrue(Job.objects.filter(pk=stale.pk).exists())
+
+
+@override_settings(LINKBOX_VISIT_FLUSH_INTERVAL=3600)
+class UserStatsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('alice', password='pw')
+        self.client.force_login(self.user)
+
+    def activity(self):
+        return self.client.get(reverse('urlsaver:activity_data')).json()
+
+    def assertCountersMatchRows(self):
+        stats = get_stats(self.user)
+        entries = UrlEntry.objects.filter(user=self.user)
+        self.assertEqual(
+            (stats.active_count, stats.trashed_count, stats.visit_count),
+            (entries.filter(is_deleted=False).count(), entries.filter(is_deleted=True).count(),
+             sum(entries.values_list('visit_count', flat=True))),
+        )
+
+    def test_counters_follow_every_write_path(self):
+        self.assertEqual(self.activity(), {'total_url_count': 0, 'trashed_url_count': 0, 'total_visit_count': 0})
+
+        for i in range(4):
+            self.client.post(reverse('urlsaver:add_url'), {'url': f'https://site{i}.example/', 'name': f'Site {i}'})
+        ids = list(UrlEntry.objects.filter(user=self.user).order_by('id').values_list('id', flat=True))
+        self.assertEqual(self.activity()['total_url_count'], 4)
+
+        self.client.get(reverse('urlsaver:visit_url', args=[ids[0]]))
+        self.client.get(reverse('urlsaver:visit_url', args=[ids[0]]))
+        flush_visits()
+        self.assertEqual(self.activity()['total_visit_count'], 2)
+
+        self.client.post(reverse('urlsaver:delete_url', args=[ids[0]]))
+        # ids[0] is already trashed and must not be counted twice
+        self.client.post(reverse('urlsaver:delete_selected'), {'selected_urls': ids[:3]})
+        self.assertEqual(self.activity(), {'total_url_count': 1, 'trashed_url_count': 3, 'total_visit_count': 2})
+        self.assertCountersMatchRows()
+
+        self.client.post(reverse('urlsaver:trash_recover'), {'ids': ids}, content_type='application/json')
+        self.client.post(reverse('urlsaver:delete_selected'), {'selected_urls': ids[:2]})
+        self.client.post(reverse('urlsaver:trash_delete'), {'ids': [ids[0]]}, content_type='application/json')
+        self.assertEqual(self.activity(), {'total_url_count': 2, 'trashed_url_count': 1, 'total_visit_count': 0})
+
+        csv_file = SimpleUploadedFile('urls.csv', b'URL\nhttps://site1.example/\nhttps://new.example/\n')
+        self.client.post(reverse('urlsaver:import_csv'), {'csv_file': csv_file})
+        self.assertEqual(self.activity(), {'total_url_count': 4, 'trashed_url_count': 0, 'total_visit_count': 0})
+
+        UrlEntry.objects.filter(pk=ids[3]).update(is_deleted=True, deleted_at=timezone.now() - timedelta(days=31))
+        UserStats.objects.filter(user=self.user).update(active_count=3, trashed_count=1)
+        purge_expired()
+        self.assertCountersMatchRows()
+
+    def test_activity_data_does_not_count_rows(self):
+        UrlEntry.objects.create(user=self.user, name='A', url='https://a.example/')
+        self.activity()  # creates the counters
+        with CaptureQueriesContext(connection) as queries:
+            self.activity()
+        self.assertFalse([q for q in queries if 'COUNT(' in q['sql'].upper()])
+
+    def test_reconcile_command_fixes_drift(self):
+        UrlEntry.objects.create(user=self.user, name='A', url='https://a.example/', visit_count=5)
+        self.activity()
+        UserStats.objects.filter(user=self.user).update(active_count=40, visit_count=0)
+        out = io.StringIO()
+        call_command('reconcile_stats', stdout=out)
+        self.assertIn('fixed 1', out.getvalue())
+        self.assertEqual(self.activity(), {'total_url_count': 1, 'trashed_url_count': 0, 'total_visit_count': 5})
+
+
+class URLApiTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='pw')
+        self.other = User.objects.create_user('bob', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        base = timezone.now() - timedelta(days=10)
+        for i in range(12):
+            entry = UrlEntry.objects.create(user=self.user, name=f'Site {i}', url=f'https://site{i}.example/',
+                                            category='docs' if i % 2 else 'video', tags='python' if i % 3 == 0 else '')
+            UrlEntry.objects.filter(pk=entry.pk).update(created_at=base + timedelta(days=i % 10, minutes=i))
+        UrlEntry.objects.filter(user=self.user, name='Site 11').update(is_deleted=True, deleted_at=timezone.now())
+        UrlEntry.objects.create(user=self.other, name='Private', url='https://private.example/')
+
+    def fetch_all(self, query=''):
+        names, url = [], reverse('urlentry-list') + query
+        while url:
+            data = self.client.get(url).json()
+            names += [row.get('name') for row in data['results']]
+            url = data['next']
+        return names
+
+    def test_requires_authentication(self):
+        self.assertIn(APIClient().get(reverse('urlentry-list')).status_code, (401, 403))
+
+    def test_list_is_scoped_and_cursor_paginated(self):
+        data = self.client.get(reverse('urlentry-list'), {'page_size': 5}).json()
+        self.assertEqual(set(data), {'next', 'previous', 'results'})
+        self.assertEqual(len(data['results']), 5)
+        names = self.fetch_all('?page_size=5')
+        self.assertEqual(len(names), 11)
+        self.assertNotIn('Private', names)
+        self.assertNotIn('Site 11', names)
+        self.assertEqual(self.client.get(reverse('urlentry-detail', args=[
+            UrlEntry.objects.get(name='Private').pk])).status_code, 404)
+
+    def test_filters(self):
+        self.assertEqual(sorted(self.fetch_all('?category=docs')), sorted(f'Site {i}' for i in (1, 3, 5, 7, 9)))
+        self.assertEqual(sorted(self.fetch_all('?tag=Python')), sorted(f'Site {i}' for i in (0, 3, 6, 9)))
+        self.assertEqual(self.fetch_all('?deleted=true'), ['Site 11'])
+        self.assertEqual(len(self.fetch_all('?deleted=all')), 12)
+        after = UrlEntry.objects.get(name='Site 7').created_at.isoformat()
+        rows = self.client.get(reverse('urlentry-list'), {'created_after': after}).json()['results']
+        self.assertEqual([row['name'] for row in rows], ['Site 9', 'Site 8'])
+        self.assertEqual(self.client.get(reverse('urlentry-list'), {'created_after': 'soon'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('urlentry-list'), {'deleted': 'maybe'}).status_code, 400)
+
+    def test_sparse_fieldsets(self):
+        with CaptureQueriesContext(connection) as queries:
+            rows = self.client.get(reverse('urlentry-list'), {'fields': 'id,url,bogus'}).json()['results']
+        self.assertEqual(set(rows[0]), {'id', 'url'})
+        select = [q['sql'] for q in queries if 'FROM "urlsaver_urlentry"' in q['sql']][0]
+        self.assertNotIn('"tags"', select)
+
+    def test_create_belongs_to_requesting_user(self):
+        response = self.client.post(reverse('urlentry-list'), {
+            'url': 'https://new.example/', 'name': 'New', 'user': self.other.pk,
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(UrlEntry.objects.get(name='New').user, self.user)
+
+
+class SyncTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='pw')
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+        self.client.force_login(self.user)
+        self.entries = [
+            UrlEntry.objects.create(user=self.user, name=f'Site {i}', url=f'https://site{i}.example/')
+            for i in range(5)
+        ]
+        UrlEntry.objects.create(user=User.objects.create_user('bob'), name='Private', url='https://private.example/')
+
+    def sync(self, since=None, **params):
+        if since:
+            params['since'] = since
+        return self.api.get(reverse('api_sync'), params)
+
+    def test_full_then_incremental_sync(self):
+        full = self.sync().json()
+        self.assertEqual(sorted(row['name'] for row in full['changed']), [f'Site {i}' for i in range(5)])
+        self.assertEqual((full['deleted'], full['has_more']), ([], False))
+
+        empty = self.sync(full['cursor']).json()
+        self.assertEqual((empty['changed'], empty['deleted']), ([], []))
+
+        first, second, third = self.entries[:3]
+        self.client.post(reverse('urlsaver:edit_url_view', args=[first.pk]), {'url': first.url, 'name': 'Renamed'})
+        self.client.post(reverse('urlsaver:delete_selected'), {'selected_urls': [second.pk, third.pk]})
+        self.client.post(reverse('urlsaver:trash_delete'), {'ids': [third.pk]}, content_type='application/json')
+        self.client.post(reverse('urlsaver:add_url'), {'url': 'https://new.example/', 'name': 'New'})
+
+        delta = self.sync(empty['cursor']).json()
+        changed = {row['name']: row for row in delta['changed']}
+        self.assertEqual(set(changed), {'Renamed', 'Site 1', 'New'})
+        self.assertTrue(changed['Site 1']['is_deleted'])
+        self.assertEqual(delta['deleted'], [third.pk])
+        self.assertEqual(self.sync(delta['cursor']).json()['changed'], [])
+
+    @override_settings(LINKBOX_SYNC_BATCH_SIZE=2)
+    def test_batches_until_done(self):
+        seen, cursor, calls = [], None, 0
+        while True:
+            data = self.sync(cursor).json()
+            seen += [row['id'] for row in data['changed']]
+            cursor, calls = data['cursor'], calls + 1
+            if not data['has_more']:
+                break
+        self.assertEqual(sorted(seen), sorted(entry.pk for entry in self.entries))
+        self.assertEqual(calls, 3)
+
+    def test_purge_leaves_tombstones(self):
+        cursor = self.sync().json()['cursor']
+        UrlEntry.objects.filter(pk=self.entries[0].pk).update(
+            is_deleted=True, deleted_at=timezone.now() - timedelta(days=31), updated_at=timezone.now())
+        purge_expired()
+        self.assertEqual(self.sync(cursor).json()['deleted'], [self.entries[0].pk])
+
+    def test_changes_are_ordered_by_commit_not_by_time(self):
+        cursor = self.sync().json()['cursor']
+        # Written "before" the last sync, e.g. early in a long transaction
+        # that commits only now
+        with transaction.atomic():
+            UrlEntry.objects.filter(pk=self.entries[0].pk).update(
+                name='Late', updated_at=timezone.now() - timedelta(hours=1), change_seq=next_change_seq(self.user))
+        self.assertEqual([row['name'] for row in self.sync(cursor).json()['changed']], ['Late'])
+
+    def test_every_write_path_takes_a_new_number(self):
+        def seq(entry):
+            return UrlEntry.objects.values_list('change_seq', flat=True).get(pk=entry.pk)
+
+        first, second = self.entries[:2]
+        numbers = [seq(first)]
+        self.client.post(reverse('urlsaver:delete_url', args=[first.pk]))
+        numbers.append(seq(first))
+        self.client.post(reverse('urlsaver:trash_recover'), {'ids': [first.pk]}, content_type='application/json')
+        numbers.append(seq(first))
+        self.api.post(reverse('urlentry-bulk-update'), [{'id': first.pk, 'name': 'Bulk'}], format='json')
+        numbers.append(seq(first))
+        # Visits are not edits
+        self.client.get(reverse('urlsaver:visit_url', args=[first.pk]))
+        flush_visits()
+        self.assertEqual(seq(first), numbers[-1])
+        self.client.post(reverse('urlsaver:delete_selected'), {'selected_urls': [first.pk]})
+        csv_file = SimpleUploadedFile('urls.csv', b'URL\nhttps://site0.example/\n')
+        self.client.post(reverse('urlsaver:import_csv'), {'csv_file': csv_file})
+        numbers.append(seq(first))
+        self.assertEqual(numbers, sorted(set(numbers)))
+
+        hard_delete(UrlEntry.objects.filter(pk=second.pk))
+        tombstone = Tombstone.objects.get(entry_id=second.pk)
+        self.assertEqual(tombstone.change_seq, ChangeSequence.objects.get(user=self.user).value)
+
+    def test_invalid_and_expired_cursors(self):
+        self.assertEqual(self.sync('garbage').status_code, 400)
+        with override_settings(LINKBOX_TOMBSTONE_DAYS=0):
+            cursor = self.sync().json()['cursor']
+            self.assertEqual(self.sync(cursor).status_code, 410)
+        # Cursors from before the change sequence held times
+        raw = json.dumps([timezone.now().isoformat(), [timezone.now().isoformat(), 1], None])
+        old = base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+        self.assertEqual(self.sync(old).status_code, 410)
+
+
+class BulkApiTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='pw')
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+
+    def post(self, action, payload):
+        return self.api.post(reverse(f'urlentry-{action}'), payload, format='json')
+
+    def test_bulk_create_validates_each_item(self):
+        items = [{'url': f'site{i}.com/page', 'tags': 'Python, web'} for i in range(20)]
+        items.insert(3, {'url': 'not a url'})
+        items.insert(5, 'nonsense')
+        self.post('bulk-create', items[:1])  # creates the tags
+        with CaptureQueriesContext(connection) as small:
+            self.post('bulk-create', items[:6])
+        with CaptureQueriesContext(connection) as large:
+            results = self.post('bulk-create', items).json()['results']
+        self.assertEqual(len(large), len(small))
+
+        # The first four were created by the previous calls
+        statuses = [r['status'] for r in results]
+        self.assertEqual((statuses.count('created'), statuses.count('duplicate')), (16, 4))
+        self.assertEqual((results[3]['status'], results[3]['index']), ('error', 3))
+        self.assertIn('url', results[3]['errors'])
+        self.assertEqual(results[5]['status'], 'error')
+        entry = UrlEntry.objects.get(pk=results[0]['id'])
+        self.assertEqual((entry.url, entry.name, entry.tags), ('https://site0.com/page', 'site0', 'python, web'))
+        self.assertEqual(entry.tag_set.count(), 2)
+        self.assertEqual(get_stats(self.user).active_count, UrlEntry.objects.filter(user=self.user).count())
+
+    def test_bulk_update_delete_and_restore(self):
+        entries = [UrlEntry.objects.create(user=self.user, name=f'Site {i}', url=f'https://site{i}.com/')
+                   for i in range(3)]
+        other = UrlEntry.objects.create(user=User.objects.create_user('bob'), url='https://bob.com/')
+        results = self.post('bulk-update', [
+            {'id': entries[0].pk, 'name': '', 'tags': 'A'},
+            {'id': entries[1].pk, 'category': 'x' * 200},
+            {'id': other.pk, 'name': 'Mine now'},
+        ]).json()['results']
+        self.assertEqual([r['status'] for r in results], ['updated', 'error', 'not_found'])
+        entries[0].refresh_from_db()
+        self.assertEqual((entries[0].name, entries[0].tags), ('site0', 'a'))
+
+        ids = [entries[0].pk, entries[1].pk, other.pk]
+        results = self.post('bulk-delete', {'ids': ids}).json()['results']
+        self.assertEqual([r['status'] for r in results], ['trashed', 'trashed', 'not_found'])
+        self.assertEqual(UrlEntry.objects.filter(user=self.user, is_deleted=True).count(), 2)
+        results = self.post('bulk-restore', {'ids': ids[:1] + [entries[2].pk]}).json()['results']
+        self.assertEqual([r['status'] for r in results], ['restored', 'unchanged'])
+        stats = get_stats(self.user)
+        self.assertEqual((stats.active_count, stats.trashed_count), (2, 1))
+
+    @override_settings(LINKBOX_API_BULK_LIMIT=2)
+    def test_rejects_oversized_and_malformed_requests(self):
+        self.assertEqual(self.post('bulk-create', [{}, {}, {}]).status_code, 400)
+        self.assertEqual(self.post('bulk-delete', {'ids': 'all'}).status_code, 400)
+
+
+@override_settings(LINKBOX_VISIT_FLUSH_INTERVAL=3600)
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        caches[fragment_cache()].clear()
+        self.user = User.objects.create_user('alice', password='pw')
+        self.client.force_login(self.user)
+        self.entry = UrlEntry.objects.create(user=self.user, name='A', url='https://a.example/')
+
+    def revalidate(self, url, client=None):
+        client = client or self.client
+        client.get(url)  # the first page view sets the CSRF cookie, which is part of the ETag
+        first = client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('no-cache', first['Cache-Control'])
+        return first['ETag'], client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+
+    def test_unchanged_collection_gets_304(self):
+        for url in (reverse('urlsaver:index'), reverse('urlsaver:index_data'), reverse('urlsaver:trash_data'),
+                    reverse('urlsaver:activity_data'),
+                    reverse('urlsaver:get_url_details', args=[self.entry.pk])):
+            etag, again = self.revalidate(url)
+            self.assertEqual(again.status_code, 304, url)
+
+    def test_304_skips_the_view(self):
+        etag, _ = self.revalidate(reverse('urlsaver:index'))
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('urlsaver:index'), HTTP_IF_NONE_MATCH=etag)
+        self.assertFalse([q for q in queries if 'urlsaver_urlentry' in q['sql']])
+
+    def test_writes_change_the_etag(self):
+        url = reverse('urlsaver:index')
+        etags = {self.revalidate(url)[0]}
+        writes = [
+            lambda: self.client.post(reverse('urlsaver:edit_url_view', args=[self.entry.pk]),
+                                     {'url': self.entry.url, 'name': 'Renamed'}),
+            lambda: self.client.post(reverse('urlsaver:add_url'), {'url': 'https://b.example/', 'name': 'B'}),
+            lambda: self.client.post(reverse('urlsaver:delete_selected'), {'selected_urls': [self.entry.pk]}),
+        ]
+        for write in writes:
+            write()
+            etag, again = self.revalidate(url)
+            self.assertNotIn(etag, etags)
+            self.assertEqual(again.status_code, 304)
+            etags.add(etag)
+
+    def test_visits_only_revalidate_what_shows_them(self):
+        index_etag, _ = self.revalidate(reverse('urlsaver:index'))
+        activity_etag, _ = self.revalidate(reverse('urlsaver:activity_data'))
+        self.client.get(reverse('urlsaver:visit_url', args=[self.entry.pk]))
+        flush_visits()
+        self.assertEqual(self.client.get(reverse('urlsaver:index'), HTTP_IF_NONE_MATCH=index_etag).status_code, 304)
+        response = self.client.get(reverse('urlsaver:activity_data'), HTTP_IF_NONE_MATCH=activity_etag)
+        self.assertEqual(response.json()['total_visit_count'], 1)
+
+    def test_api_list(self):
+        api = APIClient()
+        api.force_authenticate(self.user)
+        url = reverse('urlentry-list')
+        etag, again = self.revalidate(url, api)
+        self.assertEqual(again.status_code, 304)
+        api.post(reverse('urlentry-bulk-delete'), {'ids': [self.entry.pk]}, format='json')
+        self.assertEqual(api.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user('bob'))
+        self.assertNotEqual(other.get(url)['ETag'], api.get(url)['ETag'])
+
+    def test_if_modified_since(self):
+        url = reverse('urlsaver:index_data')
+        self.assertNotIn('Last-Modified', self.client.get(url))  # changed less than a second ago
+        UserStats.objects.filter(user=self.user).update(modified_at=timezone.now() - timedelta(minutes=5))
+        last_modified = self.client.get(url)['Last-Modified']
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+        self.client.post(reverse('urlsaver:edit_url_view', args=[self.entry.pk]),
+                         {'url': self.entry.url, 'name': 'Renamed'})
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 200)
+
+
+class FragmentCacheTests(TestCase):
+    """
+    Tests for the cached URL rows and pagination of the index page.
+    """
+
+    def setUp(self):
+        caches[fragment_cache()].clear()
+        self.user = User.objects.create_user('alice', password='pw')
+        self.client.force_login(self.user)
+        UrlEntry.objects.bulk_create([
+            UrlEntry(user=self.user, name=f'e{i}', url=f'https://e{i}.example/', category='docs' if i % 2 else 'video')
+            for i in range(12)
+        ])
+
+    def listing(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            data = self.client.get(reverse('urlsaver:index_data'), {'show_n_records': 5, **params}).json()
+        return data, [q['sql'] for q in queries]
+
+    def test_repeated_listing_is_served_from_the_cache(self):
+        data, queries = self.listing(page=2)
+        again, cached_queries = self.listing(page=2)
+        self.assertEqual(again, data)
+        self.assertLess(len(cached_queries), len(queries))
+        # Neither the rows nor the page count are fetched, only the version
+        self.assertFalse([q for q in cached_queries if 'urlsaver_urlentry' in q])
+        self.assertTrue([q for q in queries if q.startswith('SELECT "urlsaver_urlentry"."id"')])
+        self.assertTrue([q for q in queries if 'COUNT(' in q])
+
+        # Other filters and pages are fragments of their own
+        self.assertNotEqual(self.listing(page=1)[0], data)
+        self.assertNotEqual(self.listing(page=2, category='docs')[0], data)
+
+    def test_writes_invalidate_the_fragments(self):
+        before, _ = self.listing()
+        self.client.post(reverse('urlsaver:add_url'), {'url': 'https://new.example/', 'name': 'Newest'})
+        after, _ = self.listing()
+        self.assertNotIn('Newest', before['rows_html'])
+        self.assertIn('Newest', after['rows_html'])
+
+        entry = UrlEntry.objects.get(name='Newest')
+        self.client.post(reverse('urlsaver:edit_url_view', args=[entry.pk]), {'url': entry.url, 'name': 'Renamed'})
+        self.assertIn('Renamed', self.listing()[0]['rows_html'])
+        self.client.post(reverse('urlsaver:delete_selected'), {'selected_urls': [entry.pk]})
+        self.assertNotIn('Renamed', self.listing()[0]['rows_html'])
+
+
+@override_settings(LINKBOX_PROFILING=True)
+class ProfilingTests(TestCase):
+    """
+    Tests for the profiling middleware and its stats endpoint.
+    """
+
+    def setUp(self):
+        cache.clear()
+        caches[fragment_cache()].clear()
+        profiling.clear()
+        self.user = User.objects.create_user('alice', password='pw')
+        self.client.force_login(self.user)
+        UrlEntry.objects.create(user=self.user, name='A', url='https://a.example/')
+
+    def test_records_queries_and_timings(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('urlsaver:index'))
+        self.assertIn(f'desc="{len(queries)} queries"', response['Server-Timing'])
+        self.assertIn('template;dur=', response['Server-Timing'])
+        [record] = profiling.records()
+        self.assertEqual(record['url_name'], 'urlsaver:index')
+        self.assertEqual(record['queries'], len(queries))
+        self.assertGreater(record['template_ms'], 0)
+        self.assertGreaterEqual(record['total_ms'], record['template_ms'])
+        # Timed by the template backend, Django's Template class is left alone
+        self.assertEqual(Template.render.__module__, 'django.template.base')
+
+        self.client.get(reverse('urlsaver:activity_data'))
+        self.assertEqual(profiling.records()[-1]['template_ms'], 0)
+
+    def test_stats_are_staff_only(self):
+        for _ in range(3):
+            self.client.get(reverse('urlsaver:index'))
+        self.assertEqual(self.client.get(reverse('urlsaver:profiling_stats')).status_code, 403)
+
+        self.user.is_staff = True
+        self.user.save()
+        data = self.client.get(reverse('urlsaver:profiling_stats')).json()
+        self.assertTrue(data['enabled'])
+        index = data['views']['urlsaver:index']
+        self.assertEqual(index['count'], 3)
+        self.assertEqual(set(index['total_ms']), {'p50', 'p95', 'p99'})
+        self.assertLessEqual(index['total_ms']['p50'], index['total_ms']['p99'])
+
+    @override_settings(LINKBOX_PROFILING=False)
+    def test_off_by_default(self):
+        response = self.client.get(reverse('urlsaver:index'))
+        self.assertFalse(response.has_header('Server-Timing'))
+        self.assertEqual(profiling.records(), [])
+
+    def test_percentiles(self):
+        values = list(range(1, 101))
+        self.assertEqual([profiling.percentile(values, p) for p in (50, 95, 99)], [50, 95, 99])
+        self.assertEqual(profiling.percentile([7], 99), 7)
+
+
+class _PreviewHandler(BaseHTTPRequestHandler):
+    """
+    Stand-in web server for LinkPreviewTests.
+    """
+    head = ('<html><head><meta charset="utf-8"><title>Fallback title</title>'
+            '<meta property="og:title" content="The &amp; Title">'
+            '<meta name="description" content="About the page">'
+            '<meta property="og:image" content="/cover.png"></head>')
+
+    def do_GET(self):
+        self.server.hits.append(self.path)
+        if self.path == '/moved':
+            self.send_response(302)
+            self.send_header('Location', '/page')
+            self.end_headers()
+            return
+        if self.path == '/slow':
+            time.sleep(1)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.end_headers()
+        try:
+            if self.path == '/host':
+                self.wfile.write(f'<title>{self.headers["Host"]}</title>'.encode())
+            elif self.path == '/endless-head':
+                self.wfile.write(b'<html><head><title>Long head</title>')
+                for _ in range(1000):
+                    self.wfile.write(b'<meta name="x" content="' + b'y' * 1000 + b'">')
+            else:
+                self.wfile.write(self.head.encode())
+                self.wfile.write(b'<body>' + b'x' * 1024 * 1024 + b'</body></html>')
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+@override_settings(LINKBOX_PREVIEW_ALLOW_PRIVATE=True, LINKBOX_PREVIEW_TIMEOUT=0.5, LINKBOX_PREVIEW_MAX_BYTES=16 * 1024)
+class LinkPreviewTests(TestCase):
+    """
+    Tests for the server side link previews, against a local HTTP server.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), _PreviewHandler)
+        cls.server.hits = []
+        cls.base = f'http://127.0.0.1:{cls.server.server_port}'
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.server.hits.clear()
+        self.user = User.objects.create_user('alice', password='pw')
+        self.client.login(username='alice', password='pw')
+
+    def preview(self, path):
+        entry, _ = UrlEntry.objects.get_or_create(user=self.user, url=self.base + path)
+        return self.client.get(reverse('urlsaver:link_preview', args=[entry.pk]))
+
+    def test_reads_the_head_and_caches_the_result(self):
+        data = self.preview('/page').json()
+        self.assertEqual(data['title'], 'The & Title')
+        self.assertEqual(data['description'], 'About the page')
+        self.assertEqual(data['image'], self.base + '/cover.png')
+        self.assertFalse(data['cached'])
+
+        again = self.preview('/page').json()
+        self.assertTrue(again['cached'])
+        self.assertEqual(self.server.hits, ['/page'])
+
+        LinkPreview.objects.update(fetched_at=timezone.now() - timedelta(days=30))
+        self.assertFalse(self.preview('/page').json()['cached'])
+        self.assertEqual(len(self.server.hits), 2)
+
+    def test_follows_redirects_and_stops_at_the_byte_limit(self):
+        self.assertEqual(self.preview('/moved').json()['title'], 'The & Title')
+        self.assertEqual(self.server.hits, ['/moved', '/page'])
+        self.assertEqual(self.preview('/endless-head').json()['title'], 'Long head')
+
+    def test_failures_are_reported_and_remembered(self):
+        response = self.preview('/slow')
+        self.assertEqual(response.status_code, 502)
+        self.assertEqual(response.json()['message'], 'Timed out.')
+        self.assertEqual(self.preview('/slow').status_code, 502)
+        self.assertEqual(self.server.hits, ['/slow'])
+
+    def test_private_addresses_are_refused_by_default(self):
+        with self.settings(LINKBOX_PREVIEW_ALLOW_PRIVATE=False):
+            response = self.preview('/page')
+        self.assertEqual(response.status_code, 502)
+        self.assertEqual(self.server.hits, [])
+
+    def test_the_checked_address_is_the_one_fetched(self):
+        # A host that resolves to the test server once, and nowhere after.
+        resolve, lookups = socket.getaddrinfo, []
+
+        def rebinding(host, *args, **kwargs):
+            if host != 'rebind.example':
+                return resolve(host, *args, **kwargs)
+            lookups.append(host)
+            if len(lookups) > 1:
+                raise socket.gaierror('rebound')
+            return resolve('127.0.0.1', *args, **kwargs)
+
+        host = f'rebind.example:{self.server.server_port}'
+        entry = UrlEntry.objects.create(user=self.user, url=f'http://{host}/host')
+        with mock.patch('socket.getaddrinfo', rebinding):
+            data = self.client.get(reverse('urlsaver:link_preview', args=[entry.pk])).json()
+        self.assertEqual(data['title'], host)
+        self.assertEqual(lookups, ['rebind.example'])
+
+        request = requests.Request('GET', 'https://192.0.2.1/', headers={'Host': 'example.com'}).prepare()
+        _, pool_kwargs = PinnedAdapter().build_connection_pool_key_attributes(request, True)
+        self.assertEqual(pool_kwargs['server_hostname'], 'example.com')
+
+    def test_only_the_owner_can_preview(self):
+        entry = UrlEntry.objects.create(user=User.objects.create_user('bob'), url=self.base + '/page')
+        response = self.client.get(reverse('urlsaver:link_preview', args=[entry.pk]))
+        self.assertEqual(response.status_code, 404)
+
+
+class _LinkHandler(BaseHTTPRequestHandler):
+    """
+    Stand-in web server for LinkCheckTests: /ok/... answers 200, /gone/...
+    404, /no-head/... 405 to HEAD but 200 to GET, /moved/<path> redirects to
+    /<path> and /away/... to an FTP server.
+    """
+
+    def respond(self):
+        server = self.server
+        with server.lock:
+            server.requests.append((self.command, self.path))
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+        try:
+            time.sleep(0.05)
+            if self.path.startswith(('/moved/', '/away/')):
+                self.send_response(302)
+                self.send_header('Location', self.path[len('/moved'):] if self.path.startswith('/moved/')
+                                 else 'ftp://files.example/')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            if self.path.startswith('/gone/'):
+                code = 404
+            elif self.path.startswith('/no-head/') and self.command == 'HEAD':
+                code = 405
+            else:
+                code = 200
+            self.send_response(code)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    do_GET = do_HEAD = respond
+
+    def log_message(self, *args):
+        pass
+
+
+@override_settings(LINKBOX_PREVIEW_ALLOW_PRIVATE=True)
+class LinkCheckTests(TestCase):
+    """
+    Tests for `manage.py check_links`, against a local HTTP server.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), _LinkHandler)
+        cls.server.lock = threading.Lock()
+        cls.base = f'http://127.0.0.1:{cls.server.server_port}'
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        caches[fragment_cache()].clear()
+        self.server.requests, self.server.active, self.server.max_active = [], 0, 0
+        self.user = User.objects.create_user('alice', password='pw')
+        self.checkpoint = os.path.join(tempfile.mkdtemp(), 'checkpoint.json')
+        self.addCleanup(shutil.rmtree, os.path.dirname(self.checkpoint))
+
+    def add(self, path, **kwargs):
+        return UrlEntry.objects.create(user=self.user, name=path, url=self.base + path, **kwargs)
+
+    def check_links(self, *args):
+        out = io.StringIO()
+        call_command('check_links', '--checkpoint', self.checkpoint, *args, stdout=out)
+        return out.getvalue()
+
+    def test_statuses_with_get_fallback(self):
+        ok, gone, no_head = self.add('/ok/1'), self.add('/gone/1'), self.add('/no-head/1')
+        self.add('/ok/trashed', is_deleted=True)
+        self.assertIn('Checked 3 link(s): 1 broken, 0 unreachable.', self.check_links())
+        checks = {check.entry_id: (check.status, check.status_code) for check in LinkCheck.objects.all()}
+        self.assertEqual(checks, {ok.pk: ('ok', 200), gone.pk: ('broken', 404), no_head.pk: ('ok', 200)})
+        self.assertEqual(sorted(self.server.requests), [
+            ('GET', '/gone/1'), ('GET', '/no-head/1'), ('HEAD', '/gone/1'), ('HEAD', '/no-head/1'), ('HEAD', '/ok/1'),
+        ])
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_unreachable_and_private_hosts(self):
+        closed = socket.socket()
+        closed.bind(('127.0.0.1', 0))
+        port = closed.getsockname()[1]
+        closed.close()
+        entry = UrlEntry.objects.create(user=self.user, url=f'http://127.0.0.1:{port}/')
+        self.check_links()
+        self.assertEqual(LinkCheck.objects.get(entry=entry).status, LinkCheck.UNREACHABLE)
+
+        with self.settings(LINKBOX_PREVIEW_ALLOW_PRIVATE=False):
+            self.add('/ok/private')
+            self.check_links('--restart')
+        self.assertEqual(LinkCheck.objects.filter(status=LinkCheck.UNREACHABLE).count(), 2)
+        self.assertEqual(self.server.requests, [])
+
+    def test_redirects_are_checked_hop_by_hop(self):
+        moved, away = self.add('/moved/gone/1'), self.add('/away/1')
+        loop = self.add('/moved' * (MAX_REDIRECTS + 1) + '/ok/1')
+        self.check_links()
+        checks = {check.entry_id: (check.status, check.status_code, check.error) for check in LinkCheck.objects.all()}
+        self.assertEqual(checks[moved.pk], ('broken', 404, ''))
+        self.assertEqual(checks[away.pk], ('unreachable', None, 'Only http(s) pages can be previewed.'))
+        self.assertEqual(checks[loop.pk], ('unreachable', None, 'Too many redirects.'))
+        self.assertIn(('HEAD', '/gone/1'), self.server.requests)
+
+    def test_per_host_limit(self):
+        with LinkChecker(workers=8, per_host=2, timeout=5) as checker:
+            results = checker.check(f'{self.base}/ok/{i}' for i in range(8))
+        self.assertEqual(len(results), 8)
+        self.assertEqual(self.server.max_active, 2)
+
+    def test_resumes_from_the_checkpoint(self):
+        first, second, third = self.add('/ok/1'), self.add('/ok/2'), self.add('/gone/3')
+        with open(self.checkpoint, 'w') as f:
+            f.write(f'{{"after": {first.pk}, "user": null}}')
+        output = self.check_links('--batch-size', '1')
+        self.assertIn(f'Resuming after entry #{first.pk}.', output)
+        self.assertIn(f'Checked up to entry #{second.pk}: 1 ok, 0 broken, 0 unreachable', output)
+        self.assertEqual(set(LinkCheck.objects.values_list('entry', flat=True)), {second.pk, third.pk})
+
+    def test_a_new_url_forgets_the_old_check(self):
+        first, second, kept = self.add('/gone/1'), self.add('/gone/2'), self.add('/gone/3')
+        for entry in (first, second, kept):
+            LinkCheck.objects.create(entry=entry, status=LinkCheck.BROKEN, status_code=404)
+            LinkPreview.objects.create(url_hash=preview_key(entry.url), url=entry.url, error='Not found.')
+        self.client.login(username='alice', password='pw')
+        self.client.post(reverse('urlsaver:edit_url_view', args=[first.pk]), {'url': self.base + '/ok/1'})
+        api = APIClient()
+        api.force_authenticate(self.user)
+        api.post(reverse('urlentry-bulk-update'), [{'id': second.pk, 'url': self.base + '/ok/2'},
+                                                   {'id': kept.pk, 'name': 'Renamed'}], format='json')
+        self.assertEqual(list(LinkCheck.objects.values_list('entry', flat=True)), [kept.pk])
+        self.assertEqual(list(LinkPreview.objects.values_list('url', flat=True)), [kept.url])
+
+    def test_index_filters_on_link_status(self):
+        ok, gone = self.add('/ok/1'), self.add('/gone/1')
+        unchecked = self.add('/ok/2')
+        LinkCheck.objects.create(entry=ok, status=LinkCheck.OK, status_code=200)
+        LinkCheck.objects.create(entry=gone, status=LinkCheck.BROKEN, status_code=404)
+        self.client.login(username='alice', password='pw')
+        for status, expected in [('broken', [gone]), ('unchecked', [unchecked]), ('', [unchecked, gone, ok])]:
+            response = self.client.get(reverse('urlsaver:index'), {'link': status})
+            self.assertEqual(list(response.context['page_obj']), expected)
+
+
+class DuplicateUrlTests(TestCase):
+    """
+    Tests for the canonical URL hash and the duplicate checks built on it.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='pw')
+        self.client.login(username='alice', password='pw')
+        self.entry = UrlEntry.objects.create(user=self.user, name='X', url='https://x.com/')
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+
+    def test_canonical_form(self):
+        for url in ['http://x.com', 'https://X.com:443/', 'https://x.com/?utm_source=feed&fbclid=1']:
+            self.assertEqual(canonicalize_url(url), 'https://x.com')
+        self.assertEqual(canonicalize_url('https://x.com/a/?b=2&a=1#top'), 'https://x.com/a?a=1&b=2#top')
+        self.assertEqual(UrlEntry.objects.with_url('http://x.com').get(), self.entry)
+
+    def test_add_rejects_duplicates_and_restores_trashed_ones(self):
+        response = self.client.post(reverse('urlsaver:add_url'), {'url': 'http://x.com/?utm_medium=mail'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('already saved', response.json()['errors']['url'][0])
+
+        self.client.post(reverse('urlsaver:delete_selected'), {'selected_urls': [self.entry.pk]})
+        response = self.client.post(reverse('urlsaver:add_url'), {'url': 'x.com', 'name': 'Back'})
+        self.assertEqual(response.json()['message'], 'URL restored from trash.')
+        self.entry.refresh_from_db()
+        self.assertEqual((self.entry.is_deleted, self.entry.name), (False, 'Back'))
+        self.assertEqual(UrlEntry.objects.count(), 1)
+        stats = get_stats(self.user)
+        self.assertEqual((stats.active_count, stats.trashed_count), (1, 0))
+
+    def test_edit_and_api_reject_duplicates(self):
+        other = UrlEntry.objects.create(user=self.user, name='Y', url='https://y.com/')
+        response = self.client.post(reverse('urlsaver:edit_url_view', args=[other.pk]), {'url': 'http://x.com'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.post(reverse('urlsaver:edit_url_view', args=[other.pk]),
+                                          {'url': 'https://y.com', 'name': 'Y'}).status_code, 200)
+
+        response = self.api.post(reverse('urlentry-list'), {'url': 'http://x.com', 'name': 'X'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(f'entry {self.entry.pk}', response.json()['url'][0])
+        response = self.api.patch(reverse('urlentry-detail', args=[other.pk]), {'url': 'https://x.com'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        results = self.api.post(reverse('urlentry-bulk-update'), [
+            {'id': other.pk, 'url': 'https://x.com/?gclid=1'},
+            {'id': self.entry.pk, 'url': 'https://z.com/'},
+        ], format='json').json()['results']
+        self.assertEqual([r['status'] for r in results], ['error', 'updated'])
+
+        results = self.api.post(reverse('urlentry-bulk-create'), [
+            {'url': 'https://y.com/'}, {'url': 'w.com'}, {'url': 'http://W.com/'},
+        ], format='json').json()['results']
+        new = UrlEntry.objects.get(url='https://w.com')
+        self.assertEqual([(r['status'], r['id']) for r in results],
+                         [('duplicate', other.pk), ('created', new.pk), ('duplicate', new.pk)])
+
+    def test_duplicates_saved_after_validation_are_a_400(self):
+        # A concurrent request saved the URL between validation and save
+        other = UrlEntry.objects.create(user=self.user, name='Y', url='https://y.com/')
+        with mock.patch.object(UrlForm, 'clean_url', lambda form: form.cleaned_data['url']), \
+                mock.patch.object(URLSerializer, 'validate_url', lambda serializer, value: value):
+            response = self.client.post(reverse('urlsaver:edit_url_view', args=[other.pk]), {'url': 'https://x.com/'})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('already saved', response.json()['errors']['url'][0])
+            response = self.api.post(reverse('urlentry-list'), {'url': 'https://x.com/'}, format='json')
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('already saved', response.json()['url'][0])
+            response = self.api.patch(reverse('urlentry-detail', args=[other.pk]), {'url': 'http://x.com'},
+                                      format='json')
+            self.assertEqual(response.status_code, 400)
+        other.refresh_from_db()
+        self.assertEqual(other.url, 'https://y.com/')
+        self.assertEqual(get_stats(self.user).active_count, 2)
+
+    def test_import_compares_canonical_urls(self):
+        upload = SimpleUploadedFile('urls.csv', b'url\nhttp://x.com\nhttps://x.com/?utm_source=a\nhttps://n.com\n')
+        result = self.client.post(reverse('urlsaver:import_csv'), {'csv_file': upload}).json()
+        self.assertEqual((result['added'], result['skipped']), (1, 2))
+
+
+class PurgeTrashTests(TestCase):
+    """
+    Tests for the trash retention predicate and `manage.py purge_trash`.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='pw')
+        self.client.login(username='alice', password='pw')
+        self.active = UrlEntry.objects.create(user=self.user, url='https://active.com/')
+        self.recent = UrlEntry.objects.create(user=self.user, url='https://recent.com/', is_deleted=True)
+        self.expired = [UrlEntry.objects.create(user=self.user, url=f'https://old{i}.com/', is_deleted=True)
+                        for i in range(5)]
+        UrlEntry.objects.filter(pk__in=[e.pk for e in self.expired]).update(
+            deleted_at=timezone.now() - timedelta(days=31), updated_at=timezone.now())
+        get_stats(self.user)
+
+    def purge(self, *args):
+        out = io.StringIO()
+        call_command('purge_trash', '--sleep', '0', *args, stdout=out)
+        return out.getvalue()
+
+    def test_is_expired_matches_the_predicate(self):
+        expired = set(UrlEntry.objects.expired())
+        for entry in UrlEntry.objects.all():
+            self.assertEqual(entry.is_expired(), entry in expired)
+        self.assertEqual(list(UrlEntry.objects.trashed()), [self.recent])
+        with override_settings(LINKBOX_TRASH_DAYS=60):
+            self.assertFalse(UrlEntry.objects.expired().exists())
+
+    def test_trash_view_hides_expired_entries(self):
+        rows = self.client.get(reverse('urlsaver:trash_data')).json()['rows_html']
+        self.assertIn('recent.com', rows)
+        self.assertNotIn('old0.com', rows)
+
+    def test_dry_run_deletes_nothing(self):
+        output = self.purge('--dry-run')
+        self.assertIn('Would purge 5 expired entries.', output)
+        self.assertEqual(UrlEntry.objects.count(), 7)
+
+    def test_purges_in_batches(self):
+        with CaptureQueriesContext(connection) as queries:
+            output = self.purge('--batch-size', '2')
+        self.assertIn('Purged 2/5', output)
+        self.assertIn('Purged 5 expired entries.', output)
+        self.assertEqual(set(UrlEntry.objects.all()), {self.active, self.recent})
+        deletes = [q for q in queries if q['sql'].startswith('DELETE FROM "urlsaver_urlentry"')]
+        self.assertEqual(len(deletes), 3)
+        stats = get_stats(self.user)
+        self.assertEqual((stats.active_count, stats.trashed_count), (1, 1))
+
+
+class CategoryFacetTests(TestCase):
+    """
+    Tests for the stored effective category and the category facets.
+    """
+
+    def setUp(self):
+        cache.clear()
+        caches[fragment_cache()].clear()
+        self.user = User.objects.create_user('alice', password='pw')
+        self.client.login(username='alice', password='pw')
+        UrlEntry.objects.create(user=self.user, url='https://a.com/', category='website', sub_category='docs')
+        UrlEntry.objects.create(user=self.user, url='https://b.com/', category='website', sub_category='docs')
+        UrlEntry.objects.create(user=self.user, url='https://c.com/', category='website')
+        self.custom = UrlEntry.objects.create(user=self.user, url='https://d.com/', category='others',
+                                              custom_category='Recipes')
+        UrlEntry.objects.create(user=self.user, url='https://e.com/', category='website', is_deleted=True)
+
+    def test_effective_category_is_stored_on_every_write_path(self):
+        self.assertEqual(self.custom.effective_category, 'Recipes')
+        self.custom.category = 'video'
+        self.custom.save(update_fields=['category'])
+        self.assertEqual(UrlEntry.objects.get(pk=self.custom.pk).effective_category, 'video')
+
+        bulk = UrlEntry.objects.bulk_create([UrlEntry(user=self.user, url='https://f.com/', category='others',
+                                                      custom_category='Maps')])
+        self.assertEqual(UrlEntry.objects.get(pk=bulk[0].pk).effective_category, 'Maps')
+        api = APIClient()
+        api.force_authenticate(self.user)
+        api.post(reverse('urlentry-bulk-update'), [{'id': bulk[0].pk, 'custom_category': 'Atlas'}], format='json')
+        self.assertEqual(UrlEntry.objects.get(pk=bulk[0].pk).effective_category, 'Atlas')
+
+    def test_facet_counts(self):
+        self.assertEqual(compute_facets(self.user), [
+            {'name': 'website', 'count': 3, 'sub_categories': [{'name': 'docs', 'count': 2}]},
+            {'name': 'Recipes', 'count': 1, 'sub_categories': []},
+        ])
+        response = self.client.get(reverse('urlsaver:index'), {'category': 'Recipes'})
+        self.assertEqual(list(response.context['page_obj']), [self.custom])
+
+    def test_category_filters_ignore_case(self):
+        tech = UrlEntry.objects.create(user=self.user, url='https://t.com/', category='others',
+                                       custom_category='Tech News')
+        response = self.client.get(reverse('urlsaver:index'), {'category': 'recipe'})
+        self.assertEqual(list(response.context['page_obj']), [self.custom])
+        response = self.client.get(reverse('urlsaver:index'), {'category': 'news'})
+        self.assertEqual(list(response.context['page_obj']), [tech])
+        response = self.client.get(reverse('urlsaver:index'), {'category': 'OTHERS'})
+        self.assertEqual(set(response.context['page_obj']), {self.custom, tech})
+
+        api = APIClient()
+        api.force_authenticate(self.user)
+        urls = lambda category: {entry['url'] for entry in api.get(
+            reverse('urlentry-list'), {'category': category}).json()['results']}
+        self.assertEqual(urls('others'), {'https://d.com/', 'https://t.com/'})
+        self.assertEqual(urls('Recipes'), {'https://d.com/'})
+
+    def test_facets_are_cached_until_the_collection_changes(self):
+        url = reverse('urlsaver:facets_data')
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            category_facets(self.user)
+        self.assertEqual(len(queries), 1)  # the collection version
+
+        self.client.post(reverse('urlsaver:add_url'), {'url': 'https://g.com/', 'category': 'website'})
+        with CaptureQueriesContext(connection) as queries:
+            data = self.client.get(url).json()
+        self.assertEqual(data['categories'][0]['count'], 4)
+        self.assertEqual(len([q for q in queries if 'GROUP BY' in q['sql']]), 1)
+
+
+class GenerateBookmarksTests(TestCase):
+    """
+    Tests for the synthetic data of `manage.py generate_bookmarks`.
+    """
+
+    def test_generates_consistent_collections(self):
+        call_command('generate_bookmarks', users=2, bookmarks=120, seed=7, batch_size=50, stdout=io.StringIO())
+        users = list(User.objects.filter(username__in=['bench1', 'bench2']).order_by('username'))
+        self.assertEqual(len(users), 2)
+        for user in users:
+            entries = UrlEntry.objects.filter(user=user)
+            self.assertEqual(entries.count(), 120)
+            stats = get_stats(user)
+            self.assertEqual(stats.active_count, entries.active().count())
+            self.assertEqual(stats.trashed_count, entries.filter(is_deleted=True).count())
+        entry = UrlEntry.objects.exclude(tags='').first()
+        self.assertEqual(sorted(entry.tag_set.values_list('name', flat=True)), sorted(parse_tags(entry.tags)))
+        self.assertTrue(UrlEntry.objects.filter(category='others').exclude(effective_category='others').exists())
+        # Dates are spread out rather than all "now"
+        self.assertLess(UrlEntry.objects.order_by('created_at').first().created_at, timezone.now() - timedelta(days=30))
+
+        # Running it again adds to the same users, without duplicate URLs
+        call_command('generate_bookmarks', users=1, bookmarks=30, seed=7, stdout=io.StringIO())
+        self.assertEqual(UrlEntry.objects.filter(user=users[0]).count(), 150)
+
+    def test_seed_makes_it_reproducible(self):
+        first = BookmarkGenerator(seed=3)
+        second = BookmarkGenerator(seed=3)
+        user = User(pk=1)
+        self.assertEqual([first.entry(user, i).url for i in range(20)], [second.entry(user, i).url for i in range(20)])
+
+
+class QueryCountTests(TestCase):
+    """
+    Pins the number of SQL queries of every URL in urlsaver.urls and of the
+    /api/ endpoints.
+
+    Every request is made for a small and for a large collection, with a
+    payload (ids, CSV rows, bulk items) as large as the collection, and
+    must make the same number of queries for both, at most its bound
+    below. A view whose queries grow with the rows fails, and so does one
+    that gets more expensive; lower a bound when a view gets cheaper.
+    """
+    SMALL, LARGE = 3, 30
+
+    # (URL name, maximum number of queries, request); the request gets the
+    # client and the collection.
+    CASES = [
+        ('urlsaver:landing_page', 0, lambda client, c: Client().get(reverse('urlsaver:landing_page'))),
+        ('urlsaver:signup', 0, lambda client, c: Client().get(reverse('urlsaver:signup'))),
+        ('urlsaver:login', 9, lambda client, c: Client().post(reverse('urlsaver:login'),
+                                                               {'username': c.user.username, 'password': 'pw'})),
+        ('urlsaver:logout', 4, lambda client, c: client.post(reverse('urlsaver:logout'))),
+        ('urlsaver:index', 6, lambda client, c: client.get(reverse('urlsaver:index'), {'show_n_records': 100})),
+        ('urlsaver:index', 6, lambda client, c: client.get(reverse('urlsaver:index'), {
+            'search': 'entry', 'tag': 'python', 'category': 'Recipes', 'link': 'ok', 'show_n_records': 100})),
+        ('urlsaver:index_data', 6, lambda client, c: client.get(reverse('urlsaver:index_data'),
+                                                                 {'show_n_records': 100})),
+        ('urlsaver:visit_url', 3, lambda client, c: client.get(reverse('urlsaver:visit_url', args=[c.active[0].pk]))),
+        ('urlsaver:add_url', 14, lambda client, c: client.post(reverse('urlsaver:add_url'), {
+            'url': 'https://added.example/', 'category': 'website', 'tags': 'python, new'})),
+        ('urlsaver:delete_url', 7, lambda client, c: client.post(reverse('urlsaver:delete_url', args=[c.active[0].pk]))),
+        ('urlsaver:show_trash', 2, lambda client, c: client.get(reverse('urlsaver:show_trash'))),
+        ('urlsaver:trash_data', 5, lambda client, c: client.get(reverse('urlsaver:trash_data'))),
+        ('urlsaver:trash_delete', 14, lambda client, c: client.post(
+            reverse('urlsaver:trash_delete'), json.dumps({'ids': c.trashed_ids}), content_type='application/json')),
+        ('urlsaver:trash_recover', 8, lambda client, c: client.post(
+            reverse('urlsaver:trash_recover'), json.dumps({'ids': c.trashed_ids}), content_type='application/json')),
+        ('urlsaver:get_url_details', 4, lambda client, c: client.get(
+            reverse('urlsaver:get_url_details', args=[c.active[0].pk]))),
+        ('urlsaver:link_preview', 4, lambda client, c: client.get(
+            reverse('urlsaver:link_preview', args=[c.active[0].pk]))),
+        ('urlsaver:edit_url_view', 16, lambda client, c: client.post(
+            reverse('urlsaver:edit_url_view', args=[c.active[0].pk]),
+            {'url': c.active[0].url, 'name': 'Renamed', 'tags': 'python, renamed'})),
+        ('urlsaver:delete_selected', 8, lambda client, c: client.post(
+            reverse('urlsaver:delete_selected'), {'selected_urls': c.active_ids})),
+        ('urlsaver:activity_data', 4, lambda client, c: client.get(reverse('urlsaver:activity_data'))),
+        ('urlsaver:facets_data', 5, lambda client, c: client.get(reverse('urlsaver:facets_data'))),
+        ('urlsaver:profiling_stats', 2, lambda client, c: client.get(reverse('urlsaver:profiling_stats'))),
+        ('urlsaver:export_selected_csv', 3, lambda client, c: client.post(
+            reverse('urlsaver:export_selected_csv'), {'selected_urls[]': c.active_ids})),
+        ('urlsaver:export_selected_pdf', 4, lambda client, c: client.post(
+            reverse('urlsaver:export_selected_pdf'), {'selected_urls[]': c.active_ids})),
+        ('urlsaver:export_all_csv', 4, lambda client, c: client.post(reverse('urlsaver:export_all_csv'))),
+        ('urlsaver:export_all_pdf', 4, lambda client, c: client.get(reverse('urlsaver:export_all_pdf'))),
+        ('urlsaver:import_csv', 14, lambda client, c: client.post(reverse('urlsaver:import_csv'), {
+            'csv_file': SimpleUploadedFile('urls.csv', c.csv, content_type='text/csv')})),
+        ('urlsaver:queue_pdf_export', 4, lambda client, c: client.post(
+            reverse('urlsaver:queue_pdf_export'), {'selected_urls[]': c.active_ids})),
+        ('urlsaver:job_status', 3, lambda client, c: client.get(reverse('urlsaver:job_status', args=[c.job.pk]))),
+        ('urlsaver:job_download', 3, lambda client, c: client.get(reverse('urlsaver:job_download', args=[c.job.pk]))),
+        ('api-root', 0, lambda api, c: api.get(reverse('api-root'))),
+        ('urlentry-list', 2, lambda api, c: api.get(reverse('urlentry-list'), {'page_size': 100})),
+        ('urlentry-list', 2, lambda api, c: api.get(reverse('urlentry-list'), {
+            'category': 'Recipes', 'tag': 'python', 'deleted': 'true', 'page_size': 100})),
+        ('urlentry-list', 12, lambda api, c: api.post(reverse('urlentry-list'), {
+            'url': 'https://api-added.example/', 'category': 'website', 'tags': 'python, api'}, format='json')),
+        ('urlentry-detail', 1, lambda api, c: api.get(reverse('urlentry-detail', args=[c.active[0].pk]))),
+        ('urlentry-detail', 13, lambda api, c: api.patch(
+            reverse('urlentry-detail', args=[c.active[0].pk]), {'tags': 'python, patched'}, format='json')),
+        ('urlentry-detail', 13, lambda api, c: api.delete(reverse('urlentry-detail', args=[c.active[0].pk]))),
+        ('urlentry-bulk-create', 12, lambda api, c: api.post(reverse('urlentry-bulk-create'), [
+            {'url': f'https://bulk{i}.example/', 'tags': 'python, bulk'} for i in range(len(c.active))], format='json')),
+        ('urlentry-bulk-update', 13, lambda api, c: api.post(reverse('urlentry-bulk-update'), [
+            {'id': pk, 'name': 'Renamed', 'tags': 'bulk'} for pk in c.active_ids], format='json')),
+        ('urlentry-bulk-delete', 7, lambda api, c: api.post(reverse('urlentry-bulk-delete'), c.active_ids,
+                                                              format='json')),
+        ('urlentry-bulk-restore', 7, lambda api, c: api.post(reverse('urlentry-bulk-restore'), c.trashed_ids,
+                                                               format='json')),
+        ('api_sync', 3, lambda api, c: api.get(reverse('api_sync'))),
+    ]
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.collections = [self.collection('small', self.SMALL), self.collection('large', self.LARGE)]
+
+    def collection(self, name, size):
+        """
+        Creates a staff user with `size` active and `size` trashed entries,
+        tags, link checks, a cached preview and a finished export job.
+        """
+        user = User.objects.create_user(name, password='pw', is_staff=True)
+        now = timezone.now()
+        entries = UrlEntry.objects.bulk_create([
+            UrlEntry(user=user, name=f'Entry {i}', url=f'https://{name}{i}.example/', category=('website', 'others')[i % 2],
+                     custom_category='Recipes' if i % 2 else '', sub_category='Docs', tags='python, web', visit_count=i,
+                     is_deleted=i >= size, deleted_at=now if i >= size else None)
+            for i in range(2 * size)
+        ])
+        sync_tags(entries)
+        LinkCheck.objects.bulk_create([
+            LinkCheck(entry=entry, status=LinkCheck.OK, status_code=200, checked_at=now) for entry in entries[1::2]
+        ])
+        reconcile(user)
+        active, trashed = entries[:size], entries[size:]
+        LinkPreview.objects.create(url_hash=preview_key(active[0].url), url=active[0].url, title='Entry', fetched_at=now)
+        job = Job.objects.create(user=user, kind=Job.EXPORT_PDF, status=Job.DONE, result={'filename': 'urls.pdf'})
+        job.result_file.save('urls.pdf', ContentFile(b'%PDF-1.4'))
+        # Half of the rows are already saved, the other half are new
+        rows = [f'Imported {i},https://{name}{i if i % 2 else 1000 + i}.example/,website,,csv' for i in range(size)]
+        return SimpleNamespace(
+            user=user, active=active, trashed=trashed, job=job,
+            active_ids=[entry.pk for entry in active], trashed_ids=[entry.pk for entry in trashed],
+            csv=('Name,URL,Category,Sub Category,Tags\n' + '\n'.join(rows)).encode(),
+        )
+
+    def count_queries(self, name, request, collection):
+        """
+        Makes the request for `collection`, rolled back afterwards, with
+        empty caches. Returns the number of queries, streamed bodies included.
+        """
+        cache.clear()
+        caches[fragment_cache()].clear()
+        if name.startswith('urlsaver:'):
+            client = Client()
+            client.force_login(collection.user)
+        else:
+            client = APIClient()
+            client.force_authenticate(collection.user)
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as queries:
+                response = request(client, collection)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+            transaction.set_rollback(True)
+        self.assertLess(response.status_code, 400)
+        return len(queries)
+
+    def test_every_url_is_covered(self):
+        names = {f'urlsaver:{pattern.name}' for pattern in urlsaver_urls.urlpatterns}
+        names |= {pattern.name for pattern in router.urls} | {'api_sync'}
+        self.assertEqual(names, {name for name, _, _ in self.CASES})
+
+    def test_query_counts_do_not_grow_with_the_rows(self):
+        for number, (name, bound, request) in enumerate(self.CASES):
+            with self.subTest(name, case=number):
+                # Once first, for the per-process lookups (e.g. whether the search index exists)
+                self.count_queries(name, request, self.collections[0])
+                small, large = (self.count_queries(name, request, collection) for collection in self.collections)
+                self.assertEqual(small, large, f'{name}: {small} queries for {self.SMALL} rows, {large} for {self.LARGE}')
+                self.assertLessEqual(large, bound)
+
+
+class MigrationTests(TransactionTestCase):
+    """
+    Tests for the data migrations, run on rows written in the schema before
+    them.
+    """
+
+    def migrate(self, target):
+        """
+        Migrates urlsaver to `target` and returns the historical apps.
+        """
+        executor = MigrationExecutor(connection)
+        executor.migrate([('urlsaver', target)])
+        return MigrationExecutor(connection).loader.project_state(('urlsaver', target)).apps
+
+    def tearDown(self):
+        call_command('migrate', 'urlsaver', verbosity=0)
+
+    def test_split_tags_fits_the_column(self):
+        apps = self.migrate('0002_urlentry_search_index')
+        user = apps.get_model('auth', 'User').objects.create(username='alice')
+        names = [f'tag{i}-' + 'x' * 40 for i in range(10)]
+        entry = apps.get_model('urlsaver', 'UrlEntry').objects.create(
+            user_id=user.pk, name='A', url='https://a.example/', tags=', '.join(names))
+
+        apps = self.migrate('0003_tags')
+        entry = apps.get_model('urlsaver', 'UrlEntry').objects.get(pk=entry.pk)
+        self.assertEqual(entry.tags, ', '.join(names[:5]))
+        linked = apps.get_model('urlsaver', 'UrlTag').objects.filter(entry_id=entry.pk).values_list('tag__name', flat=True)
+        self.assertEqual(sorted(linked), names[:5])
+
+    def test_url_hash_merge_keeps_whole_tags(self):
+        apps = self.migrate('0010_linkcheck')
+        UrlEntry, Tag, UrlTag = (apps.get_model('urlsaver', name) for name in ('UrlEntry', 'Tag', 'UrlTag'))
+        user = apps.get_model('auth', 'User').objects.create(username='alice')
+        names = [f'tag{i}-' + 'x' * 40 for i in range(8)]
+        tags = {name: Tag.objects.create(user_id=user.pk, name=name) for name in names}
+        entries = []
+        for url, entry_names in (('https://a.example/', names[:4]), ('http://A.example', names[4:])):
+            entry = UrlEntry.objects.create(user_id=user.pk, name='A', url=url, tags=', '.join(entry_names))
+            UrlTag.objects.bulk_create([UrlTag(entry_id=entry.pk, tag_id=tags[name].pk) for name in entry_names])
+            entries.append(entry)
+
+        apps = self.migrate('0011_urlentry_url_hash')
+        keeper = apps.get_model('urlsaver', 'UrlEntry').objects.get()
+        self.assertEqual(keeper.pk, entries[0].pk)
+        self.assertEqual(keeper.tags, ', '.join(names[:5]))
+        linked = apps.get_model('urlsaver', 'UrlTag').objects.filter(entry_id=keeper.pk).values_list('tag__name', flat=True)
+        self.assertEqual(sorted(linked), names[:5])
+
+    def test_trashed_rows_get_a_deletion_time(self):
+        apps = self.migrate('0017_userstats_modified_at')
+        user = apps.get_model('auth', 'User').objects.create(username='alice')
+        entry = apps.get_model('urlsaver', 'UrlEntry').objects.create(
+            user_id=user.pk, name='A', url='https://a.example/', url_hash='a', is_deleted=True)
+
+        self.migrate('0018_backfill_deleted_at')
+        self.assertEqual(list(UrlEntry.objects.trashed().values_list('pk', flat=True)), [entry.pk])
@@ -23,6 +23,7 @@ urlpatterns = [
     # --- APP URLS ---
     path('', views.landing_page_view, name='landing_page'),
     path('index/', views.index, name='index'),
+    path('index_data/', views.index_data, name='index_data'),
     path('visit/<int:pk>/', views.visit_url, name='visit_url'),
     path('add/', views.add_url, name='add_url'),
     path('delete/<int:pk>/', views.delete_url, name='delete_url'),
@@ -31,12 +32,18 @@ urlpatterns = [
     path('trash_delete/', views.trash_delete, name='trash_delete'),
     path('trash_recover/', views.trash_recover, name='trash_recover'),
     path('get_url_details/<int:url_id>/', views.get_url_details, name='get_url_details'),
+    path('preview/<int:url_id>/', views.link_preview, name='link_preview'),
     path('edit_url_view/<int:url_id>/', views.edit_url_view, name='edit_url_view'),
     path('delete-selected/', views.delete_selected, name='delete_selected'),
     path('activity-data/', views.activity_data, name='activity_data'),
+    path('facets/', views.facets_data, name='facets_data'),
+    path('profiling/', views.profiling_stats, name='profiling_stats'),
     path("export/selected/csv/", views.export_selected_csv, name="export_selected_csv"),
     path("export/selected/pdf/", views.export_selected_pdf, name="export_selected_pdf"),
     path("export/all/csv/", views.export_all_csv, name="export_all_csv"),
     path("export/all/pdf/", views.export_all_pdf, name="export_all_pdf"),
     path("import_csv/", views.import_csv, name="import_csv"),
+    path("jobs/export/pdf/", views.queue_pdf_export, name="queue_pdf_export"),
+    path("jobs/<int:job_id>/", views.job_status, name="job_status"),
+    path("jobs/<int:job_id>/download/", views.job_download, name="job_download"),
 ]
\ No newline at end of file
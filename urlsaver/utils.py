@@ -0,0 +1,109 @@
+import hashlib
+import re
+from functools import lru_cache
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from django.core.exceptions import ValidationError
+from django.core.validators import URLValidator
+import tldextract # For autonameing urls
+
+_url_validator = URLValidator()
+
+# One process-wide extractor on the public suffix list snapshot bundled with
+# tldextract: no download on first use and no disk cache to read.
+_domain_extractor = tldextract.TLDExtract(suffix_list_urls=(), cache_dir=None, fallback_to_snapshot=True)
+
+# The authority part of a URL (with or without a scheme), up to the path.
+_netloc_re = re.compile(r"^(?:[a-zA-Z][a-zA-Z0-9+.-]*:)?(?://)?([^/?#]*)")
+
+
+@lru_cache(maxsize=10000)
+def domain_of_host(netloc):
+    """
+    Returns the registrable domain name of a host without its public
+    suffix, e.g. "bbc" for "www.bbc.co.uk" (user info and port are
+    ignored). Results are memoized per host.
+    """
+    return _domain_extractor.extract_str(netloc).domain
+
+
+def auto_name_from_url(url):
+    """
+    Extracts a clean name from the given URL.
+    Uses tldextract to handle complex TLDs like .co.uk, .org.in, etc.
+    Falls back to the full URL if parsing fails.
+    """
+    try:
+        return domain_of_host(_netloc_re.match(url).group(1)) or url
+    except Exception:
+        return url
+
+
+# Query parameters that only say where a link was clicked.
+_tracking_param_re = re.compile(
+    r"^(utm_\w+|fbclid|gclid|dclid|gbraid|wbraid|msclkid|yclid|mc_cid|mc_eid|igshid|_hsenc|_hsmi|mkt_tok)$", re.I)
+
+
+def canonicalize_url(url):
+    """
+    Returns the form of a URL that duplicates are detected on: http and
+    https are treated alike, the host is lowercased and loses a default
+    port, trailing slashes are dropped from the path, and tracking
+    parameters (utm_*, fbclid, gclid, ...) are removed from the query,
+    whose remaining parameters are sorted.
+
+    The result is only used for comparisons, the URL itself is stored as
+    entered.
+    """
+    url = (url or "").strip()
+    parts = urlsplit(url if "//" in url else "//" + url)
+    scheme = parts.scheme.lower()
+    if scheme in ("", "http"):
+        scheme = "https"
+    netloc = parts.netloc.lower()
+    if parts.hostname:
+        netloc = f"[{parts.hostname}]" if ":" in parts.hostname else parts.hostname.rstrip(".")
+        try:
+            port = parts.port
+        except ValueError:
+            port = None
+        if port and port not in (80, 443):
+            netloc += f":{port}"
+        userinfo = parts.netloc.rpartition("@")[0]
+        if userinfo:
+            netloc = f"{userinfo}@{netloc}"
+    query = urlencode(sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not _tracking_param_re.match(key)
+    ))
+    return urlunsplit((scheme, netloc, parts.path.rstrip("/"), query, parts.fragment))
+
+
+def canonical_url_hash(url):
+    """
+    Returns the sha256 hex digest of canonicalize_url(url), stored as
+    UrlEntry.url_hash.
+    """
+    return hashlib.sha256(canonicalize_url(url).encode()).hexdigest()
+
+
+def normalize_url(raw_url):
+    """
+    Cleans up a URL typed or imported by a user.
+
+    Adds a missing "https://" scheme and validates the result. Returns the
+    cleaned URL, or None if it is empty or not a valid URL.
+    """
+    raw_url = (raw_url or "").strip()
+    if not raw_url:
+        return None
+
+    # Auto-fix scheme if missing
+    if not raw_url.startswith(("http://", "https://")):
+        raw_url = "https://" + raw_url
+
+    try:
+        _url_validator(raw_url)
+    except ValidationError:
+        return None
+    return raw_url
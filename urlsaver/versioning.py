@@ -0,0 +1,148 @@
+"""
+Conditional GET for the views that render a user's collection.
+
+Everything those views return is derived from the user's entries, so a
+response can be identified by the user's collection version
+(UserStats.version, bumped by urlsaver.stats on every write) instead of
+by hashing the rendered body. A client that sends If-None-Match with the
+current ETag gets a 304 after a single primary key lookup, without any of
+the view's queries or template rendering.
+
+Responses also carry Last-Modified, the time of the last version bump
+(UserStats.modified_at), for clients that only send If-Modified-Since.
+HTTP dates have a one second resolution, so the header is left out while
+the collection changed less than a second ago: a write later in the same
+second would otherwise be hidden behind a 304. When both validators are
+sent, If-None-Match wins (Django ignores If-Modified-Since then).
+
+Usage, with login_required running first:
+
+    @login_required
+    @conditional
+    def view(request): ...
+
+The same version keys the template fragments cached by the index page (the
+URL table rows and the pagination, see fragment_key): a write bumps the
+version, so the next render misses the old fragments, which are left to
+expire from LINKBOX_FRAGMENT_CACHE.
+"""
+import hashlib
+from datetime import timedelta
+from functools import partial, wraps
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.utils.cache import patch_cache_control
+from django.utils.timezone import now
+from django.views.decorators.http import condition
+
+from .stats import get_stats
+
+
+def collection_version(user):
+    """
+    Returns the user's current collection version.
+    """
+    return get_stats(user).version
+
+
+def fragment_cache():
+    """
+    Returns the alias of the cache rendered fragments are kept in
+    (LINKBOX_FRAGMENT_CACHE).
+    """
+    return getattr(settings, 'LINKBOX_FRAGMENT_CACHE', 'default')
+
+
+def fragment_cache_timeout():
+    """
+    Returns the number of seconds rendered fragments are kept for.
+    """
+    return getattr(settings, 'LINKBOX_FRAGMENT_CACHE_TIMEOUT', 600)
+
+
+def fragment_key(user, *parts):
+    """
+    Returns the vary_on key of a cached template fragment of the user's
+    collection: the user, their collection version and `parts`, the request
+    details the fragment depends on (filters, page, ...).
+    """
+    return ':'.join(map(str, [user.pk, collection_version(user), *parts]))
+
+
+def _request_stats(request):
+    """
+    Returns the UserStats row of the request's user, looked up once per
+    request, or None when no validator should be sent: for anonymous users
+    and while flash messages are waiting to be shown.
+    """
+    if not hasattr(request, '_collection_stats'):
+        user = request.user
+        if not user.is_authenticated or len(get_messages(request)):
+            request._collection_stats = None
+        else:
+            request._collection_stats = get_stats(user)
+    return request._collection_stats
+
+
+def collection_etag(request, visits=False):
+    """
+    ETag of the request's response: a hash of the user, their collection
+    version and the request details the body depends on besides the URL (the
+    negotiated format and the CSRF token baked into HTML pages). Flushed
+    visits don't bump the version, so with `visits` the user's visit total
+    is part of the hash too. Returns None, meaning "no ETag", when
+    _request_stats does.
+    """
+    stats = _request_stats(request)
+    if stats is None:
+        return None
+    parts = [
+        stats.user_id,
+        stats.version,
+        request.META.get('HTTP_ACCEPT', ''),
+        request.META.get('CSRF_COOKIE', ''),
+    ]
+    if visits:
+        parts.append(stats.visit_count)
+    return hashlib.md5(':'.join(map(str, parts)).encode()).hexdigest()
+
+
+def collection_last_modified(request, *args, **kwargs):
+    """
+    Last-modified function for django.views.decorators.http.condition: the
+    time of the user's last collection or counter change, or None while it
+    is less than a second old (see the module docstring) or when
+    _request_stats returns None.
+    """
+    stats = _request_stats(request)
+    if stats is None or now() - stats.modified_at < timedelta(seconds=1):
+        return None
+    return stats.modified_at
+
+
+def conditional(view=None, *, visits=False):
+    """
+    Makes `view` answer If-None-Match and If-Modified-Since with a 304 while
+    the user's collection is unchanged. Responses are marked private and
+    must be revalidated, so browsers (and fetch()) keep them but always ask
+    before reusing them.
+
+    Views whose responses show visit counts are decorated with
+    @conditional(visits=True), see collection_etag.
+    """
+    if view is None:
+        return partial(conditional, visits=visits)
+
+    def etag_func(request, *args, **kwargs):
+        return collection_etag(request, visits)
+
+    conditional_view = condition(etag_func=etag_func, last_modified_func=collection_last_modified)(view)
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = conditional_view(request, *args, **kwargs)
+        if response.has_header('ETag'):
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
+    return wrapper
@@ -3,15 +3,19 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth import login, logout
 from django.contrib import messages
 from django.utils.timezone import now
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, FileResponse, Http404
+from django.urls import reverse
+from django.conf import settings
 from django.template.loader import render_to_string
 from django.views.decorators.http import require_POST
 from django.db.models import Q
+from django.db import IntegrityError, transaction
 from django.views.decorators.csrf import csrf_exempt
 from .forms import UrlForm
 from .forms import SignUpForm, LoginForm
-from .models import UrlEntry
+from .models import UrlEntry, Job, LinkCheck
 import json
+import os
 from django.core.paginator import Paginator
 import csv
 from reportlab.lib.pagesizes import letter
@@ -26,26 +30,211 @@ from .forms import CustomAuthenticationForm
 import io
 from django.core.validators import URLValidator
 from django.core.exceptions import ValidationError
-from rest_framework import viewsets
+from rest_framework import serializers, viewsets
+from rest_framework.exceptions import ParseError
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.response import Response
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from datetime import datetime, time
 from .serializers import URLSerializer
 from .models import UrlEntry
-import tldextract # For autonameing urls
+from .search import apply_search
+from .pagination import paginate, UrlCursorPagination
+from .visits import record_visit
+from .exports import csv_response, pdf_response
+from .utils import auto_name_from_url
+from .importer import CsvImporter
+from .jobs import async_export_threshold, enqueue
+from .stats import adjust, get_stats, hard_delete
+from .sync import changes_since, next_change_seq, CursorExpired
+from .bulk import DUPLICATE, bulk_create_entries, bulk_update_entries, bulk_limit, set_trashed
+from .versioning import conditional, fragment_cache, fragment_cache_timeout, fragment_key
+from .previews import PreviewBusy, get_preview
+from .facets import category_facets
+from .profiling import profiling_enabled, records, summary
+from django.utils.decorators import method_decorator
+from django.utils.functional import SimpleLazyObject
+
+class URLViewSet(viewsets.ModelViewSet):
+    """
+    REST API for the requesting user's URL entries, newest first, paged with
+    cursors (`cursor`, `page_size`).
+
+    The list accepts the following query parameters:
+
+    * `category`: Only entries with this category or custom category.
+    * `tag`: Only entries with this tag.
+    * `deleted`: `false` (default) for active entries, `true` for the trash, `all` for both.
+    * `created_after`: Only entries created after this ISO date or datetime.
+    * `fields`: Comma separated list of the fields to return, e.g. `id,url,name`.
 
-def auto_name_from_url(url):
+    Many entries can be written in one request with the bulk-create, bulk-update, bulk-delete
+    (to the trash) and bulk-restore actions, see urlsaver.bulk.
     """
-    Extracts a clean name from the given URL.
-    Uses tldextract to handle complex TLDs like .co.uk, .org.in, etc.
-    Falls back to the full URL if parsing fails.
+    queryset = UrlEntry.objects.all()
+    serializer_class = URLSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = UrlCursorPagination
+
+    @method_decorator(conditional(visits=True))
+    def list(self, request, *args, **kwargs):
+        # 304 Not Modified while the user's collection version is unchanged
+        return super().list(request, *args, **kwargs)
+
+    def get_queryset(self):
+        queryset = UrlEntry.objects.filter(user=self.request.user)
+        if self.action != 'list':
+            return queryset
+
+        params = self.request.query_params
+        deleted = params.get('deleted', 'false').lower()
+        if deleted not in ('true', 'false', 'all'):
+            raise ParseError("deleted must be one of true, false or all.")
+        if deleted != 'all':
+            queryset = queryset.filter(is_deleted=deleted == 'true')
+
+        category = params.get('category', '').strip()
+        if category:
+            # The raw category too, so that `others` still finds the entries filed under it
+            queryset = queryset.filter(Q(effective_category=category) | Q(category=category))
+        tag = params.get('tag', '').strip()
+        if tag:
+            queryset = queryset.filter(tag_set__user=self.request.user, tag_set__name=tag.lower())
+
+        created_after = params.get('created_after', '').strip()
+        if created_after:
+            queryset = queryset.filter(created_at__gt=parse_api_datetime(created_after, 'created_after'))
+
+        # Sparse fieldsets: only load the requested columns (plus the cursor's)
+        requested = URLSerializer.requested_fields(self.request)
+        if requested:
+            columns = {field.name for field in UrlEntry._meta.concrete_fields} & requested
+            queryset = queryset.only('id', 'created_at', *columns)
+        return queryset
+
+    def save_entry(self, serializer, **kwargs):
+        """
+        Saves the serializer's entry. A URL saved by a concurrent request since the serializer
+        validated it is a 400, like with add_url.
+        """
+        try:
+            with transaction.atomic():
+                return serializer.save(**kwargs)
+        except IntegrityError:
+            raise serializers.ValidationError({'url': [DUPLICATE]})
+
+    def perform_create(self, serializer):
+        entry = self.save_entry(serializer, user=self.request.user)
+        adjust(self.request.user, active=0 if entry.is_deleted else 1, trashed=1 if entry.is_deleted else 0)
+
+    def perform_update(self, serializer):
+        was_deleted = serializer.instance.is_deleted
+        is_deleted = serializer.validated_data.get('is_deleted', was_deleted)
+        if was_deleted and not is_deleted:
+            entry = self.save_entry(serializer, deleted_at=None)
+        else:
+            entry = self.save_entry(serializer)
+        delta = 0 if entry.is_deleted == was_deleted else 1 if entry.is_deleted else -1
+        adjust(self.request.user, active=-delta, trashed=delta)
+
+    def perform_destroy(self, instance):
+        hard_delete(UrlEntry.objects.filter(pk=instance.pk))
+
+    def bulk_items(self, key):
+        """
+        Returns the list of items posted to a bulk action, either as the JSON body itself or
+        under `key`, and rejects empty or oversized requests with a 400.
+        """
+        items = self.request.data
+        if isinstance(items, dict):
+            items = items.get(key)
+        if not isinstance(items, list) or not items:
+            raise ParseError(f"Expected a non-empty JSON list, or an object with a `{key}` list.")
+        if len(items) > bulk_limit():
+            raise ParseError(f"At most {bulk_limit()} items can be sent at once.")
+        return items
+
+    @action(detail=False, methods=['post'], url_path='bulk-create')
+    def bulk_create(self, request):
+        """
+        Creates many entries in one transaction. Expects a list of entries (as for POST
+        /api/urls/); responds with one result per item, in order.
+        """
+        return Response({"results": bulk_create_entries(request.user, self.bulk_items('items'))})
+
+    @action(detail=False, methods=['post'], url_path='bulk-update')
+    def bulk_update(self, request):
+        """
+        Partially updates many entries in one transaction. Expects a list of objects with the
+        entry's `id` and the fields to change.
+        """
+        return Response({"results": bulk_update_entries(request.user, self.bulk_items('items'))})
+
+    @action(detail=False, methods=['post'], url_path='bulk-delete')
+    def bulk_delete(self, request):
+        """
+        Moves the entries with the posted `ids` to the trash.
+        """
+        return Response({"results": set_trashed(request.user, self.bulk_items('ids'), True)})
+
+    @action(detail=False, methods=['post'], url_path='bulk-restore')
+    def bulk_restore(self, request):
+        """
+        Restores the entries with the posted `ids` from the trash.
+        """
+        return Response({"results": set_trashed(request.user, self.bulk_items('ids'), False)})
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def sync_urls(request):
+    """
+    Returns the changes to the user's URL entries since a sync cursor.
+
+    Without `since` all of the user's entries are returned, trashed ones included. The JSON
+    response contains the following keys:
+
+    * `changed`: The entries created or modified since the cursor, serialized like /api/urls/
+      (`fields` selects the fields). Trashed entries have `is_deleted` set.
+    * `deleted`: The ids of the entries that were deleted for good.
+    * `cursor`: The value to pass as `since` on the next call.
+    * `has_more`: True if the response was cut short; call again with the new cursor.
+
+    A cursor older than LINKBOX_TOMBSTONE_DAYS days gets a 410 response: the client has to
+    drop its copy and sync from scratch.
+
+    :param request: The request object.
+    :return: A JSON response with the changes.
     """
     try:
-        ext = tldextract.extract(url)
-        return ext.domain or url
-    except Exception:
-        return url
+        changes = changes_since(request.user, request.query_params.get('since'))
+    except CursorExpired:
+        return Response({"detail": "The sync cursor has expired, sync again without `since`."}, status=410)
+    except ValueError as error:
+        raise ParseError(str(error))
+    changes['changed'] = URLSerializer(changes['changed'], many=True, context={'request': request}).data
+    return Response(changes)
 
-class URLViewSet(viewsets.ModelViewSet):
-    queryset = UrlEntry.objects.all().order_by('-id')
-    serializer_class = URLSerializer
+
+def parse_api_datetime(value, name):
+    """
+    Parses an ISO 8601 date or datetime query parameter into an aware datetime.
+    Raises a ParseError (400) naming the parameter if it can't be read.
+    """
+    try:
+        parsed = parse_datetime(value)
+        if parsed is None:
+            day = parse_date(value)
+            parsed = datetime.combine(day, time.min) if day else None
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ParseError(f"{name} must be an ISO 8601 date or datetime.")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
 
 # Landing Page
 def landing_page_view(request):
@@ -110,7 +299,81 @@ def logout_view(request):
     return redirect('urlsaver:login')
 
 # -------- App views (protected + per-user) --------
+def listing_context(request):
+    """
+    Builds the context of the URL listing from the request's query
+    parameters: the filtered entries of the current user, paginated, plus the
+    filters themselves so the pagination links can carry them along, and the
+    key the rendered rows and pagination are cached under.
+
+    Shared by the index page and its index_data partial, see index for the
+    query parameters.
+
+    :param request: The request object.
+    :return: A context dict for index.html and the listing partials.
+    """
+    tag = request.GET.get('tag', '').strip()
+    category = request.GET.get('category', '').strip()
+    sub_category = request.GET.get('sub_category', '').strip()
+    search_query = request.GET.get('search', '').strip()
+    link_status = request.GET.get('link', '').strip()
+    
+    show_n_records = request.GET.get('show_n_records', '5').strip()
+
+    # Only current user's, not deleted
+    url_list = UrlEntry.objects.filter(user=request.user).active()
+
+    if category:
+        # Part of the category shown, any case, like the sub category filter
+        # (a chip's name finds its entries); or of the raw category, "others"
+        url_list = url_list.filter(Q(effective_category__icontains=category) | Q(category__icontains=category))
+    if tag:
+        # Exact tag match through the (user, name) unique index on Tag
+        url_list = url_list.filter(tag_set__user=request.user, tag_set__name=tag.lower())
+    if sub_category:
+        url_list = url_list.filter(sub_category__icontains=sub_category)
+    if link_status == 'unchecked':
+        url_list = url_list.filter(link_check__isnull=True)
+    elif link_status in dict(LinkCheck.STATUS_CHOICES):
+        # Results of `manage.py check_links`
+        url_list = url_list.filter(link_check__status=link_status)
+
+    try:
+        per_page = min(max(int(show_n_records), 1), 100)
+    except ValueError:
+        per_page = 5
+
+    page_number = request.GET.get("page")
+    cursor = request.GET.get('cursor')
+
+    def get_page():
+        if search_query:
+            # Ranked full-text search (FTS5 / tsvector), best matches first
+            return Paginator(apply_search(url_list, search_query), per_page).get_page(page_number)
+        # Page numbers for small collections, keyset cursors for large ones
+        return paginate(url_list, per_page, ('-created_at', '-id'), page_number=page_number, cursor=cursor)
+
+    return {
+        # Only used inside the cached fragments: a cache hit runs neither the
+        # COUNT nor the page query.
+        "page_obj": SimpleLazyObject(get_page),
+        "search_query": search_query,
+        "tag": tag,
+        "category": category,
+        "sub_category": sub_category,
+        "link_status": link_status,
+        "link_status_choices": LinkCheck.STATUS_CHOICES,
+        "show_n_records": per_page,
+        # The rows and pagination are cached per user, filters, page and
+        # collection version (see urlsaver.versioning)
+        "fragment_cache": fragment_cache(),
+        "fragment_timeout": fragment_cache_timeout(),
+        "fragment_key": fragment_key(request.user, search_query, tag, category, sub_category,
+                                     link_status, per_page, page_number, cursor),
+    }
+
 @login_required
+@conditional
 def index(request):
     """
     Renders the main app page for the current user.
@@ -122,11 +385,21 @@ def index(request):
 
     The page also provides a search form that allows the user to search for
     URLs by name, URL, tags, category, custom category, or sub category.
+    Search goes through the full-text index and results are ranked by relevance.
 
     The page also allows the user to filter the list of URLs by tag, category,
-    or sub category.
+    sub category, or link status (`link`: ok, broken, unreachable or unchecked,
+    as last seen by `manage.py check_links`).
 
     The page also allows the user to select how many records to show per page.
+    Once the page is loaded, filtering, searching and paging fetch only the
+    table rows and pagination from index_data and swap them in place.
+    Small collections are paged by page number, large ones with keyset cursors
+    (`cursor` query parameter) so deep pages don't need COUNT(*) or OFFSET.
+
+    The page carries an ETag derived from the user's collection version; revisits while nothing
+    has changed get a 304 Not Modified (see urlsaver.versioning). The rendered table rows and pagination
+    are cached under the same version, so other pages and filters are rendered once per change too.
 
     The page also displays a button to add a new URL, a button to delete
     selected URLs, and a button to export all URLs to a CSV file.
@@ -136,57 +409,38 @@ def index(request):
     :param request: The request object.
     :return: A rendered HTML page.
     """
-    tag = request.GET.get('tag', '').strip()
-    category = request.GET.get('category', '').strip()
-    sub_category = request.GET.get('sub_category', '').strip()
-    search_query = request.GET.get('search', '').strip()
-    
-    show_n_records = request.GET.get('show_n_records', '5').strip()
+    return render(request, "index.html", listing_context(request))
 
-    # Only current user's, not deleted
-    url_list = UrlEntry.objects.filter(user=request.user, is_deleted=False)
+@login_required
+@conditional
+def index_data(request):
+    """
+    Returns a JSON response containing the HTML for the URL table rows and
+    pagination of the index page, so filtering, searching and paging can swap
+    them in place instead of reloading the whole page.
 
-    if category:
-        url_list = url_list.filter(Q(category__icontains=category) | Q(custom_category__icontains=category))
-    if tag:
-        url_list = url_list.filter(tags__icontains=tag)
-    if sub_category:
-        url_list = url_list.filter(sub_category__icontains=sub_category)
-    if search_query:
-        url_list = url_list.filter(
-            Q(name__icontains=search_query) |
-            Q(url__icontains=search_query) |
-            Q(tags__icontains=search_query) |
-            Q(category__icontains=search_query) |
-            Q(custom_category__icontains=search_query) |
-            Q(sub_category__icontains=search_query)
-        )
+    The rows are rendered from the "partials/url_rows.html" template and the
+    pagination from the "partials/url_pagination.html" template, both with
+    the context the index page uses, so it takes the same query parameters.
 
-    url_list = url_list.order_by('-created_at')
-    
-    try:
-        per_page = int(show_n_records)
-    except ValueError:
-        per_page = 5
-    
-    paginator = Paginator(url_list, int(show_n_records))
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+    This view requires the user to be logged in.
 
-    return render(request, "index.html", {
-        "page_obj": page_obj,
-        "search_query": search_query,
-        "tag": tag,
-        "category": category,
-        "sub_category": sub_category,
-        "show_n_records": per_page,
-    })
+    :param request: The request object.
+    :return: A JSON response containing the HTML for the URL rows and pagination.
+    """
+    context = listing_context(request)
+    rows_html = render_to_string("partials/url_rows.html", context, request=request)
+    pagination_html = render_to_string("partials/url_pagination.html", context, request=request)
+    return JsonResponse({"rows_html": rows_html, "pagination_html": pagination_html})
 
 @login_required
 def visit_url(request, pk):
     """
     When the URL's [Visit] button is clicked marks that URL's entry as visited and redirects to the URL.
 
+    The visit is only added to the write-behind buffer in urlsaver.visits, the
+    visit_count column is updated later in a batched flush.
+
     Args:
         request: The request object.
         pk: The primary key of the URL entry to visit.
@@ -195,9 +449,8 @@ def visit_url(request, pk):
         A redirect response to the URL.
     """
 
-    url_entry = get_object_or_404(UrlEntry, pk=pk, user=request.user, is_deleted=False)
-    url_entry.visit_count += 1
-    url_entry.save(update_fields=['visit_count'])
+    url_entry = get_object_or_404(UrlEntry.objects.only('url'), pk=pk, user=request.user, is_deleted=False)
+    record_visit(url_entry.pk, request.user.pk)
     return redirect(url_entry.url)
 
 @require_POST
@@ -211,6 +464,10 @@ def add_url(request):
     returns a JSON response with a status of "success" and a message indicating
     that the URL was saved successfully.
 
+    A URL the user has already saved (compared in canonical form, see
+    utils.canonicalize_url) is an error, unless that entry is in the trash: it
+    is then restored with the submitted details.
+
     If the form data is invalid, the view returns a JSON response with a status
     of "error" and a dictionary of errors for each invalid field.
 
@@ -219,13 +476,24 @@ def add_url(request):
     :param request: The request object.
     :return: A JSON response with a status and a message, or a dictionary of errors.
     """
-    form = UrlForm(request.POST)
+    form = UrlForm(request.POST, instance=UrlEntry(user=request.user))
     if form.is_valid():
         new_url = form.save(commit=False)
-        new_url.user = request.user
         if not new_url.name.strip():
             new_url.name = auto_name_from_url(new_url.url)
-        new_url.save()
+        if new_url.is_deleted:
+            # Saved before and trashed since (see UrlForm.clean_url): restore it
+            new_url.is_deleted, new_url.deleted_at = False, None
+            new_url.save()
+            adjust(request.user, active=1, trashed=-1)
+            return JsonResponse({'status': 'success', 'message': 'URL restored from trash.'})
+        try:
+            with transaction.atomic():
+                new_url.save()
+        except IntegrityError:
+            # Added by a concurrent request since the form was validated
+            return JsonResponse({'status': 'error', 'errors': {'url': [DUPLICATE]}}, status=400)
+        adjust(request.user, active=1)
         return JsonResponse({'status': 'success', 'message': 'URL saved successfully.'})
     return JsonResponse({'status': 'error', 'errors': form.errors}, status=400)
 
@@ -249,27 +517,28 @@ def delete_url(request, pk):
     url_entry.is_deleted = True
     url_entry.deleted_at = now()
     url_entry.save(update_fields=["is_deleted", "deleted_at"])
+    adjust(request.user, active=-1, trashed=1)
     messages.success(request, "URL deleted successfully.")
     return redirect('urlsaver:index')
 
 @login_required
 def show_trash(request):
     """
-    Shows the trash page for the current user.
+    Shows the trash of the current user.
 
-    The trash page lists all deleted URL entries for the current user, ordered by
-    the time they were deleted. The page also provides a button to empty the trash, which deletes
-    all deleted URL entries for the current user.
+    The trash is a dialog of the index page, filled page by page from
+    trash_data, so this redirects to the index page with `?trash=1`, which
+    opens it.
 
     This view requires the user to be logged in.
 
     :param request: The request object.
-    :return: A rendered HTML page.
+    :return: A redirect to the index page.
     """
-    trashed_urls = UrlEntry.objects.filter(user=request.user, is_deleted=True).order_by('-deleted_at')
-    return render(request, 'trash.html', {'trashed_urls': trashed_urls})
+    return redirect(reverse('urlsaver:index') + '?trash=1')
 
 @login_required
+@conditional
 def trash_data(request):
     """
     Returns a JSON response containing the HTML for the trash rows and pagination.
@@ -279,18 +548,18 @@ def trash_data(request):
 
     Both templates are rendered with the same context, which includes the page_obj
     containing the list of trashed URL entries, the current page number, and the
-    pagination object.
+    pagination object. Large trash bins are paged with keyset cursors (`cursor`
+    query parameter) instead of page numbers.
 
     This view requires the user to be logged in.
 
     :param request: The request object.
     :return: A JSON response containing the HTML for the trash rows and pagination.
     """
-    trashed = UrlEntry.objects.filter(user=request.user, is_deleted=True).order_by('-deleted_at')
-    from django.core.paginator import Paginator
-    paginator = Paginator(trashed, 5)
-    page_number = request.GET.get('page', 1)
-    page_obj = paginator.get_page(page_number)
+    # Expired entries are left to `manage.py purge_trash`
+    trashed = UrlEntry.objects.filter(user=request.user).trashed()
+    page_obj = paginate(trashed, 5, ('-deleted_at', '-id'),
+                        page_number=request.GET.get('page', 1), cursor=request.GET.get('cursor'))
     rows_html = render_to_string("partials/trash_rows.html", {"page_obj": page_obj}, request=request)
     pagination_html = render_to_string("partials/trash_pagination.html", {"page_obj": page_obj}, request=request)
     return JsonResponse({"rows_html": rows_html, "pagination_html": pagination_html})
@@ -317,7 +586,7 @@ def trash_delete(request):
         data = json.loads(request.body)
         ids = data.get('ids', [])
         # hard delete only user's own trashed items
-        UrlEntry.objects.filter(id__in=ids, user=request.user, is_deleted=True).delete()
+        hard_delete(UrlEntry.objects.filter(id__in=ids, user=request.user, is_deleted=True))
         return JsonResponse({'status': 'success'})
 
 @csrf_exempt
@@ -342,10 +611,14 @@ def trash_recover(request):
     if request.method == 'POST':
         data = json.loads(request.body)
         ids = data.get('ids', [])
-        UrlEntry.objects.filter(id__in=ids, user=request.user).update(is_deleted=False, deleted_at=None)
+        with transaction.atomic():
+            recovered = UrlEntry.objects.filter(id__in=ids, user=request.user, is_deleted=True).update(
+                is_deleted=False, deleted_at=None, updated_at=now(), change_seq=next_change_seq(request.user))
+            adjust(request.user, active=recovered, trashed=-recovered)
         return JsonResponse({'status': 'success'})
 
 @login_required
+@conditional
 def get_url_details(request, url_id):
     """
     Returns a JSON response containing the details of the specified URL entry.
@@ -380,6 +653,44 @@ def get_url_details(request, url_id):
         "tags": url.tags,
     })
 
+
+@login_required
+def link_preview(request, url_id):
+    """
+    Returns a JSON preview (title, description and image) of the page a URL
+    entry points to.
+
+    This view requires the user to be logged in.
+
+    The page is fetched server side, reading no more than its <head>, and
+    the result is stored so that later previews of the same URL, by any
+    user, are answered from the database (see urlsaver.previews).
+
+    The JSON response contains the keys `url`, `title`, `description`,
+    `image` and `cached` (whether the stored preview was reused). If the
+    page can't be fetched the response is a 502 with a `message`, or a 503
+    if too many previews are being fetched already.
+
+    :param request: The request object.
+    :param url_id: The primary key of the URL entry to preview.
+    :return: A JSON response with the preview.
+    """
+    entry = get_object_or_404(UrlEntry.objects.only("url"), pk=url_id, user=request.user)
+    try:
+        preview, cached = get_preview(entry.url)
+    except PreviewBusy:
+        return JsonResponse({"status": "error", "message": "Too many previews in progress, try again shortly."},
+                            status=503)
+    if preview.error:
+        return JsonResponse({"status": "error", "message": preview.error}, status=502)
+    return JsonResponse({
+        "url": entry.url,
+        "title": preview.title,
+        "description": preview.description,
+        "image": preview.image,
+        "cached": cached,
+    })
+
 @require_POST
 @login_required
 def edit_url_view(request, url_id):
@@ -392,7 +703,13 @@ def edit_url_view(request, url_id):
         if not url_obj.name.strip():
             url_obj.name = auto_name_from_url(url_obj.url)
 
-        url_obj.save()
+        try:
+            with transaction.atomic():
+                url_obj.save()
+        except IntegrityError:
+            # Another entry got this URL since the form was validated
+            return JsonResponse({'status': 'error', 'errors': {'url': [DUPLICATE]}}, status=400)
+        adjust(request.user)
         return JsonResponse({'status': 'success', 'message': 'URL updated successfully.'})
 
     return JsonResponse({'status': 'error', 'errors': form.errors}, status=400)
@@ -416,10 +733,14 @@ def delete_selected(request):
     """
     ids = request.POST.getlist('selected_urls')
     if ids:
-        UrlEntry.objects.filter(id__in=ids, user=request.user).update(is_deleted=True, deleted_at=now())
+        with transaction.atomic():
+            trashed = UrlEntry.objects.filter(id__in=ids, user=request.user, is_deleted=False).update(
+                is_deleted=True, deleted_at=now(), updated_at=now(), change_seq=next_change_seq(request.user))
+            adjust(request.user, active=-trashed, trashed=trashed)
     return redirect('urlsaver:index')
 
 @login_required
+@conditional(visits=True)
 def activity_data(request):
     """
     Returns the number of total URLs and trashed URLs for the current user as a JSON response.
@@ -428,15 +749,65 @@ def activity_data(request):
 
     * `total_url_count`: The number of URLs that are not deleted.
     * `trashed_url_count`: The number of URLs that are deleted.
+    * `total_visit_count`: The number of recorded visits over all of the user's URLs.
+
+    The numbers are read from the user's cached counters (see urlsaver.stats) rather than
+    counted on every request. Visits still waiting in the write-behind buffer are not included.
 
     This view requires the user to be logged in.
 
     :param request: The request object.
     :return: A JSON response with the total number of URLs and trashed URLs.
     """
-    total_url_count = UrlEntry.objects.filter(user=request.user, is_deleted=False).count()
-    trashed_url_count = UrlEntry.objects.filter(user=request.user, is_deleted=True).count()
-    return JsonResponse({'total_url_count': total_url_count, 'trashed_url_count': trashed_url_count})
+    stats = get_stats(request.user)
+    return JsonResponse({
+        'total_url_count': stats.active_count,
+        'trashed_url_count': stats.trashed_count,
+        'total_visit_count': stats.visit_count,
+    })
+
+@login_required
+@conditional
+def facets_data(request):
+    """
+    Returns the number of active URLs per category and sub category for the
+    current user as a JSON response, for the category filter chips.
+
+    The JSON response contains a `categories` list of
+    {"name", "count", "sub_categories": [{"name", "count"}]} objects, largest
+    first. URLs without a category are counted under the name "".
+
+    The counts are computed with a single GROUP BY and cached per user until
+    their collection changes (see urlsaver.facets).
+
+    This view requires the user to be logged in.
+
+    :param request: The request object.
+    :return: A JSON response with the category counts.
+    """
+    return JsonResponse({'categories': category_facets(request.user)})
+
+@login_required
+def profiling_stats(request):
+    """
+    Returns a JSON response summarizing the requests recorded by the
+    profiling middleware (see urlsaver.profiling), per URL name: the number of
+    requests and the p50 / p95 / p99 of their query count, database time,
+    template time and total time, in milliseconds.
+
+    This view requires the user to be logged in and to be staff.
+
+    :param request: The request object.
+    :return: A JSON response with whether profiling is on, the number of
+        buffered requests and the per URL name summary.
+    """
+    if not request.user.is_staff:
+        return JsonResponse({"status": "error", "message": "Staff only."}, status=403)
+    return JsonResponse({
+        "enabled": profiling_enabled(),
+        "requests": len(records()),
+        "views": summary(),
+    })
 
 @login_required
 def export_selected_csv(request):
@@ -450,6 +821,7 @@ def export_selected_csv(request):
 
     The view responds with a text/csv content type and a file attachment with the name "selected_urls.csv",
     containing the exported URLs with their name, URL, category, sub category, and tags.
+    The file is streamed, and gzip compressed ("selected_urls.csv.gz") when `compress=gzip` is posted.
 
     :param request: The request object.
     :return: A HTTP response with the exported URLs as a CSV file.
@@ -457,17 +829,7 @@ def export_selected_csv(request):
     if request.method == "POST":
         ids = request.POST.getlist("selected_urls[]")  # AJAX sends as array
         urls = UrlEntry.objects.filter(user=request.user, id__in=ids)
-
-        response = HttpResponse(content_type="text/csv")
-        response["Content-Disposition"] = 'attachment; filename="selected_urls.csv"'
-
-        writer = csv.writer(response)
-        writer.writerow(["Name", "URL", "Category", "Sub Category", "Tags"])
-
-        for url in urls:
-            writer.writerow([url.name, url.url, url.category, url.sub_category, url.tags])
-
-        return response
+        return csv_response(urls, "selected_urls.csv", compress=request.POST.get("compress") == "gzip")
 
     return JsonResponse({"status": "error", "message": "Invalid request"}, status=400)
 
@@ -484,6 +846,9 @@ def export_selected_pdf(request):
     The view responds with a application/pdf content type and a file attachment with the name "urls_export.pdf",
     containing the exported URLs with their name, URL, category, sub category, and tags.
 
+    Exports of more than LINKBOX_ASYNC_EXPORT_THRESHOLD URLs are queued as a background job
+    instead; the response is then a 202 with the job's status (see job_status).
+
     :param request: The request object.
     :return: A HTTP response with the exported URLs as a PDF file.
     """
@@ -499,55 +864,23 @@ def export_selected_pdf(request):
                 return JsonResponse({"error": "no_selection", "message": "No URLs selected. Do you want to export all?"})
             urls = UrlEntry.objects.filter(user=request.user, is_deleted=False)
 
-        if not urls.exists():
+        total = urls.count()
+        if not total:
             return JsonResponse({"error": "no_data", "message": "No URLs found to export."})
 
-        # Create PDF in memory
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=A4)
-        doc.title = "Selected URLs Export"
-        doc.author = request.user.username if request.user.is_authenticated else "LinkBOX"
-        doc.subject = "Exported URLs with categories and tags"
-        doc.keywords = ["urls", "export", "pdf", "linkbox"]
-        elements = []
-
-        styles = getSampleStyleSheet()
-        title = Paragraph("LinkBOX URL Export", styles["Heading1"])
-        elements.append(title)
-        elements.append(Spacer(1, 12))
-
-        # Table Data
-        data = [["Name", "URL", "Category", "Sub-Category", "Tags"]]
-        for url in urls:
-            data.append([
-                Paragraph(url.name or "-", styles["Normal"]),
-                Paragraph(f'<a href="{url.url}">{url.url}</a>', styles["Normal"]),
-                Paragraph(url.category or "-", styles["Normal"]),
-                Paragraph(url.sub_category or "-", styles["Normal"]),
-                Paragraph(url.tags or "-", styles["Normal"]),
-            ])
-
-        # Create Table
-        table = Table(data, repeatRows=1)
-        table.setStyle(TableStyle([
-            ("BACKGROUND", (0, 0), (-1, 0), colors.grey),
-            ("TEXTCOLOR", (0, 0), (-1, 0), colors.whitesmoke),
-            ("ALIGN", (0, 0), (-1, -1), "LEFT"),
-            ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-            ("BOTTOMPADDING", (0, 0), (-1, 0), 12),
-            ("BACKGROUND", (0, 1), (-1, -1), colors.beige),
-            ("GRID", (0, 0), (-1, -1), 0.5, colors.black),
-        ]))
-        elements.append(table)
-
-        # Build PDF
-        doc.build(elements)
-        buffer.seek(0)
-
-        # Return Response
-        response = HttpResponse(buffer, content_type="application/pdf")
-        response["Content-Disposition"] = 'attachment; filename="urls_export.pdf"'
-        return response
+        # Large exports are built by the background worker, the page polls the job
+        if total > async_export_threshold():
+            job = enqueue(request.user, Job.EXPORT_PDF,
+                          params={"ids": [int(pk) for pk in selected_ids if pk.isdigit()]})
+            return JsonResponse(job_payload(job), status=202)
+
+        # Build the PDF in table chunks and send it from a spooled file
+        return pdf_response(
+            urls, "urls_export.pdf",
+            title="Selected URLs Export",
+            heading="LinkBOX URL Export",
+            author=request.user.username if request.user.is_authenticated else "LinkBOX",
+        )
 @login_required
 def export_all_pdf(request):
     # Fetch all URLs for the logged-in user that are not deleted
@@ -559,60 +892,30 @@ def export_all_pdf(request):
     The view responds with a application/pdf content type and a file attachment with the name "all_urls_export.pdf",
     containing all URLs with their name, URL, category, sub category, and tags.
 
+    Like export_selected_pdf, collections of more than LINKBOX_ASYNC_EXPORT_THRESHOLD URLs are
+    queued as a background job instead; the response is then a 202 with the job's status.
+
     :param request: The request object.
     :return: A HTTP response with the exported URLs as a PDF file.
     """
     urls = UrlEntry.objects.filter(user=request.user, is_deleted=False)
 
-    if not urls.exists():
+    total = urls.count()
+    if not total:
         return HttpResponse("No URLs found to export.", status=404)
 
-    # Create PDF in memory
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    doc.title = "All URLs Export"
-    doc.author = request.user.username
-    doc.subject = "Exported URLs with categories and tags"
-    doc.keywords = ["urls", "export", "pdf", "linkbox"]
-    elements = []
-
-    styles = getSampleStyleSheet()
-    title = Paragraph("LinkBOX URL Export - All URLs", styles["Heading1"])
-    elements.append(title)
-    elements.append(Spacer(1, 12))
-
-    # Table Data
-    data = [["Name", "URL", "Category", "Sub-Category", "Tags"]]
-    for url in urls:
-        data.append([
-            Paragraph(url.name or "-", styles["Normal"]),
-            Paragraph(f'<a href="{url.url}">{url.url}</a>', styles["Normal"]),
-            Paragraph(url.category or "-", styles["Normal"]),
-            Paragraph(url.sub_category or "-", styles["Normal"]),
-            Paragraph(url.tags or "-", styles["Normal"]),
-        ])
-
-    # Create Table
-    table = Table(data, repeatRows=1)
-    table.setStyle(TableStyle([
-        ("BACKGROUND", (0, 0), (-1, 0), colors.grey),
-        ("TEXTCOLOR", (0, 0), (-1, 0), colors.whitesmoke),
-        ("ALIGN", (0, 0), (-1, -1), "LEFT"),
-        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-        ("BOTTOMPADDING", (0, 0), (-1, 0), 12),
-        ("BACKGROUND", (0, 1), (-1, -1), colors.beige),
-        ("GRID", (0, 0), (-1, -1), 0.5, colors.black),
-    ]))
-    elements.append(table)
-
-    # Build PDF
-    doc.build(elements)
-    buffer.seek(0)
-
-    # Return Response
-    response = HttpResponse(buffer, content_type="application/pdf")
-    response["Content-Disposition"] = 'attachment; filename="all_urls_export.pdf"'
-    return response
+    # Large exports are built by the background worker
+    if total > async_export_threshold():
+        job = enqueue(request.user, Job.EXPORT_PDF, params={"ids": []})
+        return JsonResponse(job_payload(job), status=202)
+
+    # Build the PDF in table chunks and send it from a spooled file
+    return pdf_response(
+        urls, "all_urls_export.pdf",
+        title="All URLs Export",
+        heading="LinkBOX URL Export - All URLs",
+        author=request.user.username,
+    )
 
 @login_required
 def export_all_csv(request):
@@ -623,6 +926,7 @@ def export_all_csv(request):
 
     The view responds with a text/csv content type and a file attachment with the name "all_urls.csv",
     containing all URLs with their name, URL, category, sub category, and tags.
+    The file is streamed, and gzip compressed ("all_urls.csv.gz") when `compress=gzip` is posted.
 
     :param request: The request object.
     :return: A HTTP response with the exported URLs as a CSV file.
@@ -634,16 +938,7 @@ def export_all_csv(request):
         if not urls.exists():
             return HttpResponse("No URLs found to export.", status=404)
 
-        response = HttpResponse(content_type="text/csv")
-        response["Content-Disposition"] = 'attachment; filename="all_urls.csv"'
-
-        writer = csv.writer(response)
-        writer.writerow(["Name", "URL", "Category", "Sub Category", "Tags"])
-
-        for url in urls:
-            writer.writerow([url.name, url.url, url.category, url.sub_category, url.tags])
-
-        return response
+        return csv_response(urls, "all_urls.csv", compress=request.POST.get("compress") == "gzip")
 
     return HttpResponse("Invalid request method.", status=400)
 
@@ -667,6 +962,12 @@ def import_csv(request):
 
     If the Name field is blank, a name will be auto-generated from the URL domain.
     Example: https://leetcode.com → "leetcode"
+
+    The file is parsed as a stream and written in batches of LINKBOX_IMPORT_BATCH_SIZE
+    rows inside a single transaction, see urlsaver.importer.CsvImporter.
+
+    Files larger than LINKBOX_ASYNC_IMPORT_THRESHOLD bytes are queued as a background
+    job instead; the response is then a 202 with the job's status (see job_status).
     """
     if not request.FILES.get("csv_file"):
         return JsonResponse({"status": "error", "message": "No file uploaded"}, status=400)
@@ -677,65 +978,87 @@ def import_csv(request):
     if not csv_file.name.endswith(".csv"):
         return JsonResponse({"status": "error", "message": "Please upload a valid .csv file"}, status=400)
 
-    # Read CSV
-    data_set = csv_file.read().decode("UTF-8")
-    io_string = io.StringIO(data_set)
-    reader = csv.DictReader(io_string)
+    # Large files are imported by the background worker, the page polls the job
+    if csv_file.size > getattr(settings, "LINKBOX_ASYNC_IMPORT_THRESHOLD", 1024 * 1024):
+        job = enqueue(request.user, Job.IMPORT_CSV, input_file=csv_file)
+        return JsonResponse(job_payload(job), status=202)
 
-    # All CSV headers normalized to lowercase
-    reader.fieldnames = [field.lower() for field in reader.fieldnames]
+    # Stream the file through the batched importer
+    try:
+        importer = CsvImporter(request.user).run_file(csv_file)
+    except (UnicodeDecodeError, csv.Error):
+        return JsonResponse({"status": "error", "message": "Could not read the file as a UTF-8 CSV"}, status=400)
+    return JsonResponse(importer.report())
 
-    added, skipped, restored = 0, 0, 0
-    url_validator = URLValidator()
 
-    for row in reader:
-        raw_url = (row.get("url") or "").strip()
-        if not raw_url:
-            continue  # skip empty rows
+def job_payload(job):
+    """
+    Returns the JSON representation of a job used by the job views.
+    """
+    return {
+        "job_id": job.pk,
+        "kind": job.kind,
+        "status": job.status,
+        "progress": job.progress,
+        "total": job.total,
+        "result": job.result,
+        "error": "The job failed." if job.status == Job.FAILED else "",
+        "status_url": reverse("urlsaver:job_status", args=[job.pk]),
+        "download_url": reverse("urlsaver:job_download", args=[job.pk]) if job.result_file else None,
+    }
 
-        # Auto-fix scheme if missing
-        if not raw_url.startswith(("http://", "https://")):
-            raw_url = "https://" + raw_url
+@require_POST
+@login_required
+def queue_pdf_export(request):
+    """
+    Queues a PDF export as a background job.
 
-        # Validate URL format
-        try:
-            url_validator(raw_url)
-        except ValidationError:
-            skipped += 1
-            continue
-
-        # If already active → skip
-        if UrlEntry.objects.filter(user=request.user, url=raw_url, is_deleted=False).exists():
-            skipped += 1
-            continue
-
-        # If in trash → restore instead of creating duplicate
-        trashed_entry = UrlEntry.objects.filter(user=request.user, url=raw_url, is_deleted=True).first()
-        if trashed_entry:
-            trashed_entry.is_deleted = False
-            trashed_entry.save(update_fields=['is_deleted'])
-            restored += 1
-            continue
-
-        # Auto-generate name if missing
-        name = (row.get("name") or "").strip()
-        if not name:
-            name = auto_name_from_url(raw_url)
-
-        UrlEntry.objects.create(
-            user=request.user,
-            name=name,
-            url=raw_url,
-            category=(row.get("category") or "").strip(),
-            sub_category=(row.get("sub category") or "").strip(),
-            tags=(row.get("tags") or "").strip(),
-        )
-        added += 1
+    This view requires the user to be logged in.
 
-    return JsonResponse({
-        "status": "success",
-        "added": added,
-        "restored": restored,
-        "skipped": skipped,
-        "message": f"Imported {added} new, {restored} restored from trash, {skipped} skipped."
-    })
+    Expects the same `selected_urls[]` list as export_selected_pdf; without it all of the
+    user's active URLs are exported.
+
+    :param request: The request object.
+    :return: A 202 JSON response with the queued job (see job_status), or a JSON error
+        if there is nothing to export.
+    """
+    selected_ids = request.POST.getlist("selected_urls[]")
+    urls = UrlEntry.objects.filter(user=request.user, is_deleted=False)
+    if selected_ids:
+        urls = urls.filter(id__in=selected_ids)
+    if not urls.exists():
+        return JsonResponse({"error": "no_data", "message": "No URLs found to export."}, status=404)
+
+    job = enqueue(request.user, Job.EXPORT_PDF, params={"ids": [int(pk) for pk in selected_ids if pk.isdigit()]})
+    return JsonResponse(job_payload(job), status=202)
+
+@login_required
+def job_status(request, job_id):
+    """
+    Returns the status of one of the user's background jobs as JSON.
+
+    The JSON response contains the job's `status` (queued, running, done or failed),
+    `progress` and `total` (0 while unknown), the `result` of a finished job and a
+    `download_url` once the job has produced a file.
+
+    :param request: The request object.
+    :param job_id: The primary key of the job.
+    :return: A JSON response with the job's status.
+    """
+    job = get_object_or_404(Job, pk=job_id, user=request.user)
+    return JsonResponse(job_payload(job))
+
+@login_required
+def job_download(request, job_id):
+    """
+    Sends the file produced by one of the user's finished background jobs.
+
+    :param request: The request object.
+    :param job_id: The primary key of the job.
+    :return: The file as an attachment, or a 404 if the job has no file (yet).
+    """
+    job = get_object_or_404(Job, pk=job_id, user=request.user, status=Job.DONE)
+    if not job.result_file:
+        raise Http404("This job has no file to download.")
+    filename = (job.result or {}).get("filename") or os.path.basename(job.result_file.name)
+    return FileResponse(job.result_file.open("rb"), as_attachment=True, filename=filename)
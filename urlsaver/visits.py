@@ -0,0 +1,205 @@
+"""
+Write-behind buffer for UrlEntry.visit_count.
+
+visit_url only records a click in the cache and redirects. The pending
+counts are written to the database in batches: one UPDATE per flush, with
+visit_count = visit_count + <delta> computed by the database so no
+increment is lost to a concurrent read-modify-write.
+
+A flush happens in a background thread once LINKBOX_VISIT_FLUSH_INTERVAL
+seconds have passed since the previous one, or on demand through
+`manage.py flush_visits`, which refuses to run on a local-memory cache
+it could not see the workers' clicks in.
+
+Visits are not edits: a flush leaves the entries' change_seq (see
+urlsaver.sync) and the owners' collection versions alone, so sync clients,
+cached fragments and ETags are not invalidated by a click. Only the
+responses that show visit counts revalidate, see versioning.conditional.
+
+With the default per-process local-memory cache every worker process keeps
+its own buffer, flushed by its own thread and when it exits. Point
+LINKBOX_VISIT_CACHE at a cache shared between processes (database, redis,
+memcached) to let the management command flush the clicks of every
+process.
+"""
+import atexit
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections, transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+
+from .models import UrlEntry
+from .stats import add_visits
+
+PENDING_KEY = 'linkbox:visits:pending'
+LOCK_KEY = 'linkbox:visits:lock'
+LAST_FLUSH_KEY = 'linkbox:visits:last-flush'
+
+_flush_thread = None
+_flush_thread_lock = threading.Lock()
+
+
+def visit_cache():
+    """
+    Returns the cache the pending visits are kept in (LINKBOX_VISIT_CACHE).
+    """
+    return caches[getattr(settings, 'LINKBOX_VISIT_CACHE', 'default')]
+
+
+def flush_interval():
+    """
+    Returns the number of seconds between automatic flushes.
+    """
+    return getattr(settings, 'LINKBOX_VISIT_FLUSH_INTERVAL', 30)
+
+
+class LockTimeout(Exception):
+    """
+    The visit buffer lock could not be taken in time.
+    """
+
+
+class _Locked:
+    """
+    A small cross-process lock on top of cache.add(), which is atomic on all
+    of Django's cache backends that can be shared between processes.
+
+    The lock key holds a token unique to the holder, so a holder whose lock
+    expired never releases the lock somebody else took since. When the lock
+    can't be taken within `timeout` seconds LockTimeout is raised: a crashed
+    holder's lock expires after `timeout` seconds, so only a live holder can
+    keep it that long.
+    """
+
+    def __init__(self, cache, timeout=5):
+        self.cache = cache
+        self.timeout = timeout
+        self.token = None
+
+    def __enter__(self):
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + self.timeout
+        while not self.cache.add(LOCK_KEY, token, self.timeout):
+            if time.monotonic() > deadline:
+                raise LockTimeout(LOCK_KEY)
+            time.sleep(0.001)
+        self.token = token
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.cache.get(LOCK_KEY) == self.token:
+            self.cache.delete(LOCK_KEY)
+
+
+def record_visit(entry_id, user_id):
+    """
+    Adds one visit for the entry to the pending buffer and starts a
+    background flush if the flush interval has elapsed.
+    """
+    cache = visit_cache()
+    try:
+        with _Locked(cache):
+            pending = cache.get(PENDING_KEY) or {}
+            key = (entry_id, user_id)
+            pending[key] = pending.get(key, 0) + 1
+            cache.set(PENDING_KEY, pending, None)
+    except LockTimeout:
+        # Losing one click is better than failing the redirect.
+        return
+
+    if cache.add(LAST_FLUSH_KEY, time.time(), None):
+        return
+    if time.time() - cache.get(LAST_FLUSH_KEY, 0) >= flush_interval():
+        _flush_in_background()
+
+
+def pending_visits():
+    """
+    Returns the buffered {(entry_id, user_id): count} that has not been
+    written to the database yet.
+    """
+    return dict(visit_cache().get(PENDING_KEY) or {})
+
+
+def flush_visits():
+    """
+    Writes all buffered visits to the database and empties the buffer.
+
+    Returns the {(entry_id, user_id): count} mapping that was written.
+    Raises LockTimeout, leaving the buffer as it is, if another process
+    holds the buffer lock for too long.
+    """
+    cache = visit_cache()
+    with _Locked(cache):
+        pending = cache.get(PENDING_KEY) or {}
+        cache.delete(PENDING_KEY)
+        cache.set(LAST_FLUSH_KEY, time.time(), None)
+
+    if not pending:
+        return pending
+
+    deltas = {}
+    for (entry_id, user_id), count in pending.items():
+        deltas[entry_id] = deltas.get(entry_id, 0) + count
+    try:
+        with transaction.atomic():
+            # Clicks on entries deleted since then are dropped, they must not
+            # reach the owners' visit counters either. The rows are locked
+            # so they can't be deleted before the UPDATE.
+            owners = dict(UrlEntry.objects.select_for_update().filter(pk__in=deltas).values_list('id', 'user_id'))
+            per_user = {}
+            for entry_id, user_id in owners.items():
+                per_user[user_id] = per_user.get(user_id, 0) + deltas[entry_id]
+            UrlEntry.objects.filter(pk__in=owners).update(
+                visit_count=F('visit_count') + Case(
+                    *[When(pk=entry_id, then=Value(deltas[entry_id])) for entry_id in owners],
+                    default=Value(0),
+                    output_field=IntegerField(),
+                ),
+                updated_at=timezone.now(),
+            )
+            add_visits(per_user)
+    except Exception:
+        # Put the clicks back so the next flush retries them.
+        with _Locked(cache):
+            current = cache.get(PENDING_KEY) or {}
+            for key, count in pending.items():
+                current[key] = current.get(key, 0) + count
+            cache.set(PENDING_KEY, current, None)
+        raise
+    return pending
+
+
+def _flush_in_background():
+    """
+    Runs flush_visits() in a daemon thread unless one is already running,
+    so the request that crossed the interval doesn't wait for the UPDATE.
+    """
+    global _flush_thread
+
+    def run():
+        try:
+            flush_visits()
+        finally:
+            connections.close_all()
+
+    with _flush_thread_lock:
+        if _flush_thread is not None and _flush_thread.is_alive():
+            return
+        _flush_thread = threading.Thread(target=run, name='linkbox-visit-flush', daemon=True)
+        _flush_thread.start()
+
+
+@atexit.register
+def _flush_at_exit():
+    # Don't drop the clicks buffered in a local-memory cache when a worker
+    # shuts down.
+    try:
+        flush_visits()
+    except Exception:
+        pass